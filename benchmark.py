@@ -0,0 +1,751 @@
+"""
+Headless benchmarks for the world's hot paths.
+
+`python benchmark.py` runs the hot-path suite (block edits, bulk edits, raycasts with and
+without the octree, mesh preparation and player physics) on dense and sparse worlds of
+increasing size and prints throughput and memory. Use --save-baseline to store the results and --baseline to compare a later run
+against them; regressions beyond --tolerance make the script exit with status 1.
+`--reports` prints the standalone comparisons (storage, meshing, batch raycast, persistence,
+edit journal, terrain generation, lighting, level of detail, instanced drawing, occlusion
+culling, octree queries, world server load test). `--check` only runs the correctness
+checks (chunk encodings and save/load round trips), which raise RuntimeError on failure.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from chunks import ChunkStorage, CHUNK_SIZE, SOLID, chunk_coords
+from camera import Camera
+from core_engine import CoreEngine
+from mesher import mesh_world
+from network import WorldServer, WorldClient, memory_pair
+from instancing import InstanceSet
+from journal import open_world
+from lighting import LightMap
+from lod import LodManager
+from persistence import DECODERS, ENCODERS, save_world, load_world
+from player import Player
+from terrain import generate_world
+from utils import raycast_to_grid
+from world import World
+
+QUICK_SIZES = (10, 32, 64)
+FULL_SIZES = (10, 32, 64, 128, 256)
+LAYOUTS = ("dense", "sparse")
+SPARSE_FILL = 0.01  # Fraction of cells occupied in a sparse world
+
+
+def fill_positions(edge):
+    """Yield every position of a dense edge^3 cube."""
+    for x in range(edge):
+        for y in range(edge):
+            for z in range(edge):
+                yield (x, y, z)
+
+
+def measure(build):
+    """Run `build` and return (result, seconds, peak traced bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def fill_dict(edge):
+    blocks = {}
+    for position in fill_positions(edge):
+        blocks[position] = True
+    return blocks
+
+
+def fill_chunks(edge):
+    blocks = ChunkStorage()
+    for x, y, z in fill_positions(edge):
+        blocks.set(x, y, z, SOLID)
+    return blocks
+
+
+def time_lookups(blocks, edge):
+    """Time membership tests over the whole cube plus as many misses."""
+    start = time.perf_counter()
+    for x, y, z in fill_positions(edge):
+        (x, y, z) in blocks
+        (x, y, z + edge) in blocks
+    return time.perf_counter() - start
+
+
+def compare_block_storage(edges=(16, 32, 64)):
+    """Compare memory and throughput of the legacy dict against ChunkStorage."""
+    print(f"{'blocks':>10} {'storage':>8} {'memory':>12} {'insert/s':>12} {'lookup/s':>12}")
+    for edge in edges:
+        count = edge ** 3
+        for name, build in (("dict", fill_dict), ("chunks", fill_chunks)):
+            blocks, insert_time, peak = measure(lambda: build(edge))
+            lookup_time = time_lookups(blocks, edge)
+            print(
+                f"{count:>10} {name:>8} {peak / 1024:>10.0f}KB "
+                f"{count / insert_time:>12.0f} {2 * count / lookup_time:>12.0f}"
+            )
+
+
+def benchmark_meshing(edges=(16, 32, 64)):
+    """Time the greedy mesher on dense cubes and on a sparse checkerboard."""
+    print(f"{'blocks':>10} {'layout':>8} {'quads':>8} {'naive':>8} {'seconds':>8}")
+    for edge in edges:
+        for layout in ("dense", "checker"):
+            blocks = ChunkStorage()
+            for x, y, z in fill_positions(edge):
+                if layout == "dense" or (x + y + z) % 2 == 0:
+                    blocks.set(x, y, z, SOLID)
+            start = time.perf_counter()
+            meshes = mesh_world(blocks)
+            elapsed = time.perf_counter() - start
+            quads = sum(mesh.quad_count for mesh in meshes.values())
+            print(f"{len(blocks):>10} {layout:>8} {quads:>8} {6 * len(blocks):>8} {elapsed:>8.3f}")
+
+
+def benchmark_batch_raycast(ray_counts=(1000, 10000, 100000), size=(64, 32, 64), seed=1):
+    """Compare World.raycast_batch against one World.raycast per ray in a random world."""
+    rng = np.random.default_rng(seed)
+    world = World(size=size)
+    for x, y, z in rng.integers((-size[0] // 2, 0, -size[2] // 2), (size[0] // 2, size[1], size[2] // 2),
+                                size=(size[0] * size[1] * size[2] // 32, 3)).tolist():
+        world.add_block(x, y, z)
+
+    print(f"{'rays':>8} {'batch rays/s':>14} {'scalar rays/s':>14}")
+    for count in ray_counts:
+        origins = rng.uniform((-size[0] / 2, 1, -size[2] / 2), (size[0] / 2, size[1], size[2] / 2), size=(count, 3))
+        directions = rng.normal(size=(count, 3))
+        start = time.perf_counter()
+        world.raycast_batch(origins, directions, max_distance=10.0)
+        batch_time = time.perf_counter() - start
+
+        sample = random.Random(seed).sample(range(count), min(count, 2000))
+        start = time.perf_counter()
+        for i in sample:
+            world.raycast(origins[i], directions[i], max_distance=10.0)
+        scalar_time = (time.perf_counter() - start) * count / len(sample)
+        print(f"{count:>8} {count / batch_time:>14.0f} {count / scalar_time:>14.0f}")
+
+
+def ground_world(edge, height=32, seed=1):
+    """Build an edge x height x edge world with solid ground and some scattered holes."""
+    rng = np.random.default_rng(seed)
+    world = World(size=(edge, height, edge))
+    (x0, y0, z0), (x1, y1, z1) = world.bounds()
+    for cx in range(x0 // CHUNK_SIZE, -(-x1 // CHUNK_SIZE)):
+        for cy in range(y0 // CHUNK_SIZE, -(-y1 // CHUNK_SIZE)):
+            for cz in range(z0 // CHUNK_SIZE, -(-z1 // CHUNK_SIZE)):
+                ys = cy * CHUNK_SIZE + np.arange(CHUNK_SIZE)
+                chunk = np.broadcast_to(ys[None, :, None] < height // 2, (CHUNK_SIZE,) * 3).astype(np.uint8)
+                chunk[rng.random(chunk.shape) < 0.02] = 0
+                world.blocks.put_chunk((cx, cy, cz), chunk * SOLID)
+    return world
+
+
+def check_same_blocks(loaded, world, name):
+    """Raise RuntimeError unless two worlds hold exactly the same blocks."""
+    if len(loaded.blocks) != len(world.blocks):
+        raise RuntimeError(f"{name}: {len(loaded.blocks)} blocks instead of {len(world.blocks)}")
+    for coord in world.blocks.coords():
+        if not np.array_equal(loaded.blocks.chunk(coord), world.blocks.chunk(coord)):
+            raise RuntimeError(f"{name}: chunk {coord} differs")
+
+
+def check_persistence(seed=1):
+    """
+    Round-trip chunks through every chunk encoding, and a world through save_world() and
+    an eager and a lazy load_world(), raising RuntimeError on any difference.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (CHUNK_SIZE,) * 3
+    chunks = {
+        "empty": np.zeros(shape, dtype=np.uint8),
+        "full": np.full(shape, SOLID, dtype=np.uint8),
+        "layers": np.repeat(np.arange(CHUNK_SIZE, dtype=np.uint8) % 4, CHUNK_SIZE ** 2).reshape(shape),
+        "few types": rng.integers(0, 3, size=shape).astype(np.uint8),
+        "noise": rng.integers(0, 256, size=shape).astype(np.uint8),
+    }
+    for name, chunk in chunks.items():
+        flat = chunk.reshape(-1)
+        for encoding, encode in ENCODERS.items():
+            if not np.array_equal(DECODERS[encoding](encode(flat)), flat):
+                raise RuntimeError(f"encoding {encoding} does not round-trip the {name} chunk")
+
+    world = ground_world(64)
+    directory = tempfile.mkdtemp()
+    try:
+        save_world(world, directory)
+        check_same_blocks(load_world(directory, lazy=False), world, "eager load")
+        loaded = load_world(directory, lazy=True)
+        check_same_blocks(loaded, world, "lazy load")
+        loaded.close()
+    finally:
+        shutil.rmtree(directory)
+    print("persistence: every encoding and save/load round-trips")
+
+
+def benchmark_persistence(edges=(64, 128, 256)):
+    """Time save, eager load and lazy load (plus first full access) of ground worlds."""
+    print(f"{'blocks':>10} {'file size':>10} {'save':>8} {'eager':>8} {'lazy':>8} {'lazy+all':>9}")
+    for edge in edges:
+        world = ground_world(edge)
+        directory = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            save_world(world, directory)
+            save_time = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+            start = time.perf_counter()
+            eager = load_world(directory, lazy=False)
+            eager_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            lazy = load_world(directory, lazy=True)
+            lazy_time = time.perf_counter() - start
+            for coord in lazy.blocks.coords():
+                lazy.blocks.chunk(coord)
+            full_time = time.perf_counter() - start
+
+            check_same_blocks(eager, world, "eager load")
+            check_same_blocks(lazy, world, "lazy load")
+            lazy.close()
+        finally:
+            shutil.rmtree(directory)
+        print(f"{len(world.blocks):>10} {size / 1024:>8.0f}KB {save_time:>8.3f} {eager_time:>8.3f} "
+              f"{lazy_time:>8.3f} {full_time:>9.3f}")
+
+
+def benchmark_journal(counts=(10000, 100000), edge=64):
+    """Time block edits with and without a journal attached, then flushing, replaying and compacting it."""
+    print(f"{'edits':>8} {'plain/s':>10} {'journal/s':>10} {'flush':>8} {'log size':>10} {'replay':>8} {'compact':>8}")
+    for count in counts:
+        positions = [(i % edge - edge // 2, (i // edge) % edge, (i // edge ** 2) % edge - edge // 2) for i in range(count)]
+        plain = World(size=(edge, edge, edge))
+        start = time.perf_counter()
+        for x, y, z in positions:
+            plain.add_block(x, y, z)
+        plain_time = time.perf_counter() - start
+
+        directory = tempfile.mkdtemp()
+        try:
+            world = open_world(directory, size=(edge, edge, edge))
+            start = time.perf_counter()
+            for x, y, z in positions:
+                world.add_block(x, y, z)
+            journal_time = time.perf_counter() - start
+            start = time.perf_counter()
+            world.journal.flush()
+            flush_time = time.perf_counter() - start
+            log_size = world.journal.size()
+            world.journal.close()
+
+            start = time.perf_counter()
+            replayed = open_world(directory)
+            replay_time = time.perf_counter() - start
+            assert len(replayed.blocks) == len(world.blocks)
+            start = time.perf_counter()
+            replayed.journal.compact(directory)
+            compact_time = time.perf_counter() - start
+            replayed.journal.close()
+            replayed.close()
+        finally:
+            shutil.rmtree(directory)
+        print(f"{count:>8} {rate(count, plain_time):>10.0f} {rate(count, journal_time):>10.0f} {flush_time:>8.3f} "
+              f"{log_size / 1024:>8.0f}KB {replay_time:>8.3f} {compact_time:>8.3f}")
+
+
+def benchmark_terrain(sizes=((128, 64, 128), (256, 128, 256), (512, 256, 512)), seed=1):
+    """Time terrain generation in this process and in a process pool."""
+    print(f"{'cells':>12} {'blocks':>10} {'workers':>8} {'seconds':>8} {'cells/s':>12}")
+    for size in sizes:
+        cells = size[0] * size[1] * size[2]
+        for workers in (1, None):
+            world = World(size=size)
+            start = time.perf_counter()
+            generate_world(world, seed, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{cells:>12} {len(world.blocks):>10} {workers or os.cpu_count():>8} "
+                  f"{elapsed:>8.3f} {rate(cells, elapsed):>12.0f}")
+
+
+def benchmark_lighting(sizes=((64, 32, 64), (128, 64, 128)), edits=2000, seed=1):
+    """Time lighting a terrain world from scratch, then relighting after single-block and box edits."""
+    print(f"{'cells':>10} {'rebuild':>8} {'edits/s':>10} {'cells/edit':>10} {'box edit':>9}")
+    rng = np.random.default_rng(seed)
+    for size in sizes:
+        world = World(size=size)
+        generate_world(world, seed, workers=1)
+        start = time.perf_counter()
+        world.light = LightMap(world)
+        rebuild_time = time.perf_counter() - start
+
+        (x0, y0, z0), (x1, y1, z1) = world.bounds()
+        positions = rng.integers((x0, y0, z0), (x1, y1, z1), size=(edits, 3)).tolist()
+        start = time.perf_counter()
+        for x, y, z in positions:
+            if world.get_block(x, y, z):
+                world.remove_block(x, y, z)
+            else:
+                world.add_block(x, y, z)
+        edit_time = time.perf_counter() - start
+
+        center = [(x0 + x1) // 2, y1 // 2, (z0 + z1) // 2]
+        start = time.perf_counter()
+        world.clear_box([c - 4 for c in center], [c + 4 for c in center])
+        box_time = time.perf_counter() - start
+        cells = size[0] * size[1] * size[2]
+        print(f"{cells:>10} {rebuild_time:>8.3f} {rate(edits, edit_time):>10.0f} "
+              f"{world.light.updates / edits:>10.1f} {box_time:>9.3f}")
+
+
+def benchmark_lod(sizes=((256, 64, 256), (512, 64, 512)), seed=1):
+    """Compare drawing a terrain world at full detail with LOD regions picked from its center."""
+    print(f"{'cells':>10} {'chunks':>7} {'quads':>9} {'lod quads':>9} {'regions':>7} {'build':>7} {'select':>7} {'cache':>8}")
+    for size in sizes:
+        world = World(size=size)
+        generate_world(world, seed, workers=1)
+        meshes = world.get_meshes()
+        lod = LodManager(world, builds_per_frame=len(meshes))
+        viewer = (0.0, size[1] * 0.75, 0.0)
+        start = time.perf_counter()
+        regions, chunks = lod.select(viewer)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        lod.select(viewer)
+        select_time = time.perf_counter() - start
+        quads = sum(mesh.quad_count for mesh in meshes.values())
+        lod_quads = sum(mesh.quad_count for _, _, mesh in regions) + sum(
+            meshes[coord].quad_count for coord in chunks if coord in meshes)
+        print(f"{size[0] * size[1] * size[2]:>10} {len(meshes):>7} {quads:>9} {lod_quads:>9} {len(regions):>7} "
+              f"{build_time:>7.2f} {select_time * 1000:>5.1f}ms {lod.nbytes / 1024 ** 2:>6.1f}MB")
+
+
+def benchmark_instancing(sizes=((64, 32, 64), (256, 64, 256)), frames=1000, edits=50, seed=1):
+    """
+    Time the CPU side of instanced drawing: the camera matrices per frame with a still and
+    a moving camera, building the instance arrays of a terrain world, and bringing them up
+    to date after single-block edits.
+    """
+    camera = Camera()
+    start = time.perf_counter()
+    for _ in range(frames):
+        camera.look((0.0, 2.0, 0.0), (0.0, 0.0, -1.0), (0.0, 1.0, 0.0))
+    still = (time.perf_counter() - start) / frames
+    start = time.perf_counter()
+    for frame in range(frames):
+        camera.look((frame * 0.01, 2.0, 0.0), (0.0, 0.0, -1.0), (0.0, 1.0, 0.0))
+    moving = (time.perf_counter() - start) / frames
+    print(f"camera matrices per frame: {still * 1e6:.1f}us still, {moving * 1e6:.1f}us moving")
+
+    print(f"{'cells':>10} {'chunks':>7} {'instances':>9} {'build':>7} {'edit':>8}")
+    rng = np.random.default_rng(seed)
+    for size in sizes:
+        world = World(size=size)
+        generate_world(world, seed, workers=1)
+        instances = InstanceSet(world.blocks)
+        start = time.perf_counter()
+        instances.update(world.get_meshes())
+        build_time = time.perf_counter() - start
+        positions = sample_blocks(world, edits, rng)
+        start = time.perf_counter()
+        for position in positions:
+            world.remove_block(*position)
+            instances.update(world.get_meshes())
+        edit_time = (time.perf_counter() - start) / max(len(positions), 1)
+        print(f"{size[0] * size[1] * size[2]:>10} {len(instances.chunks):>7} {len(instances):>9} "
+              f"{build_time:>7.2f} {edit_time * 1000:>6.1f}ms")
+
+
+def benchmark_visibility(size=(256, 64, 256), edits=200, seed=1):
+    """
+    Compare the chunks drawn with frustum culling alone and with occlusion culling for
+    viewers underground and above a terrain world, and time the flood fills and searches.
+    """
+    world = World(size=size)
+    generate_world(world, seed, workers=1)
+    world.enable_occlusion_culling()
+    visibility = world.visibility
+    start = time.perf_counter()
+    for coord in world.blocks.coords():
+        visibility.chunk_links(coord)
+    print(f"flood fill: {len(visibility.links)} chunks in {time.perf_counter() - start:.2f}s")
+
+    camera = Camera(far=300.0)
+    print(f"{'viewer':>12} {'frustum':>8} {'drawn':>7} {'search':>8}")
+    for name, height in (("underground", size[1] * 0.15), ("above", size[1] - 0.5)):
+        eye = (0.5, height, 0.5)
+        camera.look(eye, (1.0, -0.3, 0.2), (0.0, 1.0, 0.0))
+        start = time.perf_counter()
+        reached = visibility.visible(eye, camera.frustum)
+        search_time = time.perf_counter() - start
+        coords = world.visible_chunks(camera.frustum)
+        drawn = sum(1 for coord in coords if coord in reached)
+        print(f"{name:>12} {len(coords):>8} {drawn:>7} {search_time * 1000:>6.1f}ms")
+
+    rng = np.random.default_rng(seed)
+    positions = sample_blocks(world, edits, rng)
+    start = time.perf_counter()
+    for position in positions:
+        world.remove_block(*position)
+        visibility.chunk_links(chunk_coords(*position)[0])
+    edit_time = (time.perf_counter() - start) / max(len(positions), 1)
+    print(f"edit and refill one chunk: {edit_time * 1000:.2f}ms")
+
+
+def benchmark_octree(size=(512, 128, 512), builds=8, scattered=200, queries=2000, seed=1):
+    """
+    Compare the sparse voxel octree with flat lookups in a mostly empty world holding a
+    few dense builds: raycasts against World.raycast's cell stepping, "any block in this
+    box?" against a dense copy of the box, and the nearest block against a scan of
+    every block.
+    """
+    rng = np.random.default_rng(seed)
+    world = World(size=size)
+    min_corner, max_corner = (np.array(corner) for corner in world.bounds())
+    for _ in range(builds):
+        corner = rng.integers(min_corner, max_corner - 32)
+        world.fill_box(corner.tolist(), (corner + rng.integers(8, 32, 3)).tolist())
+    for x, y, z in rng.integers(min_corner, max_corner, size=(scattered, 3)).tolist():
+        world.add_block(x, y, z)
+    start = time.perf_counter()
+    world.enable_octree()
+    print(f"{len(world.blocks)} blocks in {len(world.blocks.coords())} chunks, "
+          f"octree built in {time.perf_counter() - start:.3f}s")
+    print(f"{'query':<12} {'flat/s':>10} {'octree/s':>10} {'speedup':>8}")
+
+    def compare_rates(name, flat, indexed, count):
+        start = time.perf_counter()
+        expected = [flat(i) for i in range(count)]
+        flat_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [indexed(i) for i in range(count)]
+        indexed_time = time.perf_counter() - start
+        assert found == expected, name
+        print(f"{name:<12} {rate(count, flat_time):>10.0f} {rate(count, indexed_time):>10.0f} "
+              f"{flat_time / indexed_time:>7.1f}x")
+
+    octree = world.octree
+    flat_world = World(size=size)  # Shares the blocks, without the octree
+    flat_world.blocks = world.blocks
+    origins, directions = random_rays(world, queries, rng)
+    cell_hit = lambda hit: hit and hit[:2]  # Distances may differ in the last bits
+    compare_rates("raycast", lambda i: cell_hit(flat_world.raycast(origins[i], directions[i], 64.0)),
+                  lambda i: cell_hit(octree.raycast(origins[i], directions[i], 64.0)), queries)
+
+    lows = rng.integers(min_corner, max_corner, size=(queries, 3))
+    highs = np.minimum(lows + rng.integers(1, 128, size=(queries, 3)), max_corner)
+    compare_rates("any_in_box",
+                  lambda i: bool(world.blocks.to_dense(lows[i].tolist(), (highs[i] - lows[i]).tolist()).any()),
+                  lambda i: octree.any_in_box(lows[i].tolist(), highs[i].tolist()), queries)
+
+    cells = np.concatenate([np.argwhere(world.blocks.chunk(coord)) + np.array(coord) * CHUNK_SIZE
+                            for coord in world.blocks.coords()])
+    points = rng.uniform(min_corner, max_corner, size=(queries // 10, 3))
+
+    def flat_nearest(i):
+        gaps = np.maximum(np.maximum(cells - points[i], 0), points[i] - (cells + 1))
+        return round(float(np.sqrt((gaps ** 2).sum(axis=1)).min()), 9)
+
+    compare_rates("nearest", flat_nearest, lambda i: round(octree.nearest_solid(points[i].tolist())[1], 9), len(points))
+
+
+def benchmark_server(client_counts=(10, 50, 200), ticks=40, edits_per_tick=2, size=(256, 64, 256), seed=1):
+    """
+    Load-test the world server with simulated clients over in-process connections: each
+    client walks around, reports its position and requests edits every tick. Checks that
+    every client's mirror matches the server at the end.
+    """
+    world = World(size=size)
+    generate_world(world, seed, workers=1)
+    print(f"{'clients':>8} {'tick ms':>8} {'max ms':>8} {'edits/s':>9} {'snapshots':>10} {'deltas':>9} {'B/client/tick':>14}")
+    for count in client_counts:
+        print(asyncio.run(load_test(world, count, ticks, edits_per_tick, seed)))
+
+
+async def load_test(world, count, ticks, edits_per_tick, seed):
+    rng = np.random.default_rng(seed)
+    server = WorldServer(world)
+    clients = []
+    for _ in range(count):
+        server_end, client_end = memory_pair()
+        server.connect(server_end)
+        clients.append(WorldClient(client_end))
+    readers = [asyncio.ensure_future(client.receive_loop()) for client in clients]
+    min_corner, max_corner = (np.array(corner) for corner in world.bounds())
+    positions = rng.uniform(min_corner, max_corner, size=(count, 3))
+    tick_times = []
+    for _ in range(ticks):
+        positions = np.clip(positions + rng.normal(0, 2, size=positions.shape), min_corner, max_corner - 1)
+        for client, position in zip(clients, positions):
+            client.send_position(position.tolist())
+            for x, y, z in (position + rng.integers(-4, 5, size=(edits_per_tick, 3))).astype(int).tolist():
+                if rng.random() < 0.5:
+                    client.remove_block(x, y, z)
+                else:
+                    client.add_block(x, y, z, int(rng.integers(1, 9)))
+        start = time.perf_counter()
+        await server.tick()
+        tick_times.append(time.perf_counter() - start)
+    for client in clients:
+        await client.wait_tick(server.ticks - 1)
+        for coord in client.world.blocks.coords():
+            if not np.array_equal(client.world.blocks.chunk(coord), world.blocks.chunk(coord)):
+                raise RuntimeError(f"client {client.client_id}: mirrored chunk {coord} differs from the server")
+    server.close()
+    await asyncio.gather(*readers)
+
+    sent = server.snapshot_bytes + server.delta_bytes
+    return (f"{count:>8} {np.mean(tick_times) * 1000:>8.2f} {np.max(tick_times) * 1000:>8.2f} "
+            f"{rate(server.edits_applied, sum(tick_times)):>9.0f} {server.snapshot_bytes / 1024 ** 2:>8.1f}MB "
+            f"{server.delta_bytes / 1024:>7.0f}KB {sent / count / ticks:>14.0f}")
+
+
+def synthetic_world(edge, layout, seed=1):
+    """Build an edge^3 world, completely full (dense) or with SPARSE_FILL random blocks (sparse)."""
+    rng = np.random.default_rng(seed)
+    world = World(size=(edge, edge, edge))
+    (x0, y0, z0), (x1, y1, z1) = world.bounds()
+    for cx in range(x0 // CHUNK_SIZE, -(-x1 // CHUNK_SIZE)):
+        for cy in range(y0 // CHUNK_SIZE, -(-y1 // CHUNK_SIZE)):
+            for cz in range(z0 // CHUNK_SIZE, -(-z1 // CHUNK_SIZE)):
+                base = np.array((cx, cy, cz)) * CHUNK_SIZE
+                cells = np.indices((CHUNK_SIZE,) * 3) + base[:, None, None, None]
+                inside = np.all([(cells[i] >= (x0, y0, z0)[i]) & (cells[i] < (x1, y1, z1)[i]) for i in range(3)], axis=0)
+                if layout == "sparse":
+                    inside &= rng.random(inside.shape) < SPARSE_FILL
+                world.blocks.put_chunk((cx, cy, cz), inside.astype(np.uint8) * SOLID)
+    world.dirty_chunks.update(world.blocks.coords())
+    return world
+
+
+def sample_blocks(world, count, rng):
+    """Pick up to `count` random occupied positions, gathered from chunks in random order."""
+    coords = world.blocks.coords()
+    positions = []
+    for index in rng.permutation(len(coords)).tolist():
+        positions.extend(world.blocks.chunk_positions(coords[index]))
+        if len(positions) >= count * 4:
+            break
+    picked = rng.permutation(len(positions))[:count].tolist()
+    return [positions[i] for i in picked]
+
+
+def random_rays(world, count, rng):
+    """Rays starting anywhere in the world, pointing in random directions."""
+    (x0, y0, z0), (x1, y1, z1) = world.bounds()
+    return rng.uniform((x0, y0, z0), (x1, y1, z1), size=(count, 3)).tolist(), rng.normal(size=(count, 3)).tolist()
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def bench_edits(world, rng, count=20000):
+    """Remove random blocks, then add them back; returns (remove ops/s, add ops/s)."""
+    positions = sample_blocks(world, count, rng)
+    start = time.perf_counter()
+    for x, y, z in positions:
+        world.remove_block(x, y, z)
+    remove_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for x, y, z in positions:
+        world.add_block(x, y, z)
+    add_time = time.perf_counter() - start
+    return rate(len(positions), remove_time), rate(len(positions), add_time)
+
+
+def bench_bulk_edits(world):
+    """Copy the whole world, clear it and paste it back; returns (clear cells/s, paste cells/s)."""
+    min_corner, max_corner = world.bounds()
+    cells = np.prod([max_corner[i] - min_corner[i] for i in range(3)])
+    world.copy_box(min_corner, max_corner)
+    start = time.perf_counter()
+    world.clear_box(min_corner, max_corner)
+    clear_time = time.perf_counter() - start
+    start = time.perf_counter()
+    world.paste(min_corner, include_air=True)
+    paste_time = time.perf_counter() - start
+    return rate(cells, clear_time), rate(cells, paste_time)
+
+
+def bench_raycasts(world, rng, count=2000, max_distance=10.0):
+    """Returns (World.raycast rays/s, utils.raycast_to_grid rays/s over the full ray)."""
+    origins, directions = random_rays(world, count, rng)
+    start = time.perf_counter()
+    for origin, direction in zip(origins, directions):
+        world.raycast(origin, direction, max_distance)
+    raycast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for origin, direction in zip(origins, directions):
+        for _ in raycast_to_grid(origin, direction, max_distance):
+            pass
+    grid_time = time.perf_counter() - start
+    return rate(count, raycast_time), rate(count, grid_time)
+
+
+def bench_octree_raycasts(world, rng, count=2000, max_distance=10.0):
+    """Returns World.raycast rays/s with the sparse voxel octree enabled."""
+    origins, directions = random_rays(world, count, rng)
+    world.enable_octree()
+    start = time.perf_counter()
+    for origin, direction in zip(origins, directions):
+        world.raycast(origin, direction, max_distance)
+    elapsed = time.perf_counter() - start
+    world.octree = None
+    return rate(count, elapsed)
+
+
+def bench_render_prep(world):
+    """Rebuild every chunk mesh; returns (blocks meshed/s, quads, mesh bytes)."""
+    world.dirty_chunks.update(world.blocks.coords())
+    start = time.perf_counter()
+    meshes = world.get_meshes()
+    elapsed = time.perf_counter() - start
+    quads = sum(mesh.quad_count for mesh in meshes.values())
+    mesh_bytes = sum(mesh.vertices.nbytes + mesh.indices.nbytes + mesh.line_indices.nbytes
+                     + (mesh.colors.nbytes if mesh.colors is not None else 0) for mesh in meshes.values())
+    return rate(len(world.blocks), elapsed), quads, mesh_bytes
+
+
+def bench_player(world, steps=20000):
+    """Walk and jump the player on a fixed timestep; returns updates/s."""
+    (x0, y0, z0), (x1, y1, z1) = world.bounds()
+    player = Player(bounding_box=[(x0, x1), (y0, y1), (z0, z1)], start_position=(0.0, 2.0, 0.0))
+    engine = CoreEngine(headless=True, timestep=1 / 120)
+    keys = {"W": True, "D": True}
+
+    def update(delta_time):
+        if engine.steps % 60 == 0:
+            player.jump()
+        player.update(delta_time, keys, world)
+
+    start = time.perf_counter()
+    engine.run_headless(update, steps=steps)
+    return rate(steps, time.perf_counter() - start)
+
+
+def run_suite(sizes=QUICK_SIZES, layouts=LAYOUTS, seed=1):
+    """
+    Run every hot-path benchmark and return {metric name: {"value", "unit", "better"}}.
+    Metric names look like "dense/64/raycast".
+    """
+    results = {}
+
+    def record(name, value, unit, better="higher"):
+        results[name] = {"value": float(value), "unit": unit, "better": better}
+        print(f"{name:<32} {value:>16,.0f} {unit}")
+
+    for edge in sizes:
+        for layout in layouts:
+            rng = np.random.default_rng(seed)
+            start = time.perf_counter()
+            world = synthetic_world(edge, layout, seed)
+            prefix = f"{layout}/{edge}"
+            record(f"{prefix}/build", rate(edge ** 3, time.perf_counter() - start), "cells/s")
+            record(f"{prefix}/blocks", len(world.blocks), "blocks", better="info")
+            record(f"{prefix}/storage", world.blocks.nbytes(), "bytes", better="lower")
+
+            remove_rate, add_rate = bench_edits(world, rng)
+            record(f"{prefix}/remove_block", remove_rate, "ops/s")
+            record(f"{prefix}/add_block", add_rate, "ops/s")
+
+            clear_rate, paste_rate = bench_bulk_edits(world)
+            record(f"{prefix}/clear_box", clear_rate, "cells/s")
+            record(f"{prefix}/paste", paste_rate, "cells/s")
+
+            raycast_rate, grid_rate = bench_raycasts(world, rng)
+            record(f"{prefix}/raycast", raycast_rate, "rays/s")
+            record(f"{prefix}/raycast_to_grid", grid_rate, "rays/s")
+            record(f"{prefix}/raycast_octree", bench_octree_raycasts(world, rng), "rays/s")
+
+            mesh_rate, quads, mesh_bytes = bench_render_prep(world)
+            record(f"{prefix}/render_prep", mesh_rate, "blocks/s")
+            record(f"{prefix}/quads", quads, "quads", better="lower")
+            record(f"{prefix}/mesh_memory", mesh_bytes, "bytes", better="lower")
+
+            record(f"{prefix}/player_update", bench_player(world), "updates/s")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print how each metric moved against the baseline; returns the list of regressed metric names."""
+    regressions = []
+    print(f"\n{'metric':<32} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or current["better"] == "info" or not previous["value"]:
+            continue
+        change = current["value"] / previous["value"] - 1.0
+        worse = -change if current["better"] == "higher" else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {previous['value']:>14,.0f} {current['value']:>14,.0f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def run_reports():
+    """Print the standalone comparison reports."""
+    compare_block_storage()
+    benchmark_meshing()
+    benchmark_batch_raycast()
+    check_persistence()
+    benchmark_persistence()
+    benchmark_journal()
+    benchmark_terrain()
+    benchmark_lighting()
+    benchmark_lod()
+    benchmark_instancing()
+    benchmark_visibility()
+    benchmark_octree()
+    benchmark_server()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="run sizes up to 256^3 instead of up to 64^3")
+    parser.add_argument("--sizes", type=int, nargs="+", help="world edge lengths to run")
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--baseline", help="JSON file of earlier results to compare against")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--reports", action="store_true", help="print the standalone comparison reports")
+    parser.add_argument("--check", action="store_true", help="only run the correctness checks")
+    args = parser.parse_args()
+
+    if args.check:
+        check_persistence()
+        return 0
+    if args.reports:
+        run_reports()
+        return 0
+
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+    results = run_suite(sizes, args.layouts)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+import numpy as np
+
+from chunks import AIR, SOLID
+
+# Properties shared by every block of one type. Blocks store only their type's index
+# in PALETTE as a one-byte ID, so adding properties costs no memory per block.
+# - color: RGBA face color
+# - solid: the player collides with it
+# - transparent: faces behind it stay visible, light passes, and it is drawn blended after opaque blocks
+# - light: level of the light it gives off (0 for none, up to lighting.MAX_LIGHT)
+BlockType = namedtuple("BlockType", ["name", "color", "solid", "transparent", "light"], defaults=[0])
+
+STONE = SOLID
+DIRT = 2
+GRASS = 3
+SAND = 4
+WOOD = 5
+LEAVES = 6
+GLASS = 7
+WATER = 8
+LAMP = 9
+
+PALETTE = [
+    BlockType("air", (0.0, 0.0, 0.0, 0.0), False, True),
+    BlockType("stone", (0.6, 0.6, 0.6, 1.0), True, False),
+    BlockType("dirt", (0.5, 0.35, 0.2, 1.0), True, False),
+    BlockType("grass", (0.3, 0.7, 0.25, 1.0), True, False),
+    BlockType("sand", (0.9, 0.85, 0.6, 1.0), True, False),
+    BlockType("wood", (0.55, 0.4, 0.25, 1.0), True, False),
+    BlockType("leaves", (0.2, 0.5, 0.15, 0.8), True, True),
+    BlockType("glass", (0.8, 0.9, 1.0, 0.3), True, True),
+    BlockType("water", (0.2, 0.4, 0.9, 0.5), False, True),
+    BlockType("lamp", (1.0, 0.9, 0.5, 1.0), True, False, 14),
+]
+assert PALETTE[AIR].name == "air"
+
+
+def property_table(name, dtype=bool):
+    """Return a 256-entry array of one property, indexable by any uint8 block ID array."""
+    table = np.zeros(256, dtype=dtype)
+    for block_id, block_type in enumerate(PALETTE):
+        table[block_id] = getattr(block_type, name)
+    return table
+
+
+# Lookup tables by block ID; IDs missing from the palette are neither solid nor opaque
+IS_SOLID = property_table("solid")
+IS_TRANSPARENT = property_table("transparent")
+IS_OPAQUE = ~IS_TRANSPARENT  # Opaque blocks hide the faces of the blocks next to them
+IS_OPAQUE[len(PALETTE):] = False
+LIGHT_EMISSION = property_table("light", np.uint8)
+
+
+def block_color(block_id):
+    """Return the RGBA face color of a block type (magenta for unknown IDs)."""
+    if block_id < len(PALETTE):
+        return PALETTE[block_id].color
+    return (1.0, 0.0, 1.0, 1.0)
+
+
+COLORS = np.array([block_color(block_id) for block_id in range(256)], dtype=np.float32)  # (256, 4) RGBA
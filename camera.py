@@ -0,0 +1,63 @@
+"""
+Camera matrices computed in Python instead of by gluLookAt/gluPerspective.
+
+The view matrix, the combined view-projection matrix and the frustum are only rebuilt
+when the camera pose changes (and the projection when the lens does), so a still camera
+costs nothing per frame. Nothing here needs a GL context.
+"""
+import numpy as np
+
+from frustum import Frustum
+from utils import look_at_matrix, perspective_matrix
+
+
+def column_major(matrix):
+    """Return a 4x4 matrix as the float32 column-major array glLoadMatrixf and glUniformMatrix4fv take."""
+    return np.ascontiguousarray(np.asarray(matrix).T, dtype=np.float32)
+
+
+class Camera:
+    """Perspective camera with cached view, projection and view-projection matrices (clip = M @ v)."""
+
+    def __init__(self, fov=45.0, aspect=4 / 3, near=0.1, far=100.0):
+        self.lens = None  # (fov, aspect, near, far) the projection was built for
+        self.pose = None  # (eye, front, up) the view was built for
+        self.projection = None
+        self.view = np.identity(4)
+        self.view_projection = None
+        self.view_columns = column_major(self.view)  # The view matrix ready for glLoadMatrixf
+        self.view_projection_columns = None  # The view-projection matrix ready for a shader uniform
+        self.frustum = None  # Frustum of the current view-projection matrix
+        self.updates = 0  # Times the view-projection matrix was recomputed
+        self.set_lens(fov, aspect, near, far)
+
+    def set_lens(self, fov, aspect, near, far):
+        """Change the projection (vertical fov in degrees); does nothing if it is unchanged."""
+        lens = (fov, aspect, near, far)
+        if lens == self.lens:
+            return False
+        self.lens = lens
+        self.projection = perspective_matrix(fov, aspect, near, far)
+        self.update_view_projection()
+        return True
+
+    def look(self, eye, front, up):
+        """
+        Point the camera from `eye` along `front`. The matrices are recomputed only when
+        the pose differs from the last call; returns whether they were.
+        """
+        pose = (tuple(float(c) for c in eye), tuple(float(c) for c in front), tuple(float(c) for c in up))
+        if pose == self.pose:
+            return False
+        self.pose = pose
+        eye, front, up = pose
+        self.view = look_at_matrix(eye, [eye[i] + front[i] for i in range(3)], up)
+        self.view_columns = column_major(self.view)
+        self.update_view_projection()
+        return True
+
+    def update_view_projection(self):
+        self.view_projection = self.projection @ self.view
+        self.view_projection_columns = column_major(self.view_projection)
+        self.frustum = Frustum.from_matrix(self.view_projection)
+        self.updates += 1
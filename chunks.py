@@ -0,0 +1,242 @@
+import numpy as np
+
+CHUNK_SIZE = 16  # Edge length of a cubic storage chunk, in blocks
+AIR = 0  # Block ID of an empty cell
+SOLID = 1  # Block ID of a plain occupied cell
+
+
+def chunk_coords(x, y, z):
+    """Split a block position into its chunk coordinate and local offset."""
+    return (
+        (x // CHUNK_SIZE, y // CHUNK_SIZE, z // CHUNK_SIZE),
+        (x % CHUNK_SIZE, y % CHUNK_SIZE, z % CHUNK_SIZE),
+    )
+
+
+class ChunkStorage:
+    """
+    Sparse block storage made of fixed-size chunks.
+    Each non-empty chunk is one CHUNK_SIZE^3 bytearray of block IDs (AIR = empty),
+    exposed to vectorized code as a zero-copy (x, y, z) NumPy view in `chunks`.
+    Chunks without any blocks are dropped from the map entirely.
+
+    Chunks can also be registered as lazy: their data stays in a source object
+    (anything with a `read_chunk(coord)` method returning the chunk's bytes) until the
+    chunk is first accessed. Use chunk() and coords() rather than `chunks` directly
+    when lazy chunks may be present. Sources added to `sources` are owned by the
+    storage and released by close().
+    """
+
+    def __init__(self):
+        self.chunks = {}  # {(cx, cy, cz): np.ndarray view of the chunk buffer}
+        self.buffers = {}  # {(cx, cy, cz): bytearray of block IDs, x-major}
+        self.counts = {}  # {(cx, cy, cz): number of non-air cells in the chunk, loaded or lazy}
+        self.lazy = {}  # {(cx, cy, cz): source of a chunk that has not been loaded yet}
+        self.sources = []  # Sources with a close() method (e.g. mapped region files) owned by the storage
+        self.block_count = 0
+
+    def get(self, x, y, z):
+        """Return the block ID at the given position (AIR if empty)."""
+        coord = (x // CHUNK_SIZE, y // CHUNK_SIZE, z // CHUNK_SIZE)
+        buffer = self.buffers.get(coord)
+        if buffer is None:
+            if coord not in self.lazy:
+                return AIR
+            buffer = self.load(coord)
+            if buffer is None:
+                return AIR
+        return buffer[((x % CHUNK_SIZE) * CHUNK_SIZE + y % CHUNK_SIZE) * CHUNK_SIZE + z % CHUNK_SIZE]
+
+    def set(self, x, y, z, value):
+        """Set the block ID at the given position, allocating or freeing chunks as needed."""
+        coord = (x // CHUNK_SIZE, y // CHUNK_SIZE, z // CHUNK_SIZE)
+        buffer = self.buffers.get(coord)
+        if buffer is None and coord in self.lazy:
+            buffer = self.load(coord)
+        if buffer is None:
+            if value == AIR:
+                return
+            buffer = self.allocate(coord)
+
+        index = ((x % CHUNK_SIZE) * CHUNK_SIZE + y % CHUNK_SIZE) * CHUNK_SIZE + z % CHUNK_SIZE
+        previous = buffer[index]
+        buffer[index] = value
+        delta = (value != AIR) - (previous != AIR)
+        if delta:
+            self.counts[coord] += delta
+            self.block_count += delta
+            if self.counts[coord] == 0:
+                self.release(coord)
+
+    def allocate(self, coord):
+        """Create an empty chunk buffer at the given chunk coordinate."""
+        buffer = self.buffers[coord] = bytearray(CHUNK_SIZE ** 3)
+        self.chunks[coord] = np.frombuffer(buffer, dtype=np.uint8).reshape((CHUNK_SIZE,) * 3)
+        self.counts[coord] = 0
+        return buffer
+
+    def release(self, coord):
+        """Drop a chunk from the map."""
+        self.block_count -= self.counts.pop(coord)
+        del self.chunks[coord]
+        del self.buffers[coord]
+
+    def discard(self, coord):
+        """Drop a chunk from the map, whether it is loaded or lazy."""
+        if coord in self.lazy:
+            del self.lazy[coord]
+            self.block_count -= self.counts.pop(coord)
+        elif coord in self.buffers:
+            self.release(coord)
+
+    def put_chunk(self, coord, data):
+        """Replace a whole chunk with CHUNK_SIZE^3 block IDs (a bytes-like object or uint8 array, x-major)."""
+        if isinstance(data, np.ndarray):
+            data = data.astype(np.uint8, copy=False).reshape(-1)
+        else:
+            data = np.frombuffer(data, dtype=np.uint8)
+        self.discard(coord)
+        count = int(np.count_nonzero(data))
+        if count:
+            self.allocate(coord)
+            self.chunks[coord].reshape(-1)[:] = data
+            self.counts[coord] = count
+            self.block_count += count
+
+    def add_lazy(self, coord, source, count):
+        """Register a chunk whose `count` blocks will be read from `source` on first access."""
+        self.discard(coord)
+        self.lazy[coord] = source
+        self.counts[coord] = count
+        self.block_count += count
+
+    def copy(self):
+        """
+        Return an independent copy of the storage. Loaded chunks are copied; lazy ones
+        stay lazy and share their source, which the original keeps owning.
+        """
+        storage = ChunkStorage()
+        for coord, buffer in self.buffers.items():
+            storage.buffers[coord] = bytearray(buffer)
+            storage.chunks[coord] = np.frombuffer(storage.buffers[coord], dtype=np.uint8).reshape((CHUNK_SIZE,) * 3)
+        storage.counts = dict(self.counts)
+        storage.lazy = dict(self.lazy)
+        storage.block_count = self.block_count
+        return storage
+
+    def close(self):
+        """Close the owned sources. Chunks still lazy cannot be loaded afterwards."""
+        for source in self.sources:
+            source.close()
+        self.sources.clear()
+
+    def load(self, coord):
+        """Read a lazy chunk from its source and return its buffer."""
+        source = self.lazy[coord]
+        self.put_chunk(coord, source.read_chunk(coord))
+        return self.buffers.get(coord)
+
+    def chunk(self, coord):
+        """Return the (x, y, z) block ID array of a chunk, loading it if lazy (None if empty)."""
+        chunk = self.chunks.get(coord)
+        if chunk is None and coord in self.lazy:
+            self.load(coord)
+            chunk = self.chunks.get(coord)
+        return chunk
+
+    def coords(self):
+        """Return the coordinates of all non-empty chunks, loaded or lazy."""
+        return list(self.counts)
+
+    def chunk_positions(self, coord):
+        """Yield the world positions of all occupied cells in one chunk."""
+        chunk = self.chunk(coord)
+        if chunk is None:
+            return
+        base = (coord[0] * CHUNK_SIZE, coord[1] * CHUNK_SIZE, coord[2] * CHUNK_SIZE)
+        for lx, ly, lz in np.argwhere(chunk).tolist():
+            yield (base[0] + lx, base[1] + ly, base[2] + lz)
+
+    def chunks_in_box(self, min_corner, max_corner):
+        """Return the coordinates of the non-empty chunks overlapping a box (max_corner exclusive)."""
+        low = [min_corner[i] // CHUNK_SIZE for i in range(3)]
+        high = [-(-max_corner[i] // CHUNK_SIZE) for i in range(3)]
+        if (high[0] - low[0]) * (high[1] - low[1]) * (high[2] - low[2]) > len(self.counts):
+            return [coord for coord in self.counts if all(low[i] <= coord[i] < high[i] for i in range(3))]
+        return [
+            (cx, cy, cz)
+            for cx in range(low[0], high[0]) for cy in range(low[1], high[1]) for cz in range(low[2], high[2])
+            if (cx, cy, cz) in self.counts
+        ]
+
+    def box_overlaps(self, coord, min_corner, max_corner):
+        """
+        Yield (box slice, chunk slice) index tuples pairing the part of a box that lies
+        in one chunk with the same cells of the chunk array; nothing if they do not overlap.
+        """
+        base = [coord[i] * CHUNK_SIZE for i in range(3)]
+        low = [max(base[i], min_corner[i]) for i in range(3)]
+        high = [min(base[i] + CHUNK_SIZE, max_corner[i]) for i in range(3)]
+        if all(low[i] < high[i] for i in range(3)):
+            yield (
+                tuple(slice(low[i] - min_corner[i], high[i] - min_corner[i]) for i in range(3)),
+                tuple(slice(low[i] - base[i], high[i] - base[i]) for i in range(3)),
+            )
+
+    def to_dense(self, min_corner, shape):
+        """Copy the block IDs of the box starting at min_corner with the given shape into one array."""
+        dense = np.zeros(shape, dtype=np.uint8)
+        max_corner = [min_corner[i] + shape[i] for i in range(3)]
+        for coord in self.chunks_in_box(min_corner, max_corner):
+            for target, source in self.box_overlaps(coord, min_corner, max_corner):
+                dense[target] = self.chunk(coord)[source]
+        return dense
+
+    def write_box(self, min_corner, shape, values, mask=None):
+        """
+        Write block IDs into the box starting at min_corner with the given shape, one
+        vectorized assignment per chunk. `values` is a single ID or an array of the box's
+        shape; where the optional boolean `mask` is False the cells keep their blocks.
+        Returns the number of cells whose ID changed.
+        """
+        values = np.broadcast_to(np.asarray(values, dtype=np.uint8), shape)
+        max_corner = [min_corner[i] + shape[i] for i in range(3)]
+        low = [min_corner[i] // CHUNK_SIZE for i in range(3)]
+        high = [-(-max_corner[i] // CHUNK_SIZE) for i in range(3)]
+        changed = 0
+        for cx in range(low[0], high[0]):
+            for cy in range(low[1], high[1]):
+                for cz in range(low[2], high[2]):
+                    coord = (cx, cy, cz)
+                    for target, source in self.box_overlaps(coord, min_corner, max_corner):
+                        chunk = self.chunk(coord)
+                        new = values[target]
+                        if mask is not None:
+                            new = np.where(mask[target], new, AIR if chunk is None else chunk[source])
+                        if chunk is None:
+                            if not new.any():
+                                continue
+                            self.allocate(coord)
+                            chunk = self.chunks[coord]
+                        changed += int(np.count_nonzero(chunk[source] != new))
+                        chunk[source] = new
+                        count = int(np.count_nonzero(chunk))
+                        self.block_count += count - self.counts[coord]
+                        self.counts[coord] = count
+                        if count == 0:
+                            self.release(coord)
+        return changed
+
+    def nbytes(self):
+        """Approximate memory used by the chunk buffers."""
+        return len(self.buffers) * CHUNK_SIZE ** 3
+
+    def __contains__(self, position):
+        return self.get(*position) != AIR
+
+    def __iter__(self):
+        for coord in self.coords():
+            yield from self.chunk_positions(coord)
+
+    def __len__(self):
+        return self.block_count
@@ -3,17 +3,65 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 import time
 
+from profiler import FrameProfiler
+
+
+class FixedTimestep:
+    """
+    Turns variable frame times into a whole number of fixed simulation steps.
+    Leftover time carries over to the next frame; `alpha` is how far the leftover
+    reaches into the next step, for interpolating what is rendered.
+    """
+
+    def __init__(self, timestep=1 / 60, max_steps=8):
+        self.timestep = timestep
+        self.max_steps = max_steps  # Cap per frame, so a long stall cannot snowball
+        self.accumulator = 0.0
+
+    def advance(self, frame_time):
+        """Add a frame's worth of time and return how many steps to simulate."""
+        self.accumulator += min(frame_time, self.timestep * self.max_steps)
+        steps = int(self.accumulator // self.timestep)
+        self.accumulator -= steps * self.timestep
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.timestep
+
 
 class CoreEngine:
-    def __init__(self, width=800, height=600, title="Simple Minecraft"):
+    def __init__(self, width=800, height=600, title="Simple Minecraft", headless=False, timestep=None):
         self.width = width
         self.height = height
         self.title = title
+        self.headless = headless  # Run without a window or GL context
+        self.timestep = timestep  # Fixed simulation step in seconds, or None to step by frame time
         self.window = None
         self.last_time = time.time()
         self.delta_time = 0
+        self.alpha = 1.0  # Interpolation factor between the last two simulation steps
+        self.steps = 0  # Number of update_func calls so far
+        self.sim_time = 0.0  # Simulated time so far
+        self.profiler = FrameProfiler()  # Per-phase frame timings, disabled until enabled
+        self.fov = 45  # Vertical field of view in degrees
+        self.near = 0.1  # Near clipping plane distance
+        self.far = 100.0  # Far clipping plane distance
+        # Frame pacing, see run()
+        self.max_fps = None  # Frame cap; run() sleeps out the rest of each frame (None: uncapped)
+        self.render_on_demand = False  # Skip drawing frames in which nothing changed
+        self.idle_poll_rate = 10.0  # Loop iterations per second while nothing changes
+        self.scene_changed = None  # Optional callback returning whether anything visible changed since it was last called
+        self.redraw_requested = True  # Set by request_redraw() until the next frame is drawn
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self.wall_time = 0.0  # Seconds spent in run()
+        self.cpu_time = 0.0  # Process CPU seconds used during run()
 
     def initialize(self):
+        if self.headless:
+            return  # Nothing to set up without a window
+
         if not glfw.init():
             raise Exception("GLFW could not be initialized!")
         self.window = glfw.create_window(self.width, self.height, self.title, None, None)
@@ -27,32 +75,149 @@ class CoreEngine:
         # Set callbacks for input
         glfw.set_key_callback(self.window, self.key_callback)
         glfw.set_cursor_pos_callback(self.window, self.mouse_callback)
+        glfw.set_window_refresh_callback(self.window, lambda window: self.request_redraw())
         glfw.set_input_mode(self.window, glfw.CURSOR, glfw.CURSOR_DISABLED)
 
         # Setup projection matrix
         glMatrixMode(GL_PROJECTION)
-        gluPerspective(45, self.width / self.height, 0.1, 100.0)
+        gluPerspective(self.fov, self.width / self.height, self.near, self.far)
         glMatrixMode(GL_MODELVIEW)
 
     def key_callback(self, window, key, scancode, action, mods):
-        pass  # Will delegate to the Player module later
+        self.request_redraw()
 
     def mouse_callback(self, window, xpos, ypos):
-        pass  # Will delegate to the Player module later
+        self.request_redraw()
+
+    def request_redraw(self):
+        """Make run() draw the next frame even if render_on_demand finds nothing changed."""
+        self.redraw_requested = True
+
+    def needs_redraw(self):
+        """Whether the frame being run has to be drawn."""
+        if not self.render_on_demand or self.redraw_requested:
+            return True
+        return self.scene_changed is not None and self.scene_changed()
+
+    def pacing_stats(self):
+        """Return the frames drawn and skipped by run() and the CPU it used, as a share of one core."""
+        return {
+            "frames_rendered": self.frames_rendered,
+            "frames_skipped": self.frames_skipped,
+            "fps": self.frames_rendered / self.wall_time if self.wall_time else 0.0,
+            "cpu_percent": 100.0 * self.cpu_time / self.wall_time if self.wall_time else 0.0,
+        }
+
+    def step(self, update_func, delta_time):
+        """Advance the simulation by one update_func call."""
+        update_func(delta_time)
+        self.steps += 1
+        self.sim_time += delta_time
 
     def run(self, update_func, render_func):
+        """
+        Run the main loop until the window is closed.
+        With max_fps set, each frame sleeps until its share of a second is over instead of
+        spinning. With render_on_demand, frames in which there was no input, no redraw
+        request and no change reported by scene_changed() are not drawn; the loop then
+        waits for input at idle_poll_rate until something changes.
+        """
+        if self.headless:
+            raise Exception("A headless engine has no window, use run_headless() instead!")
+
+        fixed = FixedTimestep(self.timestep) if self.timestep else None
+        idle = False
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
         while not glfw.window_should_close(self.window):
+            frame_start = time.perf_counter()
+            profiler = self.profiler
+            profiler.begin_frame()
+            with profiler.phase("poll"):
+                if idle:
+                    glfw.wait_events_timeout(1.0 / self.idle_poll_rate)  # Sleeps until input or the timeout
+                else:
+                    glfw.poll_events()
+
             # Calculate delta time
             current_time = time.time()
             self.delta_time = current_time - self.last_time
             self.last_time = current_time
 
-            glfw.poll_events()
+            # Update, either once by frame time or in fixed steps
+            with profiler.phase("update"):
+                if fixed:
+                    for _ in range(fixed.advance(self.delta_time)):
+                        self.step(update_func, fixed.timestep)
+                    self.alpha = fixed.alpha
+                else:
+                    self.step(update_func, self.delta_time)
 
-            # Update and render
-            update_func(self.delta_time)
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-            render_func()
-            glfw.swap_buffers(self.window)
+            idle = not self.needs_redraw()
+            if idle:
+                self.frames_skipped += 1
+            else:
+                self.redraw_requested = False
+                with profiler.phase("render"):
+                    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                    render_func()
+                profiler.render_overlay(self.width, self.height)
+                with profiler.phase("swap"):
+                    glfw.swap_buffers(self.window)
+                self.frames_rendered += 1
 
+            if self.max_fps and not idle:
+                with profiler.phase("pace"):
+                    time.sleep(max(0.0, frame_start + 1.0 / self.max_fps - time.perf_counter()))
+            profiler.end_frame()
+
+        self.wall_time += time.perf_counter() - start_wall
+        self.cpu_time += time.process_time() - start_cpu
         glfw.terminate()
+
+    def run_headless(self, update_func, steps=None, duration=None, render_func=None, realtime=False):
+        """
+        Run update_func on a fixed timestep without a window, e.g. for soak tests,
+        deterministic regression runs or server-side simulation.
+        - steps / duration: How many steps, or how many simulated seconds, to run.
+        - render_func: Optional callback run after every frame's updates, with engine.alpha set.
+        - realtime: Pace the steps to the wall clock instead of running as fast as possible.
+        Every update_func call gets exactly the same delta time, so results do not
+        depend on how fast the machine is. Returns the number of steps run.
+        """
+        timestep = self.timestep or 1 / 60
+        if steps is None:
+            if duration is None:
+                raise ValueError("run_headless() needs steps or duration")
+            steps = int(round(duration / timestep))
+
+        start_steps = self.steps
+        if not realtime:
+            # As fast as possible: every frame is exactly one step
+            profiler = self.profiler
+            for _ in range(steps):
+                profiler.begin_frame()
+                with profiler.phase("update"):
+                    self.step(update_func, timestep)
+                self.alpha = 1.0
+                if render_func:
+                    with profiler.phase("render"):
+                        render_func()
+                profiler.end_frame()
+            return self.steps - start_steps
+
+        fixed = FixedTimestep(timestep)
+        last_time = time.perf_counter()
+        while self.steps - start_steps < steps:
+            current_time = time.perf_counter()
+            self.delta_time = current_time - last_time
+            last_time = current_time
+
+            for _ in range(min(fixed.advance(self.delta_time), steps - (self.steps - start_steps))):
+                self.step(update_func, timestep)
+            self.alpha = fixed.alpha
+            if render_func:
+                render_func()
+
+            # Sleep until the next step is due
+            time.sleep(max(0.0, timestep - fixed.accumulator))
+        return self.steps - start_steps
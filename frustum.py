@@ -0,0 +1,70 @@
+import numpy as np
+
+from utils import look_at_matrix, perspective_matrix
+
+
+class Frustum:
+    """
+    The six clipping planes of a perspective camera, as (a, b, c, d) rows with
+    normals pointing inwards: a point p is inside a plane when a*x + b*y + c*z + d >= 0.
+    """
+
+    def __init__(self, planes):
+        self.planes = planes  # (6, 4) array: left, right, bottom, top, near, far
+
+    @classmethod
+    def from_matrix(cls, view_projection):
+        """Extract the planes from a combined projection @ view matrix (Gribb/Hartmann)."""
+        m = np.asarray(view_projection, dtype=np.float64)
+        planes = np.array([
+            m[3] + m[0], m[3] - m[0],  # Left, right
+            m[3] + m[1], m[3] - m[1],  # Bottom, top
+            m[3] + m[2], m[3] - m[2],  # Near, far
+        ])
+        planes /= np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+        return cls(planes)
+
+    @classmethod
+    def from_camera(cls, position, front, up, fov, aspect, near, far):
+        """Build the frustum of the camera set up by gluPerspective and gluLookAt."""
+        target = [position[i] + front[i] for i in range(3)]
+        view = look_at_matrix(position, target, up)
+        return cls.from_matrix(perspective_matrix(fov, aspect, near, far) @ view)
+
+    def contains_point(self, point):
+        """Check if a point is inside all six planes."""
+        return bool(np.all(self.planes[:, :3] @ np.asarray(point, dtype=np.float64) + self.planes[:, 3] >= 0))
+
+    def intersects_box(self, min_corner, max_corner):
+        """Check if an axis-aligned box is at least partly inside the frustum."""
+        return bool(self.intersects_boxes([min_corner], [max_corner])[0])
+
+    def intersects_boxes(self, min_corners, max_corners):
+        """
+        Test N axis-aligned boxes at once. Returns a (N,) bool array, False for boxes
+        that are entirely outside one of the planes.
+        """
+        min_corners = np.asarray(min_corners, dtype=np.float64).reshape(-1, 1, 3)
+        max_corners = np.asarray(max_corners, dtype=np.float64).reshape(-1, 1, 3)
+        normals = self.planes[None, :, :3]
+        # The box corner furthest along each plane normal
+        farthest = np.where(normals >= 0, max_corners, min_corners)
+        distances = np.sum(farthest * normals, axis=2) + self.planes[None, :, 3]
+        return np.all(distances >= 0, axis=1)
+
+
+class CullingStats:
+    """Counters for the chunks seen by the culling stage in the last frame."""
+
+    def __init__(self):
+        self.tested = 0
+        self.culled = 0
+        self.occluded = 0  # In the frustum but walled off from the viewer
+        self.drawn = 0
+
+    def reset(self):
+        self.tested = self.culled = self.occluded = self.drawn = 0
+
+    def __repr__(self):
+        return (f"CullingStats(tested={self.tested}, culled={self.culled}, occluded={self.occluded}, "
+                f"drawn={self.drawn})")
@@ -0,0 +1,118 @@
+"""
+GL-independent data for drawing blocks as instanced cubes.
+
+Every block with at least one face that can be seen becomes one instance: an offset
+(its position) and an RGBA color. One unit cube is stored once and drawn for all the
+instances in a single call by renderer.InstancedCubeRenderer. Instances are kept per
+chunk and rebuilt only for chunks whose mesh changed, then packed with all the opaque
+blocks first so the transparent ones can be blended in a second call.
+"""
+import numpy as np
+
+from block_types import COLORS, IS_TRANSPARENT
+from chunks import AIR, CHUNK_SIZE
+from mesher import exposed_faces, padded_chunk
+
+# Shade of each cube face, like a light from above and slightly to one side
+FACE_SHADES = {(1, 1): 1.0, (1, -1): 0.5, (0, 1): 0.8, (0, -1): 0.7, (2, 1): 0.9, (2, -1): 0.6}  # {(axis, direction): shade}
+
+
+def cube_triangles():
+    """
+    Return the unit cube [0, 1]^3 as a (36, 4) float32 array of triangle vertices:
+    x, y, z and the shade of the face, counter-clockwise seen from outside.
+    """
+    vertices = []
+    for (axis, direction), shade in FACE_SHADES.items():
+        u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+        corners = [(0, 0), (1, 0), (1, 1), (0, 1)]
+        if direction < 0:
+            corners.reverse()
+        face = []
+        for u, v in corners:
+            corner = [0.0, 0.0, 0.0, shade]
+            corner[axis] = 1.0 if direction > 0 else 0.0
+            corner[u_axis], corner[v_axis] = u, v
+            face.append(corner)
+        vertices.extend(face[i] for i in (0, 1, 2, 0, 2, 3))
+    return np.array(vertices, dtype=np.float32)
+
+
+def cube_edges():
+    """Return the twelve edges of the unit cube as a (24, 4) float32 array of line vertices (shade 1)."""
+    edges = []
+    for i in range(8):
+        for axis in range(3):
+            if not i & (1 << axis):
+                # Corner i has bit `axis` set when it lies on the 1 side of that axis
+                for corner in (i, i | (1 << axis)):
+                    edges.append([float((corner >> bit) & 1) for bit in range(3)] + [1.0])
+    return np.array(edges, dtype=np.float32)
+
+
+def exposed_blocks(padded, coord):
+    """
+    Return (positions, block IDs) of the blocks of a chunk with at least one face that
+    can be seen, from its padded_chunk() snapshot: an (N, 3) int32 array of world
+    positions and an (N,) uint8 array, in x, y, z order.
+    """
+    exposed = np.zeros((CHUNK_SIZE,) * 3, dtype=bool)
+    if padded[1:-1, 1:-1, 1:-1].any():
+        for axis in range(3):
+            for direction in (-1, 1):
+                exposed |= exposed_faces(padded, axis, direction) != AIR
+    positions = np.argwhere(exposed).astype(np.int32) + np.array(coord, dtype=np.int32) * CHUNK_SIZE
+    return positions, padded[1:-1, 1:-1, 1:-1][exposed]
+
+
+def pack_instances(positions, block_ids):
+    """
+    Turn block positions and IDs into instance arrays, opaque blocks first. Returns
+    ((N, 3) float32 offsets, (N, 4) uint8 colors, number of opaque instances).
+    """
+    order = np.argsort(IS_TRANSPARENT[block_ids], kind="stable")
+    positions, block_ids = positions[order], block_ids[order]
+    offsets = positions.astype(np.float32)
+    colors = (COLORS[block_ids] * 255 + 0.5).astype(np.uint8)
+    return offsets, colors, int(np.count_nonzero(~IS_TRANSPARENT[block_ids]))
+
+
+class InstanceSet:
+    """
+    The instance arrays of a whole world, kept in step with its chunk meshes: a chunk's
+    instances are rebuilt whenever a different Mesh object is passed for it.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.chunks = {}  # {chunk coord: (Mesh the instances match, positions, block IDs)}
+        self.offsets = np.zeros((0, 3), dtype=np.float32)  # (N, 3) block positions, opaque blocks first
+        self.colors = np.zeros((0, 4), dtype=np.uint8)  # (N, 4) RGBA per instance
+        self.opaque_count = 0  # Instances [0, opaque_count) are opaque, the rest transparent
+        self.version = 0  # Incremented whenever the arrays change
+        self.rebuilds = 0  # Chunks whose instances were rebuilt
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def update(self, meshes):
+        """Bring the arrays up to date with {chunk coord: Mesh}. Returns whether they changed."""
+        changed = False
+        for coord in [coord for coord in self.chunks if coord not in meshes]:
+            del self.chunks[coord]
+            changed = True
+        for coord, mesh in meshes.items():
+            cached = self.chunks.get(coord)
+            if cached is None or cached[0] is not mesh:
+                self.chunks[coord] = (mesh,) + exposed_blocks(padded_chunk(self.storage, coord), coord)
+                self.rebuilds += 1
+                changed = True
+        if changed:
+            if self.chunks:
+                positions = np.concatenate([positions for _, positions, _ in self.chunks.values()])
+                block_ids = np.concatenate([block_ids for _, _, block_ids in self.chunks.values()])
+            else:
+                positions, block_ids = np.zeros((0, 3), dtype=np.int32), np.zeros(0, dtype=np.uint8)
+            self.offsets, self.colors, self.opaque_count = pack_instances(positions, block_ids)
+            self.version += 1
+        return changed
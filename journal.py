@@ -0,0 +1,353 @@
+"""
+Append-only journal of world edits, for crash-safe saving between snapshots.
+
+Layout of journal.log: magic and format version, then one record per edit:
+- a header of (kind, payload length, CRC-32 of the payload)
+- RECORD_BLOCK payload: position, old block ID, new block ID
+- RECORD_BOX payload: min corner, shape, compressed length of the old IDs, then the old and
+  new IDs of the box, each zlib-compressed
+- RECORD_UNDO / RECORD_REDO: no payload; undo or redo the latest edit, like the live API
+
+Every record holds absolute block IDs, so replaying the log over a snapshot that already
+contains some of its edits gives the same world. That makes compaction safe: the snapshot
+is written first and the journal is only replaced afterwards.
+
+Records are handed to a writer thread that writes and fsyncs them in batches, so
+appending never waits for the disk. Once COMPACT_RECORDS records or COMPACT_BYTES bytes
+have been logged since the last compaction, the journal copies the world and queues the copy to the writer
+thread, which saves it as the new snapshot and shrinks the log, without stalling edits.
+"""
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+
+import numpy as np
+
+from persistence import save_world, load_world
+from world import World
+
+FORMAT_VERSION = 1
+JOURNAL_MAGIC = b"MCJL"
+JOURNAL_NAME = "journal.log"
+JOURNAL_HEADER = struct.Struct("<4sH")  # magic, version
+RECORD_HEADER = struct.Struct("<BII")  # kind, payload length, payload CRC-32
+BLOCK_EDIT = struct.Struct("<3iBB")  # position, old ID, new ID
+BOX_EDIT = struct.Struct("<3i3iI")  # min corner, shape, compressed length of the old IDs
+
+RECORD_BLOCK = 1
+RECORD_BOX = 2
+RECORD_UNDO = 3
+RECORD_REDO = 4
+
+COMPACT_RECORDS = 20000  # Records logged since the last compaction that start an automatic one
+COMPACT_BYTES = 8 * 1024 * 1024  # Bytes logged since the last compaction that start an automatic one
+
+STOP = object()  # Tells the writer thread to finish
+
+# Queued to the writer thread: save `world` (a copy) to `directory`, then replace the log with `records`
+Compaction = namedtuple("Compaction", ["world", "directory", "records"])
+
+
+def encode_record(kind, payload=b""):
+    return RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+
+def block_record(position, old, new):
+    return encode_record(RECORD_BLOCK, BLOCK_EDIT.pack(*position, old, new))
+
+
+def box_record(min_corner, old, new):
+    old_data = zlib.compress(np.ascontiguousarray(old, dtype=np.uint8).tobytes(), 1)
+    new_data = zlib.compress(np.ascontiguousarray(new, dtype=np.uint8).tobytes(), 1)
+    return encode_record(RECORD_BOX, BOX_EDIT.pack(*min_corner, *old.shape, len(old_data)) + old_data + new_data)
+
+
+def read_records(data, offset):
+    """
+    Yield (kind, payload, end offset) for each intact record from offset on, stopping
+    at the first truncated or corrupt one (the tail of a write cut short by a crash).
+    """
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = bytes(data[start:start + length])
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset = start + length
+        yield kind, payload, offset
+
+
+def apply_edit(world, record, undo=False):
+    """Write the new (or, when undoing, the old) block IDs of an edit record into the world."""
+    kind, length, _ = RECORD_HEADER.unpack_from(record)
+    payload = record[RECORD_HEADER.size:RECORD_HEADER.size + length]
+    if kind == RECORD_BLOCK:
+        x, y, z, old, new = BLOCK_EDIT.unpack(payload)
+        world.blocks.set(x, y, z, old if undo else new)
+        world.block_changed(x, y, z)
+    elif kind == RECORD_BOX:
+        x, y, z, sx, sy, sz, old_length = BOX_EDIT.unpack_from(payload)
+        start = BOX_EDIT.size
+        data = payload[start:start + old_length] if undo else payload[start + old_length:]
+        values = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(sx, sy, sz)
+        world.blocks.write_box((x, y, z), (sx, sy, sz), values)
+        world.blocks_changed((x, y, z), (x + sx, y + sy, z + sz))
+
+
+class Journal:
+    """
+    Records the edits of one world into an append-only log file and keeps the
+    undo/redo history as the log's own records.
+    Creating a Journal replays any existing log onto the world and attaches to it.
+    """
+
+    def __init__(self, world, path, flush_interval=0.1, history_limit=1000, directory=None,
+                 compact_records=COMPACT_RECORDS, compact_bytes=COMPACT_BYTES):
+        self.world = world
+        self.path = path
+        self.flush_interval = flush_interval  # Seconds the writer waits to batch records into one fsync
+        self.directory = directory  # Snapshot directory for automatic compactions; None turns them off
+        self.compact_records = compact_records
+        self.compact_bytes = compact_bytes
+        self.log_records = 0  # Records logged since the last compaction, queued ones included
+        self.log_bytes = 0  # Bytes of those records
+        self.compacting = False  # An automatic compaction is queued and not finished yet
+        self.compactions = 0  # Compactions finished by the writer thread
+        self.done = deque(maxlen=history_limit)  # Edit records that can be undone, latest last
+        self.undone = []  # Edit records that can be redone, next one last
+        self.records = 0  # Records appended since the journal was opened
+        self.fsyncs = 0  # Batches made durable by the writer thread
+        self.error = None  # Exception that stopped the writer from writing, raised by append(), flush() and close()
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()  # Held by the writer while it uses the file
+
+        self.replay()
+        self.file = open(path, "ab")
+        self.writer = threading.Thread(target=self.write_loop, name="journal-writer", daemon=True)
+        self.writer.start()
+        world.journal = self
+
+    def replay(self):
+        """Apply the log to the world, dropping a torn tail left by a crash."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < JOURNAL_HEADER.size:
+            self.write_file([])
+            return
+        with open(self.path, "rb") as file:
+            data = file.read()
+        magic, version = JOURNAL_HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} journal")
+
+        end = JOURNAL_HEADER.size
+        for kind, payload, end in read_records(data, JOURNAL_HEADER.size):
+            if kind == RECORD_UNDO:
+                self.apply_undo()
+            elif kind == RECORD_REDO:
+                self.apply_redo()
+            else:
+                record = encode_record(kind, payload)
+                apply_edit(self.world, record)
+                self.push(record)
+            self.log_records += 1
+        self.log_bytes = end - JOURNAL_HEADER.size
+        if end < len(data):
+            with open(self.path, "r+b") as file:
+                file.truncate(end)
+
+    def write_file(self, records):
+        """Atomically replace the log with a fresh header followed by the given records."""
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION))
+            file.write(b"".join(records))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+    def write_loop(self):
+        """Writer thread: write whatever has been queued, fsync once, then wait to batch more."""
+        while True:
+            batch = [self.queue.get()]
+            if batch[0] is not STOP:
+                time.sleep(self.flush_interval)
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = []
+            for item in batch:
+                if isinstance(item, Compaction):
+                    # Records queued before the compaction go to the old log first
+                    self.write_records(records)
+                    records = []
+                    self.write_compaction(item)
+                elif item is not STOP:
+                    records.append(item)
+            self.write_records(records)
+            for _ in batch:
+                self.queue.task_done()
+            if STOP in batch:
+                return
+
+    def write_records(self, records):
+        """Writer thread: append records to the log and fsync them."""
+        if not records or self.error is not None:
+            return
+        try:
+            with self.lock:
+                self.file.write(b"".join(records))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.fsyncs += 1
+        except Exception as error:  # E.g. a full disk: keep draining so flush() and close() return
+            self.error = error
+
+    def write_compaction(self, compaction):
+        """Writer thread: save the snapshot, then replace the log with the history records."""
+        try:
+            if self.error is None:
+                save_world(compaction.world, compaction.directory)
+                with self.lock:
+                    self.file.close()
+                    self.write_file(compaction.records)
+                    self.file = open(self.path, "ab")
+                self.compactions += 1
+        except Exception as error:
+            self.error = error
+        finally:
+            self.compacting = False
+
+    def check(self):
+        """Raise the error the writer thread hit, if any; records from then on were not written."""
+        if self.error is not None:
+            raise self.error
+
+    def append(self, record):
+        """Queue a record for the writer thread; never waits for the disk."""
+        self.check()
+        self.queue.put(record)
+        self.records += 1
+        self.log_records += 1
+        self.log_bytes += len(record)
+
+    def compact_if_due(self):
+        """
+        Start an automatic compaction once the log has grown too long. Called before an edit
+        touches the world or the history, so the copy and the history match the log so far.
+        """
+        if self.directory is None or self.compacting:
+            return
+        if self.log_records >= self.compact_records or self.log_bytes >= self.compact_bytes:
+            self.compacting = True
+            self.start_compaction(self.directory)
+
+    def start_compaction(self, directory):
+        """Queue a copy of the world and its history for the writer thread to compact with."""
+        self.check()
+        snapshot = World(size=self.world.size)
+        snapshot.blocks = self.world.blocks.copy()
+        # Replaying the history over the snapshot rebuilds the undo and redo stacks: the
+        # undone edits are logged in the order they were made, then undone again
+        records = list(self.done) + self.undone[::-1] + [encode_record(RECORD_UNDO)] * len(self.undone)
+        self.queue.put(Compaction(snapshot, directory, records))
+        self.log_records = 0
+        self.log_bytes = 0
+
+    def push(self, record):
+        """Make a new edit the latest undoable one."""
+        self.done.append(record)
+        self.undone.clear()
+
+    def record_block(self, position, old, new):
+        """Log a single-block edit (called by World before it writes the block)."""
+        if old != new:
+            self.compact_if_due()
+            record = block_record(position, old, new)
+            self.append(record)
+            self.push(record)
+
+    def record_box(self, min_corner, old, new):
+        """Log a box edit given the box's block IDs before and after it."""
+        self.compact_if_due()
+        record = box_record(min_corner, old, new)
+        self.append(record)
+        self.push(record)
+
+    def apply_undo(self):
+        if not self.done:
+            return False
+        record = self.done.pop()
+        apply_edit(self.world, record, undo=True)
+        self.undone.append(record)
+        return True
+
+    def apply_redo(self):
+        if not self.undone:
+            return False
+        record = self.undone.pop()
+        apply_edit(self.world, record)
+        self.done.append(record)
+        return True
+
+    def undo(self):
+        """Revert the latest edit. Returns False if there is nothing to undo."""
+        self.compact_if_due()
+        if not self.apply_undo():
+            return False
+        self.append(encode_record(RECORD_UNDO))
+        return True
+
+    def redo(self):
+        """Re-apply the latest undone edit. Returns False if there is nothing to redo."""
+        self.compact_if_due()
+        if not self.apply_redo():
+            return False
+        self.append(encode_record(RECORD_REDO))
+        return True
+
+    def flush(self):
+        """Wait until every record appended so far is on disk."""
+        self.queue.join()
+        self.check()
+
+    def size(self):
+        """Bytes of the log on disk."""
+        return os.path.getsize(self.path)
+
+    def compact(self, directory):
+        """
+        Save a snapshot of the world into `directory` and shrink the log to the records
+        still needed for undo and redo. A crash at any point leaves a snapshot and log
+        that replay to the current world. Waits for the writer thread to finish it.
+        """
+        self.start_compaction(directory)
+        self.flush()
+
+    def close(self):
+        """Write out the queued records and stop the writer thread."""
+        self.queue.put(STOP)
+        self.writer.join()
+        self.file.close()
+        self.world.journal = None
+        self.check()
+
+
+def open_world(directory, size=(10, 10, 10), **journal_options):
+    """
+    Load the world kept in `directory` (its latest snapshot plus the journal of later
+    edits), or start an empty world of the given size there. Returns the world with its
+    Journal attached as world.journal.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, "world.dat")):
+        world = load_world(directory)
+    else:
+        world = World(size=size)
+    journal_options.setdefault("directory", directory)
+    Journal(world, os.path.join(directory, JOURNAL_NAME), **journal_options)
+    return world
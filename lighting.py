@@ -0,0 +1,199 @@
+"""
+Light levels of every cell in the world, in two channels:
+- sky light: MAX_LIGHT in every cell open to the sky straight above, going down without
+  fading, and spreading sideways (and around corners) one level less per cell
+- block light: given off by blocks such as lamps, one level less per cell
+
+Single-block edits are relit with two breadth-first passes that only visit the cells
+whose light depends on the edited one: the first darkens everything the old light
+reached, the second spreads light back in from what is still lit around it. Box edits
+relight the region they can affect with vectorized passes instead.
+"""
+from collections import deque
+
+import numpy as np
+
+from block_types import IS_OPAQUE, LIGHT_EMISSION
+
+MAX_LIGHT = 15
+
+NEIGHBOURS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+
+
+def spread(levels, passable, fixed=None):
+    """
+    Spread light through passable cells, one level less per cell, until nothing changes.
+    Cells marked in `fixed` keep their level. Works in place on a uint8 array.
+    """
+    for _ in range(MAX_LIGHT):
+        brightest = np.zeros_like(levels)
+        for axis in range(3):
+            ahead = [slice(None)] * 3
+            behind = [slice(None)] * 3
+            ahead[axis], behind[axis] = slice(1, None), slice(None, -1)
+            np.maximum(brightest[tuple(ahead)], levels[tuple(behind)], out=brightest[tuple(ahead)])
+            np.maximum(brightest[tuple(behind)], levels[tuple(ahead)], out=brightest[tuple(behind)])
+        brightest = np.maximum(brightest, 1) - 1
+        grow = passable & (brightest > levels)
+        if fixed is not None:
+            grow &= ~fixed
+        if not grow.any():
+            break
+        levels[grow] = brightest[grow]
+
+
+class LightMap:
+    """Sky and block light levels over the world bounds, one byte per cell and channel."""
+
+    def __init__(self, world):
+        self.world = world
+        self.min_corner, max_corner = world.bounds()
+        self.shape = tuple(max_corner[i] - self.min_corner[i] for i in range(3))
+        self.sky = np.zeros(self.shape, dtype=np.uint8)
+        self.block = np.zeros(self.shape, dtype=np.uint8)
+        self.updates = 0  # Cells whose light was changed by incremental updates
+        self.rebuild()
+
+    def rebuild(self):
+        """Light the whole world from scratch."""
+        self.relight((0, 0, 0), self.shape)
+
+    def relight(self, low, high):
+        """
+        Recompute the light of the cells in [low, high) (array indices), taking the cells
+        just outside as fixed. The box must span the whole height of the world.
+        Returns a boolean array of the cells in the box whose light changed.
+        """
+        # Include a one-cell shell of unchanged neighbours the box can be lit from
+        outer_low = [max(0, low[i] - 1) for i in range(3)]
+        outer_high = [min(self.shape[i], high[i] + 1) for i in range(3)]
+        outer = tuple(slice(outer_low[i], outer_high[i]) for i in range(3))
+        inner = tuple(slice(low[i] - outer_low[i], high[i] - outer_low[i]) for i in range(3))
+        blocks = self.world.blocks.to_dense([self.min_corner[i] + outer_low[i] for i in range(3)],
+                                            [outer_high[i] - outer_low[i] for i in range(3)])
+        passable = ~IS_OPAQUE[blocks]
+        fixed = np.ones(blocks.shape, dtype=bool)
+        fixed[inner] = False
+
+        # Sky light: cells with nothing opaque above them, up to the top of the world
+        open_sky = np.cumprod(passable[:, ::-1, :], axis=1, dtype=np.uint8)[:, ::-1, :].astype(bool)
+        sky = self.sky[outer].copy()
+        sky[inner] = np.where(open_sky[inner], MAX_LIGHT, 0)
+        spread(sky, passable, fixed)
+
+        block = self.block[outer].copy()
+        block[inner] = LIGHT_EMISSION[blocks[inner]]
+        spread(block, passable, fixed)
+
+        box = tuple(slice(low[i], high[i]) for i in range(3))
+        changed = (self.sky[box] != sky[inner]) | (self.block[box] != block[inner])
+        self.sky[box] = sky[inner]
+        self.block[box] = block[inner]
+        return changed
+
+    def update_box(self, min_corner, max_corner):
+        """
+        Relight after the blocks of a box (world coordinates, max exclusive) changed.
+        Returns the (min_corner, max_corner) of the cells whose light changed, or None.
+        """
+        # Light travels at most MAX_LIGHT cells sideways; sky light goes all the way down
+        low = [max(0, min_corner[i] - self.min_corner[i] - MAX_LIGHT) for i in range(3)]
+        high = [min(self.shape[i], max_corner[i] - self.min_corner[i] + MAX_LIGHT) for i in range(3)]
+        low[1], high[1] = 0, self.shape[1]
+        changed = np.argwhere(self.relight(low, high))
+        if not len(changed):
+            return None
+        first, last = changed.min(axis=0), changed.max(axis=0)
+        return (
+            tuple(int(first[i]) + low[i] + self.min_corner[i] for i in range(3)),
+            tuple(int(last[i]) + 1 + low[i] + self.min_corner[i] for i in range(3)),
+        )
+
+    def update_block(self, x, y, z):
+        """
+        Relight after the block at (x, y, z) changed, visiting only the cells whose light
+        depends on it. Returns the set of world positions whose light changed.
+        """
+        cell = (x - self.min_corner[0], y - self.min_corner[1], z - self.min_corner[2])
+        emission = int(LIGHT_EMISSION[self.world.blocks.get(x, y, z)])
+        changed = set()
+        for levels, sky, cell_emission in ((self.sky, True, 0), (self.block, False, emission)):
+            before = {}  # {cell: level before the update} of every cell the passes touched
+            self.update_channel(levels, cell, sky, cell_emission, before)
+            changed.update(touched for touched, level in before.items() if levels[touched] != level)
+        self.updates += len(changed)
+        return {(cx + self.min_corner[0], cy + self.min_corner[1], cz + self.min_corner[2]) for cx, cy, cz in changed}
+
+    def opaque(self, cell):
+        return IS_OPAQUE[self.world.blocks.get(cell[0] + self.min_corner[0], cell[1] + self.min_corner[1],
+                                               cell[2] + self.min_corner[2])]
+
+    def neighbours(self, cell):
+        for dx, dy, dz in NEIGHBOURS:
+            neighbour = (cell[0] + dx, cell[1] + dy, cell[2] + dz)
+            if 0 <= neighbour[0] < self.shape[0] and 0 <= neighbour[1] < self.shape[1] \
+                    and 0 <= neighbour[2] < self.shape[2]:
+                yield neighbour, dy
+
+    def update_channel(self, levels, cell, sky, emission, before):
+        """Darken what the cell used to light, then spread light back in from what is still lit."""
+        darken = deque([(cell, int(levels[cell]))])
+        brighten = deque()
+        before[cell] = int(levels[cell])
+        levels[cell] = 0
+        while darken:
+            current, level = darken.popleft()
+            for neighbour, dy in self.neighbours(current):
+                neighbour_level = int(levels[neighbour])
+                if not neighbour_level:
+                    continue
+                if neighbour_level < level or (sky and dy < 0 and level == MAX_LIGHT):
+                    # Lit through `current`: darken it too, unless it gives off its own light
+                    before.setdefault(neighbour, neighbour_level)
+                    levels[neighbour] = 0
+                    darken.append((neighbour, neighbour_level))
+                    if not sky:
+                        own = int(LIGHT_EMISSION[self.world.blocks.get(
+                            *(neighbour[i] + self.min_corner[i] for i in range(3)))])
+                        if own:
+                            levels[neighbour] = own
+                            brighten.append(neighbour)
+                else:
+                    brighten.append(neighbour)  # Lit some other way, can light the cells around it
+
+        # Light the cell itself, then let every lit cell around spread into the dark area
+        if emission:
+            levels[cell] = emission
+            brighten.append(cell)
+        elif sky and cell[1] == self.shape[1] - 1 and not self.opaque(cell):
+            levels[cell] = MAX_LIGHT
+            brighten.append(cell)
+        for neighbour, _ in self.neighbours(cell):
+            if levels[neighbour]:
+                brighten.append(neighbour)
+
+        while brighten:
+            current = brighten.popleft()
+            level = int(levels[current])
+            for neighbour, dy in self.neighbours(current):
+                new_level = level if sky and dy < 0 and level == MAX_LIGHT else level - 1
+                if new_level > levels[neighbour] and not self.opaque(neighbour):
+                    before.setdefault(neighbour, int(levels[neighbour]))
+                    levels[neighbour] = new_level
+                    brighten.append(neighbour)
+
+    def padded(self, coord, chunk_size):
+        """
+        Return the combined light level around one chunk with a one-cell border, shaped
+        like mesher.padded_chunk(). Cells beyond the world sides and top count as fully lit.
+        """
+        padded = np.full((chunk_size + 2,) * 3, MAX_LIGHT, dtype=np.uint8)
+        low = [coord[i] * chunk_size - 1 - self.min_corner[i] for i in range(3)]
+        starts = [min(max(0, low[i]), self.shape[i]) for i in range(3)]
+        stops = [max(starts[i], min(self.shape[i], low[i] + chunk_size + 2)) for i in range(3)]
+        source = tuple(slice(starts[i], stops[i]) for i in range(3))
+        target = tuple(slice(starts[i] - low[i], stops[i] - low[i]) for i in range(3))
+        padded[target] = np.maximum(self.sky[source], self.block[source])
+        if low[1] < 0:
+            padded[:, :min(-low[1], chunk_size + 2), :] = 0  # Below the floor
+        return padded
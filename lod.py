@@ -0,0 +1,180 @@
+"""
+Level-of-detail geometry for distant parts of the world.
+
+The world is split into an octree of regions: a level-l region covers 2^l chunks along
+each axis and is meshed from its blocks downsampled 2^l times, so every level has about
+as many cells per region as one chunk. Each frame the octree is walked from the coarsest
+level down, splitting a region into its eight children while the viewer is closer than
+that level's distance; a split region only merges back once the viewer is a bit further
+away again, so regions near a threshold do not flip every frame.
+
+LOD meshes are built lazily when a region is first drawn at its level (a few per frame,
+the finer level standing in meanwhile), kept in a least-recently-used cache under a
+memory budget, and dropped when any chunk they cover is edited.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from chunks import AIR, CHUNK_SIZE
+from mesher import mesh_padded
+
+LOD_LEVELS = 3  # Coarsest level: regions of 2^3 chunks per axis, downsampled 8 times
+LOD_DISTANCES = (48, 96, 192)  # Viewer distance (in blocks) from which each level 1, 2, 3 is used
+LOD_HYSTERESIS = 0.15  # A split region merges back only beyond its distance times (1 + this)
+LOD_MEMORY_BUDGET = 32 * 1024 * 1024  # Bytes of cached LOD meshes kept before evicting
+LOD_BUILDS_PER_FRAME = 2  # LOD meshes built per select() call at most
+
+
+def most_common(cells):
+    """Return the most common non-air ID along the last axis of a block ID array (AIR if none)."""
+    common = np.zeros(cells.shape[:-1], dtype=np.uint8)
+    best = np.zeros(cells.shape[:-1], dtype=np.int32)
+    for block_id in np.unique(cells).tolist():
+        if block_id == AIR:
+            continue
+        count = np.count_nonzero(cells == block_id, axis=-1)
+        common = np.where(count > best, np.uint8(block_id), common)
+        best = np.maximum(best, count)
+    return common
+
+
+def downsample(blocks, factor):
+    """
+    Shrink an (x, y, z) block ID array whose sides are multiples of `factor` by that
+    factor. A coarse cell is filled when at least half of its blocks are, with the most
+    common block type of its highest non-empty layer, so terrain keeps its grass on top.
+    """
+    shape = [size // factor for size in blocks.shape]
+    cells = blocks.reshape(shape[0], factor, shape[1], factor, shape[2], factor).transpose(0, 2, 4, 3, 1, 5)
+    cells = cells.reshape(*shape, factor, factor ** 2)  # [x, y, z, layer in the cell, block in the layer]
+    coarse = np.zeros(shape, dtype=np.uint8)
+    for layer in range(factor - 1, -1, -1):
+        coarse = np.where(coarse == AIR, most_common(cells[..., layer, :]), coarse)
+    filled = np.count_nonzero(cells, axis=(-2, -1)) * 2 >= factor ** 3
+    return np.where(filled, coarse, np.uint8(AIR))
+
+
+def region_box(level, coord):
+    """Return the (min_corner, max_corner) in blocks of a level-l region."""
+    size = CHUNK_SIZE << level
+    return tuple(c * size for c in coord), tuple((c + 1) * size for c in coord)
+
+
+def mesh_region(storage, level, coord):
+    """Build the simplified mesh of one level-l region, in world coordinates."""
+    factor = 1 << level
+    min_corner, _ = region_box(level, coord)
+    # Downsample the region with a one-coarse-cell border, like mesher.padded_chunk()
+    dense = storage.to_dense([c - factor for c in min_corner], ((CHUNK_SIZE + 2) * factor,) * 3)
+    mesh = mesh_padded(downsample(dense, factor), (0, 0, 0))
+    if not mesh.is_empty():
+        mesh.vertices = mesh.vertices * factor + np.array(min_corner, dtype=np.float32)
+    return mesh
+
+
+def mesh_nbytes(mesh):
+    return (mesh.vertices.nbytes + mesh.indices.nbytes + mesh.line_indices.nbytes
+            + (mesh.colors.nbytes if mesh.colors is not None else 0))
+
+
+def box_distance(position, min_corner, max_corner):
+    """Distance from a point to the closest point of an axis-aligned box (0 inside it)."""
+    return sum(max(min_corner[i] - position[i], 0, position[i] - max_corner[i]) ** 2 for i in range(3)) ** 0.5
+
+
+class LodManager:
+    """
+    Chooses the level of detail of every part of a world by distance from a viewer and
+    caches the LOD meshes. Level 0 means the world's own chunk meshes.
+    """
+
+    def __init__(self, world, memory_budget=LOD_MEMORY_BUDGET, builds_per_frame=LOD_BUILDS_PER_FRAME):
+        self.world = world
+        self.memory_budget = memory_budget
+        self.builds_per_frame = builds_per_frame
+        self.meshes = OrderedDict()  # {(level, region coord): Mesh}, least recently used first
+        self.nbytes = 0  # Bytes of the cached meshes
+        self.split = set()  # (level, region coord) of the regions drawn as their children last frame
+        self.occupied = {}  # {level: set of region coords holding any chunk}
+        self.occupied_version = -1  # World version `occupied` was computed at
+        self.builds = 0  # LOD meshes built so far
+        self.evictions = 0  # LOD meshes dropped to stay under the memory budget
+
+    def invalidate(self, chunk_coords):
+        """Drop the cached meshes of every region that covers, or borders, an edited chunk."""
+        for coord in chunk_coords:
+            for level in range(1, LOD_LEVELS + 1):
+                options = [{(c + d) >> level for d in (-1, 0, 1)} for c in coord]
+                for region in ((x, y, z) for x in options[0] for y in options[1] for z in options[2]):
+                    mesh = self.meshes.pop((level, region), None)
+                    if mesh is not None:
+                        self.nbytes -= mesh_nbytes(mesh)
+
+    def get(self, level, coord, build=True):
+        """Return the cached mesh of a region (building it if `build`), or None."""
+        key = (level, coord)
+        mesh = self.meshes.get(key)
+        if mesh is not None:
+            self.meshes.move_to_end(key)
+            return mesh
+        if not build:
+            return None
+        mesh = self.meshes[key] = mesh_region(self.world.blocks, level, coord)
+        self.nbytes += mesh_nbytes(mesh)
+        self.builds += 1
+        # Evict the least recently used meshes, never the one just built
+        while self.nbytes > self.memory_budget and len(self.meshes) > 1:
+            _, evicted = self.meshes.popitem(last=False)
+            self.nbytes -= mesh_nbytes(evicted)
+            self.evictions += 1
+        return mesh
+
+    def occupied_regions(self):
+        """Return {level: region coords holding any chunk}, recomputed after edits."""
+        if self.occupied_version != self.world.version:
+            coords = self.world.blocks.coords()
+            self.occupied = {
+                level: {(cx >> level, cy >> level, cz >> level) for cx, cy, cz in coords}
+                for level in range(LOD_LEVELS + 1)
+            }
+            self.occupied_version = self.world.version
+        return self.occupied
+
+    def select(self, position):
+        """
+        Choose what to draw for a viewer at `position`. Returns ([(level, region coord,
+        Mesh)] of the LOD regions to draw, set of the chunk coords to draw at full detail).
+        """
+        occupied = self.occupied_regions()
+        regions = []
+        chunks = set()
+        split = set()
+        builds = self.builds_per_frame
+        pending = [(LOD_LEVELS, coord) for coord in occupied[LOD_LEVELS]]
+        while pending:
+            level, coord = pending.pop()
+            if level == 0:
+                chunks.add(coord)
+                continue
+            distance = box_distance(position, *region_box(level, coord))
+            threshold = LOD_DISTANCES[level - 1]
+            if (level, coord) in self.split:
+                threshold *= 1 + LOD_HYSTERESIS
+            if distance >= threshold:
+                built = self.builds
+                mesh = self.get(level, coord, build=builds > 0)
+                builds -= self.builds - built
+                if mesh is not None:
+                    regions.append((level, coord, mesh))
+                    continue
+                # Not built yet: the finer level stands in until it is
+            else:
+                split.add((level, coord))
+            children = occupied[level - 1]
+            for child in ((coord[0] * 2 + dx, coord[1] * 2 + dy, coord[2] * 2 + dz)
+                          for dx in (0, 1) for dy in (0, 1) for dz in (0, 1)):
+                if child in children:
+                    pending.append((level - 1, child))
+        self.split = split
+        return regions, chunks
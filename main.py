@@ -1,26 +1,71 @@
 from core_engine import CoreEngine
 from player import Player
 from world import World
-from utils import raycast_to_grid
+from picking import Picker
+from camera import Camera
+from mesh_workers import MeshWorkerPool
+from renderer import RENDER_RETAINED
+from block_types import PALETTE, STONE
+from terrain import generate_world
+from journal import open_world
+from lod import LodManager
 from OpenGL.GL import *
-from OpenGL.GLU import *
 import glfw
 
 # Constants
 BOUNDING_BOX = [(-10, 10), (0, 10), (-10, 10)]
 GRID_SIZE = (1, 1, 1)
-
-# Initialize components
-engine = CoreEngine(width=800, height=600, title="Simple Minecraft")
-player = Player(bounding_box=BOUNDING_BOX, start_position=(0.0, 2.0, 0.0))
-world = World(size=(20, 10, 20))
+FIXED_TIMESTEP = None  # Seconds per physics step (e.g. 1 / 120) for frame-rate independent physics
+PROFILE_OUTPUT = None  # Path of a .json or .csv file to write frame timings to on exit (F3 toggles profiling)
+RENDER_MODE = RENDER_RETAINED  # RENDER_INSTANCED draws cubes with shaders; RENDER_ARRAYS or RENDER_IMMEDIATE suit drivers without VBOs
+TERRAIN_SEED = None  # Seed to fill the world with generated terrain at startup (None starts empty)
+SAVE_DIRECTORY = None  # Directory keeping the world as a snapshot plus an edit journal (None: memory only)
+MAX_FPS = 60  # Frame cap, paced by sleeping (None: as fast as possible)
+RENDER_ON_DEMAND = True  # Only redraw when the view or the world changed, idling at a low poll rate otherwise
+
+# Components, created by setup(). Nothing is built at import time: the spawned mesh and
+# terrain worker processes re-import this file, and must not open the world or its journal.
+engine = None
+player = None
+world = None
+camera = None  # View matrices, recomputed only when the player moves or looks around
+picker = None
+selected_block = STONE  # Block type placed on click, chosen with the number keys
+last_scene = None  # What the last drawn frame showed, see scene_changed()
 
 
 def key_callback(window, key, scancode, action, mods):
     """Handle keyboard input for adding/removing blocks."""
+    global selected_block
+
+    engine.key_callback(window, key, scancode, action, mods)  # Replaced by this one; it asks for a redraw
     if action == glfw.PRESS or action == glfw.REPEAT:
         if key == glfw.KEY_SPACE:
             player.jump()
+    if action == glfw.PRESS and glfw.KEY_1 <= key <= glfw.KEY_9:
+        # Number keys pick the block type to place
+        if key - glfw.KEY_0 < len(PALETTE):
+            selected_block = key - glfw.KEY_0
+            print(f"Selected block: {PALETTE[selected_block].name}")
+    if action == glfw.PRESS and mods & glfw.MOD_CONTROL and world.journal is not None:
+        # Ctrl+Z / Ctrl+Y undo and redo block edits
+        if key == glfw.KEY_Z:
+            world.journal.undo()
+        elif key == glfw.KEY_Y:
+            world.journal.redo()
+    if action == glfw.PRESS and key == glfw.KEY_F3:
+        # Toggle the frame profiler and its on-screen overlay
+        engine.profiler.show_overlay = engine.profiler.toggle()
+
+
+def current_scene():
+    """Return what a frame drawn now would show: the camera pose and the world version."""
+    return (tuple(player.position), tuple(player.camera_front), world.version)
+
+
+def scene_changed():
+    """Tell the engine whether the camera or the world changed since the last drawn frame."""
+    return current_scene() != last_scene or bool(world.mesh_workers.pending) or engine.profiler.show_overlay
 
 
 def update(delta_time):
@@ -33,7 +78,7 @@ def update(delta_time):
     }
 
     # Update player position and gravity
-    player.update(delta_time, keys)
+    player.update(delta_time, keys, world)
 
     # Handle block placement/removal
     if glfw.get_mouse_button(engine.window, glfw.MOUSE_BUTTON_LEFT) == glfw.PRESS:
@@ -46,33 +91,34 @@ def render():
     glLineWidth(2.0)  # Set uniform line thickness
 
     """Render game world."""
+    global last_scene
+    last_scene = current_scene()  # Whatever triggered this frame, it now shows this scene
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
 
     # Set the background color to light blue
     glClearColor(0.5, 0.7, 1.0, 1.0)
 
-    # Set up the camera
-    camera_target = [
-        player.position[0] + player.camera_front[0],
-        player.position[1] + player.camera_front[1],
-        player.position[2] + player.camera_front[2],
-    ]
-    gluLookAt(
-        player.position[0], player.position[1], player.position[2],
-        camera_target[0], camera_target[1], camera_target[2],
-        player.camera_up[0], player.camera_up[1], player.camera_up[2],
-    )
+    # Set up the camera, interpolated between physics steps when running on a fixed timestep
+    eye = player.interpolated_position(engine.alpha)
+    camera.set_lens(engine.fov, engine.width / engine.height, engine.near, engine.far)
+    camera.look(eye, player.camera_front, player.camera_up)
+    glLoadMatrixf(camera.view_columns)
+
+    profiler = engine.profiler
 
     # Render the floor and boundary
-    world.render_floor()
-    world.render_boundary()
+    with profiler.phase("render.floor"):
+        world.render_floor()
+    with profiler.phase("render.boundary"):
+        world.render_boundary()
 
-    # Render solid blocks with wireframes
-    world.render_blocks_with_wireframes()
+    # Render solid blocks with wireframes, skipping chunks outside the view
+    with profiler.phase("render.blocks"):
+        world.render_blocks_with_wireframes(camera.frustum, player.position)
 
     # Highlight the current block or floor cell
-    highlight_block()
+    with profiler.phase("render.highlight"):
+        highlight_block()
 
     # Draw the camera direction
     draw_camera_direction()
@@ -89,25 +135,20 @@ def add_block():
     # Check if the left mouse button is pressed
     if glfw.get_mouse_button(engine.window, glfw.MOUSE_BUTTON_LEFT) == glfw.PRESS:
         if not mouse_pressed:  # Place a block only once per click
-            position = player.get_position()
-            direction = player.get_camera_direction()
-
-            for grid_pos in raycast_to_grid(position, direction, max_distance=10.0, grid_size=GRID_SIZE):
-                if grid_pos in world.blocks:
-                    # Add a block on the highlighted face
-                    face_normal = get_face_normal(position, direction, grid_pos)
-                    new_block_pos = (
-                        grid_pos[0] + face_normal[0],
-                        grid_pos[1] + face_normal[1],
-                        grid_pos[2] + face_normal[2],
-                    )
-                    if world.is_within_bounds(*new_block_pos):
-                        world.add_block(*new_block_pos)
-                    break
-                elif grid_pos[1] == 0 and world.is_within_bounds(*grid_pos):
-                    # Add a block on the floor cell
-                    world.add_block(*grid_pos)
-                    break
+            target = picker.pick(player.get_position(), player.get_camera_direction())
+
+            if target.block and any(target.normal):
+                # Add a block on the face the ray entered through
+                new_block_pos = (
+                    target.block[0] + target.normal[0],
+                    target.block[1] + target.normal[1],
+                    target.block[2] + target.normal[2],
+                )
+                if world.is_within_bounds(*new_block_pos):
+                    world.add_block(*new_block_pos, selected_block)
+            elif target.floor_cell and world.is_within_bounds(*target.floor_cell):
+                # Add a block on the floor cell
+                world.add_block(*target.floor_cell, selected_block)
 
             mouse_pressed = True  # Set mouse pressed state
     else:
@@ -116,45 +157,21 @@ def add_block():
 
 def remove_block():
     """Remove the block the player is pointing at."""
-    position = player.get_position()
-    direction = player.get_camera_direction()
-    for grid_pos in raycast_to_grid(position, direction, max_distance=10.0, grid_size=GRID_SIZE):
-        if grid_pos in world.blocks:
-            world.remove_block(*grid_pos)
-            break
+    target = picker.pick(player.get_position(), player.get_camera_direction())
+    if target.block:
+        world.remove_block(*target.block)
 
 
 def highlight_block():
     """Highlight the floor cell or block face the player is pointing at."""
-    position = player.get_position()
-    direction = player.get_camera_direction()
+    target = picker.pick(player.get_position(), player.get_camera_direction())
 
-    for grid_pos in raycast_to_grid(position, direction, max_distance=10.0, grid_size=GRID_SIZE):
-        if grid_pos in world.blocks:
-            # Highlight the face
-            face_normal = get_face_normal(position, direction, grid_pos)
-            world.render_face_highlight(grid_pos, face_normal)
-            break
-        elif grid_pos[1] == 0:
-            # Highlight the floor cell
-            world.render_full_wireframe(grid_pos, color=(0.0, 1.0, 0.0))  # Green for floor highlight
-            break
-
-
-def get_face_normal(player_position, direction, block_position):
-    """
-    Determine the face normal of the block the player is looking at.
-    Returns a tuple (x, y, z) representing the face normal.
-    """
-    offset = [
-        player_position[0] - block_position[0],
-        player_position[1] - block_position[1],
-        player_position[2] - block_position[2],
-    ]
-    axis = max(range(3), key=lambda i: abs(offset[i]))  # Find the dominant axis
-    face_normal = [0, 0, 0]
-    face_normal[axis] = 1 if direction[axis] > 0 else -1
-    return tuple(face_normal)
+    if target.block and any(target.normal):
+        # Highlight the face the ray entered through (none if the camera is inside the block)
+        world.render_face_highlight(target.block, target.normal)
+    elif target.floor_cell:
+        # Highlight the floor cell
+        world.render_full_wireframe(target.floor_cell, color=(0.0, 1.0, 0.0))  # Green for floor highlight
 
 
 def draw_camera_direction():
@@ -176,6 +193,7 @@ def mouse_callback(window, xpos, ypos):
     """Handle mouse movement to control camera direction."""
     global last_mouse_pos
 
+    engine.mouse_callback(window, xpos, ypos)  # Replaced by this one; it asks for a redraw
     # Debug the raw mouse position
     # print(f"Mouse position: ({xpos}, {ypos})")
 
@@ -198,11 +216,59 @@ def mouse_callback(window, xpos, ypos):
     player.handle_mouse(dx, dy)
 
 
-if __name__ == "__main__":
+def setup():
+    """Create the engine, player, world, camera and picker."""
+    global engine, player, world, camera, picker
+
+    engine = CoreEngine(width=800, height=600, title="Simple Minecraft", timestep=FIXED_TIMESTEP)
+    engine.max_fps = MAX_FPS
+    engine.render_on_demand = RENDER_ON_DEMAND
+    player = Player(bounding_box=BOUNDING_BOX, start_position=(0.0, 2.0, 0.0))
+    world = open_world(SAVE_DIRECTORY, size=(20, 10, 20)) if SAVE_DIRECTORY else World(size=(20, 10, 20))
+    world.render_mode = RENDER_MODE
+    camera = Camera()
+    world.camera = camera
+    picker = Picker(world, max_distance=10.0, grid_size=GRID_SIZE)
+
+
+def main():
+    setup()
     engine.initialize()
+    if TERRAIN_SEED is not None and not len(world.blocks):
+        generate_world(world, TERRAIN_SEED)
+        if world.journal is not None:
+            world.journal.compact(SAVE_DIRECTORY)  # Generated terrain is not journaled, snapshot it now
+    world.enable_lighting()  # Bake sunlight, lamp light and ambient occlusion into the chunk meshes
+    world.enable_octree()  # Let raycasts skip empty space
+    world.enable_occlusion_culling()  # Skip chunks walled off from the player, e.g. caves underground
+    world.mesh_workers = MeshWorkerPool()  # Rebuild edited chunks off the frame loop
+    world.lod = LodManager(world)  # Draw distant regions from downsampled meshes
 
     # Set callbacks after the window is initialized
     glfw.set_key_callback(engine.window, key_callback)
     glfw.set_cursor_pos_callback(engine.window, mouse_callback)
 
+    engine.scene_changed = scene_changed
     engine.run(update, render)
+    world.mesh_workers.shutdown()
+    if world.journal is not None:
+        # Fold the journal into a fresh snapshot so the next start replays little
+        world.journal.compact(SAVE_DIRECTORY)
+        world.journal.close()
+    world.close()
+
+    print(f"Picking: {picker.raycasts} raycasts for {picker.requests} requests ({picker.saved} saved)")
+    print(f"Culling (last frame): {world.cull_stats}")
+    pacing = engine.pacing_stats()
+    print(f"Pacing: {pacing['frames_rendered']} frames drawn, {pacing['frames_skipped']} skipped, "
+          f"{pacing['fps']:.1f} FPS, {pacing['cpu_percent']:.0f}% CPU")
+    if PROFILE_OUTPUT and engine.profiler.frames:
+        if PROFILE_OUTPUT.endswith(".csv"):
+            engine.profiler.export_csv(PROFILE_OUTPUT)
+        else:
+            engine.profiler.export_json(PROFILE_OUTPUT)
+        print(f"Frame timings written to {PROFILE_OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from chunks import CHUNK_SIZE
+from mesher import mesh_padded, padded_chunk
+
+
+class MeshWorkerPool:
+    """
+    Rebuilds chunk meshes in background worker processes.
+    Each job works on a snapshot of the chunk and its border, so the world can keep
+    changing while it runs; finished meshes are picked up with collect().
+    """
+
+    def __init__(self, workers=None, executor=None):
+        # Spawned workers start fresh (no copy of the GL context) but re-import the entry
+        # script, which must keep its setup under `if __name__ == "__main__":` (see main.py)
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.pending = {}  # {chunk_coord: Future of the latest rebuild}
+        self.submitted = 0  # Number of rebuilds started
+        self.completed = 0  # Number of rebuilds collected
+        self.superseded = 0  # Number of rebuilds dropped because a newer one was started
+
+    def submit(self, storage, coord, lights=None):
+        """
+        Start rebuilding a chunk, lit from an optional LightMap, superseding any rebuild
+        of it still in flight.
+        """
+        self.discard(coord)
+        light = None if lights is None else lights.padded(coord, CHUNK_SIZE)
+        self.pending[coord] = self.executor.submit(mesh_padded, padded_chunk(storage, coord), coord, light)
+        self.submitted += 1
+
+    def discard(self, coord):
+        """Forget the in-flight rebuild of a chunk, if any."""
+        future = self.pending.pop(coord, None)
+        if future is not None:
+            future.cancel()
+            self.superseded += 1
+
+    def collect(self, wait=False):
+        """Return {chunk_coord: Mesh} of the finished rebuilds, optionally waiting for all of them."""
+        finished = {}
+        for coord, future in list(self.pending.items()):
+            if wait or future.done():
+                finished[coord] = future.result()
+                del self.pending[coord]
+        self.completed += len(finished)
+        return finished
+
+    def shutdown(self):
+        """Stop the workers, dropping any rebuilds still in flight."""
+        for coord in list(self.pending):
+            self.discard(coord)
+        self.executor.shutdown(wait=False, cancel_futures=True)
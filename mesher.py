@@ -0,0 +1,279 @@
+import numpy as np
+
+from block_types import COLORS, IS_OPAQUE
+from chunks import AIR, CHUNK_SIZE
+from lighting import MAX_LIGHT
+
+# Brightness of a quad corner by its ambient occlusion level: 0 when both cells beside the
+# corner (in front of the face) are opaque, else 3 minus the opaque cells among those two
+# and the diagonal one
+AO_BRIGHTNESS = np.array([0.45, 0.65, 0.82, 1.0], dtype=np.float32)
+LIGHT_BRIGHTNESS = np.maximum(0.8 ** (MAX_LIGHT - np.arange(MAX_LIGHT + 1)), 0.08).astype(np.float32)
+CORNER_SIDES = ((-1, -1), (1, -1), (1, 1), (-1, 1))  # (u, v) side of each corner, in quad_corners() order
+
+
+class Mesh:
+    """
+    Flat, GL-independent geometry for a batch of axis-aligned quads.
+    Block meshes keep their triangles sorted by block type, with `batches` listing the
+    (block_id, first index, index count) range of each type so it can be drawn in one call,
+    and carry per-vertex colors with the lighting and ambient occlusion baked in.
+    """
+
+    def __init__(self, vertices=None, indices=None, line_indices=None, batches=None, colors=None):
+        self.vertices = np.zeros((0, 3), dtype=np.float32) if vertices is None else vertices  # (N, 3) positions
+        self.indices = np.zeros(0, dtype=np.uint32) if indices is None else indices  # Two triangles per quad
+        self.line_indices = np.zeros(0, dtype=np.uint32) if line_indices is None else line_indices  # Quad outlines
+        self.batches = [] if batches is None else batches  # [(block_id, first index, index count)]
+        self.colors = colors  # Optional (N, 4) uint8 RGBA per vertex
+
+    @property
+    def quad_count(self):
+        return len(self.vertices) // 4
+
+    def is_empty(self):
+        return len(self.vertices) == 0
+
+    @classmethod
+    def from_quads(cls, quads, block_ids=None, colors=None):
+        """
+        Build a mesh from an (N, 4, 3) array of quad corners in counter-clockwise order,
+        with optional (N, 4, 4) uint8 corner colors.
+        With the block ID of each quad, the quads are grouped into one batch per block type.
+        """
+        quads = np.asarray(quads, dtype=np.float32).reshape(-1, 4, 3)
+        batches = []
+        if block_ids is not None:
+            block_ids = np.asarray(block_ids)
+            order = np.argsort(block_ids, kind="stable")
+            quads, block_ids = quads[order], block_ids[order]
+            if colors is not None:
+                colors = colors[order]
+            types, firsts, counts = np.unique(block_ids, return_index=True, return_counts=True)
+            batches = [(block_id, first * 6, count * 6)
+                       for block_id, first, count in zip(types.tolist(), firsts.tolist(), counts.tolist())]
+        base = np.arange(len(quads), dtype=np.uint32)[:, None] * 4
+        indices = base + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+        line_indices = base + np.array([0, 1, 1, 2, 2, 3, 3, 0], dtype=np.uint32)
+        return cls(quads.reshape(-1, 3), indices.ravel(), line_indices.ravel(), batches,
+                   None if colors is None else colors.reshape(-1, 4))
+
+    @classmethod
+    def concatenate(cls, meshes):
+        """Merge several meshes into one, re-basing their indices."""
+        meshes = [mesh for mesh in meshes if not mesh.is_empty()]
+        if not meshes:
+            return cls()
+        offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]]).astype(np.uint32)
+        index_offsets = np.cumsum([0] + [len(mesh.indices) for mesh in meshes[:-1]]).tolist()
+        return cls(
+            np.concatenate([mesh.vertices for mesh in meshes]),
+            np.concatenate([mesh.indices + offset for mesh, offset in zip(meshes, offsets)]),
+            np.concatenate([mesh.line_indices + offset for mesh, offset in zip(meshes, offsets)]),
+            [(block_id, first + index_offset, count)
+             for mesh, index_offset in zip(meshes, index_offsets) for block_id, first, count in mesh.batches],
+            np.concatenate([mesh.colors for mesh in meshes]) if all(mesh.colors is not None for mesh in meshes) else None,
+        )
+
+
+def padded_chunk(storage, coord):
+    """
+    Return the chunk's block IDs with a one-cell border copied from its 26 neighbours
+    (across faces, edges and corners). The result has shape (CHUNK_SIZE + 2,) * 3, with
+    the chunk itself at [1:-1, 1:-1, 1:-1].
+    """
+    padded = np.zeros((CHUNK_SIZE + 2,) * 3, dtype=np.uint8)
+    # For a neighbour offset along one axis: where its cells go in the padded array, and which of them
+    parts = {-1: (slice(0, 1), slice(-1, None)), 0: (slice(1, -1), slice(None)), 1: (slice(-1, None), slice(0, 1))}
+    cx, cy, cz = coord
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                chunk = storage.chunk((cx + dx, cy + dy, cz + dz))
+                if chunk is not None:
+                    padded[parts[dx][0], parts[dy][0], parts[dz][0]] = chunk[parts[dx][1], parts[dy][1], parts[dz][1]]
+    return padded
+
+
+def exposed_faces(padded, axis, direction):
+    """
+    Return the block IDs of faces pointing along `direction` on `axis` that can be seen:
+    the neighbour is neither opaque nor a block of the same type (so the inside of a body
+    of glass or water has no faces). Cells with a hidden face (or no block) are AIR in
+    the (CHUNK_SIZE,) * 3 result.
+    """
+    inner = [slice(1, -1)] * 3
+    neighbour = list(inner)
+    neighbour[axis] = slice(1 + direction, padded.shape[axis] - 1 + direction)
+    blocks = padded[tuple(inner)]
+    neighbours = padded[tuple(neighbour)]
+    return np.where(~IS_OPAQUE[neighbours] & (neighbours != blocks), blocks, AIR)
+
+
+def greedy_rectangles(mask):
+    """
+    Merge equal, non-air cells of a 2D mask into maximal rectangles, row by row.
+    Yields (u, v, width, height, block_id).
+    """
+    rows = mask.tolist()  # Plain lists are much faster than NumPy for scalar access
+    row_count, column_count = len(rows), len(rows[0])
+    for u in range(row_count):
+        row = rows[u]
+        v = 0
+        while v < column_count:
+            block_id = row[v]
+            if block_id == AIR:
+                v += 1
+                continue
+            height = 1
+            while v + height < column_count and row[v + height] == block_id:
+                height += 1
+            width = 1
+            while u + width < row_count and rows[u + width][v:v + height] == [block_id] * height:
+                width += 1
+            for covered in rows[u:u + width]:
+                covered[v:v + height] = [AIR] * height
+            yield u, v, width, height, block_id
+            v += height
+
+
+def face_shading(padded, light, axis, direction):
+    """
+    Return (occlusion, levels) of the faces pointing along `direction` on `axis`, indexed
+    [layer, u, v] like the greedy masks: the ambient occlusion level (0 to 3) of each quad
+    corner in quad_corners() order, and the light level of the cell in front of each face.
+    """
+    u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+    opaque = np.transpose(IS_OPAQUE[padded], (axis, u_axis, v_axis))
+    front = opaque[1 + direction:CHUNK_SIZE + 1 + direction]  # The cells the faces look into, with their border
+    occlusion = np.empty((CHUNK_SIZE,) * 3 + (4,), dtype=np.uint8)
+    for corner, (u_side, v_side) in enumerate(CORNER_SIDES):
+        beside_u = front[:, 1 + u_side:CHUNK_SIZE + 1 + u_side, 1:-1]
+        beside_v = front[:, 1:-1, 1 + v_side:CHUNK_SIZE + 1 + v_side]
+        diagonal = front[:, 1 + u_side:CHUNK_SIZE + 1 + u_side, 1 + v_side:CHUNK_SIZE + 1 + v_side]
+        occlusion[..., corner] = np.where(beside_u & beside_v, 0, 3 - beside_u.astype(np.uint8) - beside_v - diagonal)
+    if direction < 0:
+        occlusion = occlusion[..., ::-1]  # quad_corners() reverses the corner order of these faces
+
+    if light is None:
+        levels = np.full((CHUNK_SIZE,) * 3, MAX_LIGHT, dtype=np.uint8)
+    else:
+        levels = np.transpose(light, (axis, u_axis, v_axis))[1 + direction:CHUNK_SIZE + 1 + direction, 1:-1, 1:-1]
+    return occlusion, levels
+
+
+def quad_corners(rectangles, axis, direction, origin):
+    """
+    Turn (layer, u, v, width, height) rectangles of one face direction into an
+    (N, 4, 3) array of world-space quad corners.
+    """
+    rects = np.array(rectangles, dtype=np.float32).reshape(-1, 5)
+    layer, u, v, width, height = rects.T
+    u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+    # Corners in counter-clockwise order seen from the +axis side
+    corner_u = u[:, None] + width[:, None] * np.array([0, 1, 1, 0], dtype=np.float32)
+    corner_v = v[:, None] + height[:, None] * np.array([0, 0, 1, 1], dtype=np.float32)
+    if direction < 0:
+        # Reverse the winding so it stays counter-clockwise seen from outside
+        corner_u, corner_v = corner_u[:, ::-1], corner_v[:, ::-1]
+
+    quads = np.empty((len(rects), 4, 3), dtype=np.float32)
+    quads[:, :, axis] = (layer + (1 if direction > 0 else 0))[:, None] + origin[axis]
+    quads[:, :, u_axis] = corner_u + origin[u_axis]
+    quads[:, :, v_axis] = corner_v + origin[v_axis]
+    return quads
+
+
+def mesh_chunk(storage, coord, lights=None):
+    """Build the hidden-face-culled, greedily merged mesh of one chunk, lit from an optional LightMap."""
+    light = None if lights is None else lights.padded(coord, CHUNK_SIZE)
+    return mesh_padded(padded_chunk(storage, coord), coord, light)
+
+
+def mesh_padded(padded, coord, light=None):
+    """
+    Build the mesh of one chunk from its padded_chunk() snapshot and an optional padded
+    light level array (fully lit without one), without touching storage.
+    """
+    if not padded[1:-1, 1:-1, 1:-1].any():
+        return Mesh()
+
+    origin = np.array(coord, dtype=np.float32) * CHUNK_SIZE
+    cell_keys = np.arange(1, CHUNK_SIZE ** 3 + 1, dtype=np.int64).reshape((CHUNK_SIZE,) * 3)
+    quads = []
+    block_ids = []
+    colors = []
+    for axis in range(3):
+        u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+        for direction in (-1, 1):
+            faces = np.moveaxis(exposed_faces(padded, axis, direction), axis, 0)
+            if u_axis > v_axis:
+                faces = faces.transpose(0, 2, 1)  # Index every layer as [u, v]
+            if not faces.any():
+                continue
+            occlusion, levels = face_shading(padded, light, axis, direction)
+            # Only faces with the same type, light and occlusion at all four corners may merge;
+            # any other face gets a key of its own
+            uniform = (occlusion == occlusion[..., :1]).all(axis=-1)
+            keys = np.where(
+                uniform,
+                faces.astype(np.int64) | occlusion[..., 0].astype(np.int64) << 8 | levels.astype(np.int64) << 10,
+                -cell_keys,
+            )
+            keys[faces == AIR] = AIR
+
+            rectangles = []
+            for layer in np.flatnonzero(faces.reshape(CHUNK_SIZE, -1).any(axis=1)).tolist():
+                for u, v, width, height, _ in greedy_rectangles(keys[layer]):
+                    rectangles.append((layer, u, v, width, height))
+            if rectangles:
+                layer, u, v = np.array(rectangles)[:, :3].T
+                block_ids.append(faces[layer, u, v])
+                brightness = LIGHT_BRIGHTNESS[levels[layer, u, v]][:, None] * AO_BRIGHTNESS[occlusion[layer, u, v]]
+                color = COLORS[faces[layer, u, v]][:, None, :].repeat(4, axis=1)
+                color[..., :3] *= brightness[..., None]
+                colors.append(color)
+                quads.append(quad_corners(rectangles, axis, direction, origin))
+    if not quads:
+        return Mesh()
+    colors = (np.concatenate(colors) * 255 + 0.5).astype(np.uint8)
+    return Mesh.from_quads(np.concatenate(quads), np.concatenate(block_ids), colors)
+
+
+def mesh_world(storage):
+    """Build one mesh per non-empty chunk. Returns {chunk_coord: Mesh}."""
+    return {coord: mesh_chunk(storage, coord) for coord in storage.coords()}
+
+
+def floor_mesh(min_corner, max_corner):
+    """
+    Build the floor of a world box: a single quad at the bottom of the box plus one
+    grid line per cell boundary along x and z.
+    """
+    (x0, y, z0), (x1, _, z1) = min_corner, max_corner
+    quad = np.array([(x0, y, z0), (x0, y, z1), (x1, y, z1), (x1, y, z0)], dtype=np.float32)
+
+    xs = np.arange(x0, x1 + 1, dtype=np.float32)
+    zs = np.arange(z0, z1 + 1, dtype=np.float32)
+    x_lines = np.stack([np.stack([xs, np.full_like(xs, y), np.full_like(xs, z0)], axis=1),
+                        np.stack([xs, np.full_like(xs, y), np.full_like(xs, z1)], axis=1)], axis=1)
+    z_lines = np.stack([np.stack([np.full_like(zs, x0), np.full_like(zs, y), zs], axis=1),
+                        np.stack([np.full_like(zs, x1), np.full_like(zs, y), zs], axis=1)], axis=1)
+    lines = np.concatenate([x_lines, z_lines]).reshape(-1, 3)
+
+    vertices = np.concatenate([quad, lines])
+    indices = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+    line_indices = np.arange(4, len(vertices), dtype=np.uint32)
+    return Mesh(vertices, indices, line_indices)
+
+
+def box_outline_mesh(min_corner, max_corner):
+    """Build the twelve edges of a box as a line-only mesh."""
+    corners = np.array(
+        [[(min_corner, max_corner)[(i >> axis) & 1][axis] for axis in range(3)] for i in range(8)],
+        dtype=np.float32,
+    )
+    # Corner i has bit `axis` set when it lies on the max side of that axis
+    edges = [(i, i | (1 << axis)) for i in range(8) for axis in range(3) if not i & (1 << axis)]
+    return Mesh(corners, np.zeros(0, dtype=np.uint32), np.array(edges, dtype=np.uint32).ravel())
+
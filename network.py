@@ -0,0 +1,456 @@
+"""
+Authoritative world server and client over asyncio.
+
+The server owns the World; clients keep a mirror of the chunks near their player and
+send edit requests, which the server validates and applies through the world's own
+add_block()/remove_block(). Once per tick the server sends each client one batch:
+- snapshots of chunks that came into range (encoded like the save files) and unloads of
+  chunks that went out of range
+- the edits of the tick in the chunks the client holds, grouped by chunk as 3 bytes per
+  block (u16 index in the chunk, u8 block ID); box edits resend the chunks they touched
+
+Messages are length-prefixed binary frames. Connections are either asyncio streams
+(TCP, e.g. over loopback) or in-process queue pairs from memory_pair().
+"""
+import asyncio
+import math
+import struct
+import time
+
+import numpy as np
+
+from block_types import PALETTE
+from chunks import AIR, CHUNK_SIZE, chunk_coords
+from persistence import encode_chunk, decode_chunk
+from world import World
+
+FRAME = struct.Struct("<I")  # Length of the message that follows
+MESSAGE_TYPE = struct.Struct("<B")
+
+# Server to client
+MSG_WELCOME = 1  # Client ID, world size
+MSG_CHUNK = 2  # Chunk coord, encoding, then the encoded chunk
+MSG_UNLOAD = 3  # Chunk coord
+MSG_EDITS = 4  # Tick, u32 chunk count, then per chunk: coord, edit count, u16 indices, u8 IDs
+# Client to server
+MSG_POSITION = 5  # Player position
+MSG_EDIT = 6  # Block position, block ID (AIR removes)
+
+WELCOME = struct.Struct("<BI3i")
+CHUNK = struct.Struct("<B3iB")
+UNLOAD = struct.Struct("<B3i")
+EDITS = struct.Struct("<BII")
+EDIT_CHUNK = struct.Struct("<3iH")
+POSITION = struct.Struct("<B3f")
+EDIT = struct.Struct("<B3iB")
+
+TICK_RATE = 20  # Server ticks per second
+VIEW_DISTANCE = 4  # Chunks streamed around a client's player, along each axis
+UNLOAD_MARGIN = 1  # Extra chunks a client keeps before they are unloaded, so edges do not flicker
+
+
+class StreamConnection:
+    """A connection over an asyncio stream pair, e.g. from asyncio.open_connection()."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, message):
+        """Queue a message; drain() waits until it has been handed to the socket."""
+        self.writer.write(FRAME.pack(len(message)) + message)
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def receive(self):
+        """Return the next message, or None once the other side has closed."""
+        try:
+            (length,) = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+            return await self.reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    def close(self):
+        self.writer.close()
+
+
+class MemoryConnection:
+    """One end of an in-process connection; see memory_pair()."""
+
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+
+    def send(self, message):
+        self.outbox.put_nowait(message)
+
+    async def drain(self):
+        pass
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    def close(self):
+        self.outbox.put_nowait(None)
+
+
+def memory_pair():
+    """Return two connected MemoryConnections, e.g. (server side, client side)."""
+    a, b = asyncio.Queue(), asyncio.Queue()
+    return MemoryConnection(a, b), MemoryConnection(b, a)
+
+
+def chunk_message(storage, coord):
+    chunk = storage.chunk(coord)
+    encoding, payload = encode_chunk(chunk if chunk is not None else np.zeros((CHUNK_SIZE,) * 3, dtype=np.uint8))
+    return CHUNK.pack(MSG_CHUNK, *coord, encoding) + payload
+
+
+def edits_message(tick, chunk_edits):
+    """Encode {chunk coord: (u16 local indices, u8 block IDs)} as one MSG_EDITS message."""
+    parts = [EDITS.pack(MSG_EDITS, tick, len(chunk_edits))]
+    for coord, (indices, values) in chunk_edits.items():
+        parts.append(EDIT_CHUNK.pack(*coord, len(indices)))
+        parts.append(indices.astype("<u2").tobytes())
+        parts.append(values.astype(np.uint8).tobytes())
+    return b"".join(parts)
+
+
+def chunk_distance(a, b):
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]), abs(a[2] - b[2]))
+
+
+class ClientSession:
+    """The server's view of one connected client."""
+
+    def __init__(self, client_id, connection):
+        self.client_id = client_id
+        self.connection = connection
+        self.position = None  # Last reported player position
+        self.center = None  # Chunk the chunks in range were last computed around
+        self.known = set()  # Chunk coords the client holds
+        self.outbox = []  # Messages of the current tick
+        self.bytes_sent = 0
+        self.reader = None  # Task reading the client's messages
+
+
+class WorldServer:
+    """
+    Serves one World to any number of clients. While it runs, every edit of the world
+    (local, from clients, or undo/redo) is streamed to the clients holding its chunk.
+    """
+
+    def __init__(self, world, tick_rate=TICK_RATE, view_distance=VIEW_DISTANCE):
+        self.world = world
+        self.tick_rate = tick_rate
+        self.view_distance = view_distance
+        self.sessions = {}  # {client ID: ClientSession}
+        self.next_client_id = 1
+        self.requests = []  # (session, position, block ID) edit requests waiting for the next tick
+        self.changed_blocks = set()  # Positions edited since the last tick
+        self.changed_boxes = []  # (min_corner, max_corner) of box edits since the last tick
+        self.snapshots = {}  # {chunk coord: encoded MSG_CHUNK}, shared by every client until the chunk changes
+        self.ticks = 0
+        self.edits_applied = 0
+        self.edits_rejected = 0  # Edit requests dropped for an unknown block ID or a position outside the world
+        self.positions_rejected = 0  # Position updates dropped for a NaN or infinite coordinate
+        self.messages_rejected = 0  # Frames of the wrong size or of an unknown kind
+        self.snapshot_bytes = 0  # Bytes of chunk snapshots sent
+        self.delta_bytes = 0  # Bytes of edit batches sent
+        self.running = False
+        world.server = self
+
+    # Called by World for every edit
+    def record_block(self, position):
+        self.changed_blocks.add(position)
+
+    def record_box(self, min_corner, max_corner):
+        self.changed_boxes.append((tuple(min_corner), tuple(max_corner)))
+
+    def connect(self, connection):
+        """Start serving a client over a connection. Returns its session."""
+        session = ClientSession(self.next_client_id, connection)
+        self.next_client_id += 1
+        self.sessions[session.client_id] = session
+        session.outbox.append(WELCOME.pack(MSG_WELCOME, session.client_id, *self.world.size))
+        session.reader = asyncio.ensure_future(self.read_loop(session))
+        return session
+
+    def disconnect(self, session):
+        if self.sessions.pop(session.client_id, None) is not None:
+            session.connection.close()
+
+    async def read_loop(self, session):
+        """
+        Take in a client's position updates and edit requests until it disconnects.
+        Malformed frames and unknown message kinds are counted and skipped; however the
+        loop ends, the session is disconnected.
+        """
+        try:
+            while True:
+                message = await session.connection.receive()
+                if message is None:
+                    break
+                try:
+                    self.handle(session, message)
+                except struct.error:
+                    self.messages_rejected += 1
+        finally:
+            self.disconnect(session)
+
+    def handle(self, session, message):
+        """Apply one message from a client."""
+        (kind,) = MESSAGE_TYPE.unpack_from(message)
+        if kind == MSG_POSITION:
+            position = POSITION.unpack(message)[1:]
+            if all(math.isfinite(c) for c in position):
+                # Clamp into the world so a far-away position cannot blow up the chunk range
+                min_corner, max_corner = self.world.bounds()
+                session.position = tuple(min(max(position[i], min_corner[i]), max_corner[i]) for i in range(3))
+            else:
+                self.positions_rejected += 1
+        elif kind == MSG_EDIT:
+            _, x, y, z, block_id = EDIT.unpack(message)
+            if block_id < len(PALETTE) and self.world.is_within_bounds(x, y, z):
+                self.requests.append((session, (x, y, z), block_id))
+            else:
+                self.edits_rejected += 1
+        else:
+            self.messages_rejected += 1
+
+    async def serve(self, host="127.0.0.1", port=0):
+        """Accept TCP clients; returns the asyncio server (see its sockets for the port)."""
+        return await asyncio.start_server(
+            lambda reader, writer: self.connect(StreamConnection(reader, writer)), host, port)
+
+    async def run(self, ticks=None):
+        """Tick at tick_rate until stop() is called (or for a number of ticks)."""
+        self.running = True
+        interval = 1.0 / self.tick_rate
+        next_tick = time.perf_counter()
+        while self.running and (ticks is None or ticks > 0):
+            await self.tick()
+            if ticks is not None:
+                ticks -= 1
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        """Stop ticking and disconnect every client."""
+        self.stop()
+        for session in list(self.sessions.values()):
+            self.disconnect(session)
+        self.world.server = None
+
+    async def tick(self):
+        """Apply the queued edit requests, then send every client its batch for the tick."""
+        await asyncio.sleep(0)  # Let the read loops take in what has arrived
+        requests, self.requests = self.requests, []
+        for _, (x, y, z), block_id in requests:
+            if block_id == AIR:
+                self.world.remove_block(x, y, z)
+            else:
+                self.world.add_block(x, y, z, block_id)
+        self.edits_applied += len(requests)
+
+        chunk_edits = self.collect_edits()
+        resent = self.collect_boxes()
+        for coord in resent.union(chunk_edits):
+            self.snapshots.pop(coord, None)
+        for session in list(self.sessions.values()):
+            self.update_session(session, chunk_edits, resent)
+        await asyncio.gather(*(self.flush(session) for session in list(self.sessions.values())))
+        self.ticks += 1
+
+    def collect_edits(self):
+        """Group this tick's single-block edits by chunk with their current block IDs."""
+        by_chunk = {}
+        for position in self.changed_blocks:
+            coord, local = chunk_coords(*position)
+            by_chunk.setdefault(coord, []).append(
+                ((local[0] * CHUNK_SIZE + local[1]) * CHUNK_SIZE + local[2], self.world.blocks.get(*position)))
+        self.changed_blocks.clear()
+        return {coord: (np.array([index for index, _ in edits], dtype=np.uint16),
+                        np.array([value for _, value in edits], dtype=np.uint8))
+                for coord, edits in by_chunk.items()}
+
+    def collect_boxes(self):
+        """Return the chunk coords touched by this tick's box edits."""
+        touched = set()
+        for min_corner, max_corner in self.changed_boxes:
+            low = [min_corner[i] // CHUNK_SIZE for i in range(3)]
+            high = [(max_corner[i] - 1) // CHUNK_SIZE for i in range(3)]
+            touched.update((cx, cy, cz) for cx in range(low[0], high[0] + 1)
+                           for cy in range(low[1], high[1] + 1) for cz in range(low[2], high[2] + 1))
+        self.changed_boxes.clear()
+        return touched
+
+    def update_session(self, session, chunk_edits, resent):
+        """Queue the chunk loads, unloads and edits of one client for this tick."""
+        storage = self.world.blocks
+        if session.position is not None:
+            center = tuple(math.floor(c) // CHUNK_SIZE for c in session.position)
+            if center != session.center:
+                session.center = center
+                radius = self.view_distance
+                for coord in [coord for coord in session.known if chunk_distance(coord, center) > radius + UNLOAD_MARGIN]:
+                    session.known.discard(coord)
+                    session.outbox.append(UNLOAD.pack(MSG_UNLOAD, *coord))
+                for coord in storage.chunks_in_box([(c - radius) * CHUNK_SIZE for c in center],
+                                                   [(c + radius + 1) * CHUNK_SIZE for c in center]):
+                    if coord not in session.known:
+                        self.send_snapshot(session, coord)
+
+        edits = {}
+        for coord, delta in chunk_edits.items():
+            if coord in resent:
+                continue  # Resent whole below
+            if coord in session.known:
+                edits[coord] = delta
+            elif session.center is not None and chunk_distance(coord, session.center) <= self.view_distance \
+                    and coord in storage.counts:
+                self.send_snapshot(session, coord)  # A chunk created in range
+        for coord in resent:
+            if coord in session.known or (session.center is not None and coord in storage.counts
+                                          and chunk_distance(coord, session.center) <= self.view_distance):
+                self.send_snapshot(session, coord)
+        message = edits_message(self.ticks, edits)
+        self.delta_bytes += len(message)
+        session.outbox.append(message)
+
+    def send_snapshot(self, session, coord):
+        message = self.snapshots.get(coord)
+        if message is None:
+            message = self.snapshots[coord] = chunk_message(self.world.blocks, coord)
+        self.snapshot_bytes += len(message)
+        session.outbox.append(message)
+        session.known.add(coord)
+
+    async def flush(self, session):
+        messages, session.outbox = session.outbox, []
+        for message in messages:
+            session.connection.send(message)
+            session.bytes_sent += FRAME.size + len(message)
+        try:
+            await session.connection.drain()
+        except ConnectionError:
+            self.disconnect(session)
+
+
+class WorldClient:
+    """
+    Keeps a local World in sync with a WorldServer and sends it the player's position
+    and edit requests. Run receive_loop() as a task; edits show up once the server
+    has applied them.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.world = None  # Mirror of the chunks in range, created on welcome
+        self.client_id = None
+        self.tick = -1  # Latest server tick received
+        self.bytes_received = 0
+        self.ticked = asyncio.Event()  # Set whenever a tick's batch has been applied
+        self.welcomed = asyncio.Event()
+
+    @classmethod
+    async def open(cls, host, port):
+        """Connect to a server over TCP."""
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(StreamConnection(reader, writer))
+
+    def send_position(self, position):
+        self.connection.send(POSITION.pack(MSG_POSITION, *position))
+
+    def add_block(self, x, y, z, block_type):
+        self.connection.send(EDIT.pack(MSG_EDIT, x, y, z, block_type))
+
+    def remove_block(self, x, y, z):
+        self.connection.send(EDIT.pack(MSG_EDIT, x, y, z, AIR))
+
+    async def wait_tick(self, tick):
+        """Wait until the batch of a server tick has been applied."""
+        while self.tick < tick:
+            self.ticked.clear()
+            await self.ticked.wait()
+
+    async def receive_loop(self):
+        """Apply the server's messages to the local world until the connection closes."""
+        while True:
+            message = await self.connection.receive()
+            if message is None:
+                return
+            self.bytes_received += FRAME.size + len(message)
+            self.handle(message)
+
+    def handle(self, message):
+        (kind,) = MESSAGE_TYPE.unpack_from(message)
+        world = self.world
+        if kind == MSG_WELCOME:
+            _, self.client_id, *size = WELCOME.unpack(message)
+            self.world = World(size=tuple(size))
+            self.welcomed.set()
+        elif kind == MSG_CHUNK:
+            _, cx, cy, cz, encoding = CHUNK.unpack_from(message)
+            world.blocks.put_chunk((cx, cy, cz), decode_chunk(encoding, message[CHUNK.size:]))
+            self.chunk_changed((cx, cy, cz))
+        elif kind == MSG_UNLOAD:
+            coord = UNLOAD.unpack(message)[1:]
+            world.blocks.discard(coord)
+            self.chunk_changed(coord)
+        elif kind == MSG_EDITS:
+            _, tick, chunk_count = EDITS.unpack_from(message)
+            offset = EDITS.size
+            for _ in range(chunk_count):
+                cx, cy, cz, count = EDIT_CHUNK.unpack_from(message, offset)
+                offset += EDIT_CHUNK.size
+                indices = np.frombuffer(message, dtype="<u2", count=count, offset=offset)
+                values = np.frombuffer(message, dtype=np.uint8, count=count, offset=offset + 2 * count)
+                offset += 3 * count
+                base = (cx * CHUNK_SIZE, cy * CHUNK_SIZE, cz * CHUNK_SIZE)
+                for index, value in zip(indices.tolist(), values.tolist()):
+                    x = base[0] + index // (CHUNK_SIZE * CHUNK_SIZE)
+                    y = base[1] + index // CHUNK_SIZE % CHUNK_SIZE
+                    z = base[2] + index % CHUNK_SIZE
+                    world.blocks.set(x, y, z, value)
+                    world.block_changed(x, y, z)
+            self.tick = tick
+            self.ticked.set()
+
+    def chunk_changed(self, coord):
+        self.world.blocks_changed([c * CHUNK_SIZE for c in coord], [(c + 1) * CHUNK_SIZE for c in coord])
+
+    def close(self):
+        self.connection.close()
+
+
+async def serve_world(world, host="127.0.0.1", port=25565):
+    """Serve a world over TCP until cancelled."""
+    server = WorldServer(world)
+    listener = await server.serve(host, port)
+    print(f"Serving on {', '.join(str(sock.getsockname()) for sock in listener.sockets)}")
+    try:
+        await server.run()
+    finally:
+        listener.close()
+        server.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from terrain import generate_world
+
+    parser = argparse.ArgumentParser(description="Run a headless world server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25565)
+    parser.add_argument("--size", type=int, nargs=3, default=(64, 32, 64), help="world size x y z")
+    parser.add_argument("--seed", type=int, default=0, help="terrain seed")
+    args = parser.parse_args()
+    served = World(size=tuple(args.size))
+    generate_world(served, args.seed)
+    asyncio.run(serve_world(served, args.host, args.port))
@@ -0,0 +1,220 @@
+"""
+Sparse voxel octree over a ChunkStorage, for skipping empty space.
+
+The tree is a pyramid of occupancy counts kept next to the chunks rather than a copy of
+the blocks: level 0 holds the block count of every non-empty chunk, and each level above
+groups 2x2x2 nodes of the one below, up to nodes OCTREE_LEVELS doublings larger than a
+chunk. Only non-empty nodes are stored. Below the chunks, each chunk gets a small map of
+which BRICK_SIZE^3 bricks hold any block, built on first use.
+
+Raycasts jump across the largest empty node around the ray in one step, and box and
+nearest-block queries only descend into non-empty nodes.
+"""
+import heapq
+import math
+
+import numpy as np
+
+from chunks import AIR, CHUNK_SIZE
+from utils import RayHit, normalize
+
+OCTREE_LEVELS = 8  # Levels above the chunks; the largest nodes are CHUNK_SIZE << 8 blocks wide
+BRICK_SIZE = 4  # Edge length of the empty-space bricks inside a chunk
+BRICKS = CHUNK_SIZE // BRICK_SIZE  # Bricks per chunk edge
+
+
+def node_box(level, coord):
+    """Return the (min_corner, max_corner) in blocks of a node (max_corner exclusive)."""
+    size = CHUNK_SIZE << level
+    return tuple(c * size for c in coord), tuple((c + 1) * size for c in coord)
+
+
+def box_distance(point, min_corner, max_corner):
+    """Distance from a point to the closest point of an axis-aligned box (0 inside it)."""
+    return math.sqrt(sum(max(min_corner[i] - point[i], 0, point[i] - max_corner[i]) ** 2 for i in range(3)))
+
+
+class SparseVoxelOctree:
+    """
+    Hierarchical occupancy index of a ChunkStorage. Call update() with the chunks an
+    edit touched (World does this for every edit once enabled).
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.levels = [{} for _ in range(OCTREE_LEVELS + 1)]  # Per level, {node coord: block count}
+        self.bricks = {}  # {chunk coord: (BRICKS,) * 3 bool array of bricks holding blocks}
+        self.rebuild()
+
+    def rebuild(self):
+        """Index the whole storage from scratch."""
+        self.levels = [{} for _ in range(OCTREE_LEVELS + 1)]
+        self.bricks.clear()
+        self.update(self.storage.coords())
+
+    def update(self, chunk_coords):
+        """Bring the nodes above the given chunks up to date with their block counts."""
+        for coord in chunk_coords:
+            self.bricks.pop(coord, None)
+            count = self.storage.counts.get(coord, 0)
+            delta = count - self.levels[0].get(coord, 0)
+            if not delta:
+                continue
+            for level, nodes in enumerate(self.levels):
+                node = (coord[0] >> level, coord[1] >> level, coord[2] >> level)
+                total = nodes.get(node, 0) + delta
+                if total:
+                    nodes[node] = total
+                else:
+                    del nodes[node]
+
+    def update_box(self, min_corner, max_corner):
+        """Bring the index up to date after the blocks of a box (max_corner exclusive) changed."""
+        low = [min_corner[i] // CHUNK_SIZE for i in range(3)]
+        high = [-(-max_corner[i] // CHUNK_SIZE) for i in range(3)]
+        indexed = [coord for coord in self.levels[0] if all(low[i] <= coord[i] < high[i] for i in range(3))]
+        self.update(set(self.storage.chunks_in_box(min_corner, max_corner)).union(indexed))
+
+    def brick_map(self, coord):
+        """Return which bricks of a non-empty chunk hold any block."""
+        bricks = self.bricks.get(coord)
+        if bricks is None:
+            chunk = self.storage.chunk(coord)
+            bricks = self.bricks[coord] = chunk.reshape(
+                BRICKS, BRICK_SIZE, BRICKS, BRICK_SIZE, BRICKS, BRICK_SIZE).any(axis=(1, 3, 5))
+        return bricks
+
+    def empty_size(self, cell):
+        """
+        Return the edge length of the largest empty node (or brick, or single cell)
+        containing a cell, or 0 if the cell holds a block.
+        """
+        x, y, z = cell
+        chunk = (x // CHUNK_SIZE, y // CHUNK_SIZE, z // CHUNK_SIZE)
+        if chunk in self.levels[0]:
+            bricks = self.brick_map(chunk)
+            if bricks[x % CHUNK_SIZE // BRICK_SIZE, y % CHUNK_SIZE // BRICK_SIZE, z % CHUNK_SIZE // BRICK_SIZE]:
+                return 0 if self.storage.get(x, y, z) != AIR else 1
+            return BRICK_SIZE
+        size = CHUNK_SIZE
+        for level in range(1, OCTREE_LEVELS + 1):
+            if (chunk[0] >> level, chunk[1] >> level, chunk[2] >> level) in self.levels[level]:
+                break
+            size <<= 1
+        return size
+
+    def raycast(self, origin, direction, max_distance=10.0):
+        """
+        Like World.raycast(): return the RayHit of the first block along the ray, or None
+        if nothing is hit within max_distance. Empty nodes are crossed in one step.
+        """
+        direction = normalize(direction)
+        cell = [int(math.floor(origin[i])) for i in range(3)]
+        normal = (0, 0, 0)
+        distance = 0.0
+        while True:
+            size = self.empty_size(cell)
+            if not size:
+                return RayHit(tuple(cell), normal, distance)
+
+            # Leave the empty node containing the cell through its nearest face
+            low = [cell[i] // size * size for i in range(3)]
+            exit_distance = math.inf
+            axis = None
+            for i in range(3):
+                if direction[i] > 0:
+                    t = (low[i] + size - origin[i]) / direction[i]
+                elif direction[i] < 0:
+                    t = (low[i] - origin[i]) / direction[i]
+                else:
+                    continue
+                if t < exit_distance:
+                    exit_distance, axis = t, i
+            if axis is None or exit_distance > max_distance:
+                return None
+
+            distance = max(distance, exit_distance)
+            for i in range(3):
+                if i == axis:
+                    cell[i] = low[i] + size if direction[i] > 0 else low[i] - 1
+                else:
+                    # Stay inside the node on the other axes, whatever the rounding
+                    cell[i] = min(max(int(math.floor(origin[i] + direction[i] * distance)), low[i]), low[i] + size - 1)
+            normal = [0, 0, 0]
+            normal[axis] = -1 if direction[axis] > 0 else 1
+            normal = tuple(normal)
+
+    def nodes_in_box(self, level, min_corner, max_corner):
+        """Yield the non-empty nodes of a level overlapping a box (max_corner exclusive)."""
+        size = CHUNK_SIZE << level
+        low = [min_corner[i] // size for i in range(3)]
+        high = [-(-max_corner[i] // size) for i in range(3)]
+        nodes = self.levels[level]
+        if (high[0] - low[0]) * (high[1] - low[1]) * (high[2] - low[2]) > len(nodes):
+            yield from (node for node in nodes if all(low[i] <= node[i] < high[i] for i in range(3)))
+            return
+        for nx in range(low[0], high[0]):
+            for ny in range(low[1], high[1]):
+                for nz in range(low[2], high[2]):
+                    if (nx, ny, nz) in nodes:
+                        yield nx, ny, nz
+
+    def any_in_box(self, min_corner, max_corner):
+        """Return whether any block lies in a box (max_corner exclusive)."""
+        if any(max_corner[i] <= min_corner[i] for i in range(3)):
+            return False
+        # Start from the finest level whose nodes cover the box with at most two per axis
+        level = 0
+        while level < OCTREE_LEVELS and any(
+                -(-max_corner[i] // (CHUNK_SIZE << level)) - min_corner[i] // (CHUNK_SIZE << level) > 2 for i in range(3)):
+            level += 1
+        pending = [(level, node) for node in self.nodes_in_box(level, min_corner, max_corner)]
+        while pending:
+            level, node = pending.pop()
+            low, high = node_box(level, node)
+            if all(min_corner[i] <= low[i] and high[i] <= max_corner[i] for i in range(3)):
+                return True  # A non-empty node entirely inside the box
+            if level == 0:
+                source = tuple(slice(max(min_corner[i], low[i]) - low[i], min(max_corner[i], high[i]) - low[i])
+                               for i in range(3))
+                if self.storage.chunk(node)[source].any():
+                    return True
+                continue
+            overlap_low = [max(min_corner[i], low[i]) for i in range(3)]
+            overlap_high = [min(max_corner[i], high[i]) for i in range(3)]
+            pending.extend((level - 1, child) for child in self.nodes_in_box(level - 1, overlap_low, overlap_high))
+        return False
+
+    def nearest_solid(self, point, max_distance=math.inf):
+        """
+        Return (block position, distance) of the block closest to a point, measured to
+        the nearest point of the block's cube, or None if there is none within
+        max_distance. Nodes are visited nearest first, so far-away ones are never opened.
+        """
+        queue = []  # (distance lower bound, tie breaker, level or -1 for a block, coord)
+        for node in self.levels[OCTREE_LEVELS]:
+            distance = box_distance(point, *node_box(OCTREE_LEVELS, node))
+            if distance <= max_distance:
+                heapq.heappush(queue, (distance, len(queue), OCTREE_LEVELS, node))
+        pushed = len(queue)
+        while queue:
+            distance, _, level, node = heapq.heappop(queue)
+            if level < 0:
+                return node, distance
+            if level == 0:
+                # The closest block of the chunk goes back into the queue as a candidate
+                low, _ = node_box(0, node)
+                cells = np.argwhere(self.storage.chunk(node) != AIR) + low
+                gaps = np.maximum(np.maximum(cells - np.asarray(point), 0), np.asarray(point) - (cells + 1))
+                distances = np.sqrt((gaps ** 2).sum(axis=1))
+                best = int(distances.argmin())
+                if distances[best] <= max_distance:
+                    heapq.heappush(queue, (float(distances[best]), pushed, -1, tuple(cells[best].tolist())))
+                    pushed += 1
+                continue
+            for child in self.nodes_in_box(level - 1, *node_box(level, node)):
+                child_distance = box_distance(point, *node_box(level - 1, child))
+                if child_distance <= max_distance:
+                    heapq.heappush(queue, (child_distance, pushed, level - 1, child))
+                    pushed += 1
+        return None
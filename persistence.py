@@ -0,0 +1,199 @@
+"""
+Binary save/load of a World as a directory of region files.
+
+Layout:
+- world.dat: magic, format version and world size.
+- r.<rx>.<ry>.<rz>.mcr: one file per REGION_SIZE^3 chunks, holding a header, an index
+  of (chunk coord, encoding, block count, offset, length) entries, then the compressed
+  chunk payloads. The index lets a single chunk be decoded straight from an mmap.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from chunks import CHUNK_SIZE
+from world import World
+
+FORMAT_VERSION = 1
+REGION_SIZE = 8  # Chunks per region file along each axis
+WORLD_MAGIC = b"MCWD"
+REGION_MAGIC = b"MCRG"
+WORLD_HEADER = struct.Struct("<4sH3i")  # magic, version, size x/y/z
+REGION_HEADER = struct.Struct("<4sHI")  # magic, version, chunk count
+INDEX_ENTRY = struct.Struct("<3iBHII")  # chunk coord, encoding, block count, payload offset, payload length
+
+ENCODING_RAW = 0  # The CHUNK_SIZE^3 block IDs as they are
+ENCODING_RLE = 1  # u16 run count, u16 run lengths, u8 run values
+ENCODING_PALETTE = 2  # u16 palette size, u8 palette, bit-packed palette indices
+
+CHUNK_VOLUME = CHUNK_SIZE ** 3
+
+
+def encode_raw(flat):
+    return flat.tobytes()
+
+
+def decode_raw(payload):
+    return np.frombuffer(payload, dtype=np.uint8).copy()
+
+
+def encode_rle(flat):
+    """Run-length encode a flat chunk."""
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(flat))).astype("<u2")
+    return struct.pack("<H", len(starts)) + lengths.tobytes() + flat[starts].tobytes()
+
+
+def decode_rle(payload):
+    (count,) = struct.unpack_from("<H", payload)
+    lengths = np.frombuffer(payload, dtype="<u2", count=count, offset=2)
+    values = np.frombuffer(payload, dtype=np.uint8, count=count, offset=2 + 2 * count)
+    return np.repeat(values, lengths)
+
+
+def encode_palette(flat):
+    """Encode a flat chunk as a palette of its distinct IDs plus bit-packed indices."""
+    palette, indices = np.unique(flat, return_inverse=True)
+    bits = (len(palette) - 1).bit_length()
+    payload = struct.pack("<H", len(palette)) + palette.astype(np.uint8).tobytes()
+    if bits:
+        planes = (indices.reshape(-1, 1) >> np.arange(bits)) & 1
+        payload += np.packbits(planes.astype(np.uint8).ravel()).tobytes()
+    return payload
+
+
+def decode_palette(payload):
+    (count,) = struct.unpack_from("<H", payload)
+    palette = np.frombuffer(payload, dtype=np.uint8, count=count, offset=2)
+    bits = (count - 1).bit_length()
+    if not bits:
+        return np.full(CHUNK_VOLUME, palette[0], dtype=np.uint8)
+    packed = np.frombuffer(payload, dtype=np.uint8, offset=2 + count)
+    planes = np.unpackbits(packed, count=CHUNK_VOLUME * bits).reshape(-1, bits)
+    return palette[planes.astype(np.intp) @ (1 << np.arange(bits))]
+
+
+ENCODERS = {ENCODING_RAW: encode_raw, ENCODING_RLE: encode_rle, ENCODING_PALETTE: encode_palette}
+DECODERS = {ENCODING_RAW: decode_raw, ENCODING_RLE: decode_rle, ENCODING_PALETTE: decode_palette}
+
+
+def encode_chunk(chunk):
+    """Encode a chunk with whichever encoding is smallest. Returns (encoding, payload)."""
+    flat = np.ascontiguousarray(chunk, dtype=np.uint8).reshape(-1)
+    return min(((encoding, encode(flat)) for encoding, encode in ENCODERS.items()), key=lambda item: len(item[1]))
+
+
+def decode_chunk(encoding, payload):
+    """Decode a chunk payload back into a flat uint8 array of CHUNK_SIZE^3 block IDs."""
+    return DECODERS[encoding](payload)
+
+
+def region_of(coord):
+    return (coord[0] // REGION_SIZE, coord[1] // REGION_SIZE, coord[2] // REGION_SIZE)
+
+
+def region_path(directory, region):
+    return os.path.join(directory, "r.%d.%d.%d.mcr" % region)
+
+
+def write_region(path, chunks):
+    """Write {coord: (block count, chunk array)} into one region file, atomically."""
+    index = []
+    payloads = []
+    offset = REGION_HEADER.size + INDEX_ENTRY.size * len(chunks)
+    for coord, (count, chunk) in sorted(chunks.items()):
+        encoding, payload = encode_chunk(chunk)
+        index.append(INDEX_ENTRY.pack(*coord, encoding, count, offset, len(payload)))
+        payloads.append(payload)
+        offset += len(payload)
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(REGION_HEADER.pack(REGION_MAGIC, FORMAT_VERSION, len(chunks)))
+        file.write(b"".join(index))
+        file.write(b"".join(payloads))
+    os.replace(temporary, path)
+
+
+class RegionFile:
+    """A region file mapped into memory; chunks are decoded individually on request."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = REGION_HEADER.unpack_from(self.map)
+        if magic != REGION_MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} region file")
+        self.index = {}  # {coord: (encoding, block count, offset, length)}
+        for entry in INDEX_ENTRY.iter_unpack(self.map[REGION_HEADER.size:REGION_HEADER.size + INDEX_ENTRY.size * count]):
+            self.index[tuple(entry[:3])] = entry[3:]
+
+    def read_chunk(self, coord):
+        """Decode one chunk straight from the mapped file."""
+        encoding, _, offset, length = self.index[coord]
+        return decode_chunk(encoding, self.map[offset:offset + length])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def save_world(world, directory):
+    """Write the world into `directory`, replacing any world saved there before."""
+    os.makedirs(directory, exist_ok=True)
+    regions = {}
+    for coord in world.blocks.coords():
+        chunk = world.blocks.chunk(coord)
+        if chunk is not None:
+            regions.setdefault(region_of(coord), {})[coord] = (world.blocks.counts[coord], chunk)
+
+    for region, chunks in regions.items():
+        write_region(region_path(directory, region), chunks)
+
+    # Drop region files left over from an earlier, larger save
+    written = {os.path.basename(region_path(directory, region)) for region in regions}
+    for name in os.listdir(directory):
+        if name.endswith(".mcr") and name not in written:
+            os.remove(os.path.join(directory, name))
+
+    with open(os.path.join(directory, "world.dat"), "wb") as file:
+        file.write(WORLD_HEADER.pack(WORLD_MAGIC, FORMAT_VERSION, *world.size))
+
+
+def load_world(directory, lazy=True):
+    """
+    Load a world saved with save_world().
+    With lazy=True only the region indexes are read; each chunk is decoded from its
+    mapped region file the first time it is accessed. Chunks are meshed once they come
+    into view (see World.unmeshed_chunks), so loading touches none of them.
+    The world keeps the region files open; call its close() when done with it.
+    """
+    with open(os.path.join(directory, "world.dat"), "rb") as file:
+        magic, version, *size = WORLD_HEADER.unpack(file.read(WORLD_HEADER.size))
+    if magic != WORLD_MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{directory} does not hold a version {FORMAT_VERSION} world")
+
+    world = World(size=tuple(size))
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".mcr"):
+            continue
+        try:
+            region = RegionFile(os.path.join(directory, name))
+        except ValueError:
+            world.close()  # Release the regions already mapped
+            raise
+        for coord, (_, count, _, _) in region.index.items():
+            if lazy:
+                world.blocks.add_lazy(coord, region, count)
+            else:
+                world.blocks.put_chunk(coord, region.read_chunk(coord))
+        if lazy:
+            world.blocks.sources.append(region)
+        else:
+            region.close()
+    world.unmeshed_chunks.update(world.blocks.coords())
+    return world
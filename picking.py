@@ -0,0 +1,47 @@
+from collections import namedtuple
+
+from utils import traverse_grid
+
+# What the player is pointing at: the first block hit and the face the ray entered
+# through, or else the first floor-level cell crossed. Unused fields are None.
+PickResult = namedtuple("PickResult", ["block", "normal", "floor_cell"])
+
+
+class Picker:
+    """
+    Computes the player's pick target once and shares it between highlight, place and remove.
+    The cached result is reused until the ray origin, ray direction or world version changes.
+    """
+
+    def __init__(self, world, max_distance=10.0, grid_size=(1, 1, 1)):
+        self.world = world
+        self.max_distance = max_distance
+        self.grid_size = grid_size
+        self.key = None  # (origin, direction, world version) of the cached result
+        self.result = PickResult(None, None, None)
+        self.requests = 0  # Number of pick() calls
+        self.raycasts = 0  # Number of raycasts actually performed
+
+    @property
+    def saved(self):
+        """Number of raycasts avoided thanks to the cache."""
+        return self.requests - self.raycasts
+
+    def pick(self, origin, direction):
+        """Return the PickResult for a ray, recomputing it only if something changed."""
+        self.requests += 1
+        key = (tuple(origin), tuple(direction), self.world.version)
+        if key != self.key:
+            self.result = self.cast(origin, direction)
+            self.key = key
+            self.raycasts += 1
+        return self.result
+
+    def cast(self, origin, direction):
+        """Walk the ray and find the target block or floor cell."""
+        for hit in traverse_grid(origin, direction, self.max_distance, self.grid_size):
+            if hit.position in self.world.blocks:
+                return PickResult(hit.position, hit.normal, None)
+            if hit.position[1] == 0:
+                return PickResult(None, None, hit.position)
+        return PickResult(None, None, None)
@@ -1,9 +1,14 @@
-from math import sin, cos, radians
+from math import sin, cos, radians, floor, ceil
+
+from block_types import IS_SOLID
+
+COLLISION_EPSILON = 1e-6  # Slack so a box resting flush against a face does not count as overlapping it
 
 
 class Player:
     def __init__(self, bounding_box, start_position=(0.0, 1.0, 0.0)):
         self.position = list(start_position)  # Player's position in the world
+        self.previous_position = list(start_position)  # Position before the last update, for interpolation
         self.bounding_box = bounding_box  # Bounding box as [(min_x, max_x), (min_y, max_y), (min_z, max_z)]
         self.velocity = [0.0, 0.0, 0.0]  # Velocity vector for movement and gravity
         self.gravity = -9.8  # Gravity constant
@@ -14,9 +19,28 @@ class Player:
         self.camera_front = [0.0, 0.0, -1.0]  # Camera direction
         self.camera_up = [0.0, 1.0, 0.0]  # Up vector
         self.grounded = True  # Is the player on the ground?
-
-    def update(self, delta_time, keys):
-        """Update player position and physics."""
+        self.height = 1.8  # Collision box height
+        self.eye_height = 1.5  # Height of the camera above the bottom of the collision box
+        self.half_width = 0.3  # Half the collision box width on x and z
+        self.max_fall_speed = 50.0  # Terminal velocity (units per second)
+        self.max_substep = 1 / 30  # Longest physics substep (seconds)
+        self.max_substeps = 8  # Most substeps per update; longer frames drop the excess time
+
+    def update(self, delta_time, keys, world=None):
+        """
+        Update player position and physics.
+        The step is split into at most max_substeps substeps of at most max_substep
+        seconds, so a long frame costs bounded work; time beyond that is dropped.
+        """
+        self.previous_position = list(self.position)
+
+        substeps = min(self.max_substeps, max(1, ceil(delta_time / self.max_substep)))
+        step_time = min(delta_time / substeps, self.max_substep)
+        for _ in range(substeps):
+            self.step(step_time, keys, world)
+
+    def step(self, delta_time, keys, world):
+        """Advance the player by one physics substep."""
         # Calculate movement direction based on key presses
         forward = [
             cos(radians(self.yaw)) * cos(radians(self.pitch)),
@@ -48,38 +72,72 @@ class Player:
             movement[0] += right[0] * self.speed * delta_time
             movement[2] += right[2] * self.speed * delta_time
 
-        # Apply movement
-        self.position[0] += movement[0]
-        self.position[1] += movement[1]
-        self.position[2] += movement[2]
+        # Apply gravity, limited to a terminal speed so a sweep never covers too many cells
+        self.velocity[1] = max(-self.max_fall_speed, self.velocity[1] + self.gravity * delta_time)
+        movement[1] += self.velocity[1] * delta_time
 
-        # Apply gravity
-        if not self.grounded:
-            self.velocity[1] += self.gravity * delta_time
-        else:
-            self.velocity[1] = 0.0
-
-        # Apply vertical movement (gravity or jump)
-        self.position[1] += self.velocity[1] * delta_time
+        # Sweep the bounding box one axis at a time, vertical first
+        self.grounded = False
+        for axis in (1, 0, 2):
+            moved = self.sweep(axis, movement[axis], world)
+            if axis == 1 and moved != movement[1]:
+                if movement[1] < 0:
+                    self.grounded = True  # Landed on the floor or a block
+                self.velocity[1] = 0.0
+            self.position[axis] += moved
 
         # Enforce bounding box constraints
         self.position[0] = max(self.bounding_box[0][0], min(self.bounding_box[0][1], self.position[0]))
-        self.position[1] = max(self.bounding_box[1][0], min(self.bounding_box[1][1], self.position[1]))
+        self.position[1] = min(self.bounding_box[1][1], self.position[1])
         self.position[2] = max(self.bounding_box[2][0], min(self.bounding_box[2][1], self.position[2]))
 
-        # Check if grounded
-        if self.position[1] <= self.bounding_box[1][0] + 0.001:
-            self.grounded = True
-            self.position[1] = self.bounding_box[1][0]
-        else:
-            self.grounded = False
+    def get_aabb(self):
+        """Return the (min_corner, max_corner) of the player's collision box."""
+        return (
+            [self.position[0] - self.half_width, self.position[1] - self.eye_height, self.position[2] - self.half_width],
+            [self.position[0] + self.half_width, self.position[1] - self.eye_height + self.height,
+             self.position[2] + self.half_width],
+        )
+
+    def is_solid(self, world, x, y, z):
+        """Cells below the floor and cells holding a solid block type are solid."""
+        if y < self.bounding_box[1][0]:
+            return True
+        return world is not None and IS_SOLID[world.blocks.get(x, y, z)]
+
+    def sweep(self, axis, distance, world):
+        """
+        Return how far the collision box can move along `axis` (up to `distance`)
+        before touching a solid cell. Only the layers of cells the leading face
+        crosses, within the box's cross-section, are looked at.
+        """
+        if distance == 0.0:
+            return 0.0
+        box_min, box_max = self.get_aabb()
+        others = [i for i in range(3) if i != axis]
+        spans = [
+            range(floor(box_min[i] + COLLISION_EPSILON), ceil(box_max[i] - COLLISION_EPSILON))
+            for i in others
+        ]
 
-        # Ensure the player remains above the floor:
-        if self.position[1] < self.bounding_box[1][0] + 1.5:
-            self.position[1] = self.bounding_box[1][0] + 1.5  # Ensure the player stays slightly above the floor
-            self.grounded = True
+        if distance > 0:
+            leading = box_max[axis]
+            layers = range(ceil(leading - COLLISION_EPSILON), ceil(leading + distance))
         else:
-            self.grounded = False
+            leading = box_min[axis]
+            layers = range(floor(leading + COLLISION_EPSILON) - 1, floor(leading + distance) - 1, -1)
+
+        cell = [0, 0, 0]
+        for layer in layers:
+            cell[axis] = layer
+            for a in spans[0]:
+                cell[others[0]] = a
+                for b in spans[1]:
+                    cell[others[1]] = b
+                    if self.is_solid(world, *cell):
+                        # Stop flush against the face of the first solid layer
+                        return (layer - leading) if distance > 0 else (layer + 1 - leading)
+        return distance
 
     def jump(self):
         """Make the player jump if grounded."""
@@ -125,6 +183,13 @@ class Player:
         """Get the player's current position."""
         return self.position
 
+    def interpolated_position(self, alpha):
+        """Blend between the previous and current position; alpha = 1.0 is the current position."""
+        return [
+            self.previous_position[i] + (self.position[i] - self.previous_position[i]) * alpha
+            for i in range(3)
+        ]
+
     def get_camera_direction(self):
         """Get the direction the camera is facing."""
         return self.camera_front
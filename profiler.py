@@ -0,0 +1,205 @@
+import csv
+import json
+import time
+
+import numpy as np
+from OpenGL.GL import *
+
+# Colors of the phases in the on-screen overlay, cycled in the order phases are first seen
+OVERLAY_COLORS = [
+    (0.9, 0.3, 0.3), (0.3, 0.9, 0.3), (0.3, 0.5, 1.0), (1.0, 0.8, 0.2),
+    (0.8, 0.4, 1.0), (0.2, 0.9, 0.9), (1.0, 0.5, 0.1), (0.7, 0.7, 0.7),
+]
+
+
+class NullPhase:
+    """Context manager that does nothing, handed out while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class PhaseTimer:
+    """Times one named phase; several runs within a frame add up."""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.samples = np.zeros(capacity)  # Ring buffer of per-frame totals, in seconds
+        self.current = 0.0  # Time spent in this phase during the frame being recorded
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.current += time.perf_counter() - self.start
+        return False
+
+
+class FrameProfiler:
+    """
+    Records how long each phase of a frame takes into fixed-size ring buffers.
+    Wrap each phase in `with profiler.phase("name"):` and bracket the frame with
+    begin_frame()/end_frame(). While disabled, phase() returns a shared no-op.
+    Switch profiling with toggle(), which takes effect at the next begin_frame() so a
+    frame is always timed whole or not at all.
+    Phases nested inside another are named "outer.inner"; the overlay only stacks
+    the top-level ones.
+    """
+
+    def __init__(self, capacity=600, enabled=False):
+        self.capacity = capacity  # Number of frames kept
+        self.enabled = enabled
+        self.pending = None  # Value `enabled` takes at the next begin_frame(), None for no change
+        self.show_overlay = False
+        self.phases = {}  # {name: PhaseTimer}, in the order phases were first seen
+        self.frame_times = np.zeros(capacity)  # Ring buffer of whole-frame times, in seconds
+        self.frames = 0  # Number of frames recorded so far
+        self.frame_start = None
+
+    def phase(self, name):
+        """Return the context manager timing `name` (a no-op while disabled)."""
+        if not self.enabled:
+            return NULL_PHASE
+        timer = self.phases.get(name)
+        if timer is None:
+            timer = self.phases[name] = PhaseTimer(name, self.capacity)
+            timer.samples[:] = np.nan  # Frames recorded before the phase existed
+        return timer
+
+    def toggle(self):
+        """Switch profiling on or off from the next frame on. Returns the new setting."""
+        enabled = not (self.enabled if self.pending is None else self.pending)
+        self.pending = enabled
+        return enabled
+
+    def begin_frame(self):
+        if self.pending is not None:
+            self.enabled = self.pending
+            self.pending = None
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Commit the phase times of the current frame into the ring buffers."""
+        if not self.enabled or self.frame_start is None:
+            return
+        slot = self.frames % self.capacity
+        self.frame_times[slot] = time.perf_counter() - self.frame_start
+        for timer in self.phases.values():
+            timer.samples[slot] = timer.current
+            timer.current = 0.0
+        self.frames += 1
+        self.frame_start = None
+
+    def ordered(self, ring):
+        """Return the buffered part of a ring, oldest frame first."""
+        if self.frames <= self.capacity:
+            return ring[:self.frames]
+        slot = self.frames % self.capacity
+        return np.concatenate([ring[slot:], ring[:slot]])
+
+    def samples(self, name=None):
+        """Return the recorded times of a phase (the whole frame if name is None), oldest first."""
+        values = self.ordered(self.frame_times if name is None else self.phases[name].samples)
+        return values[~np.isnan(values)]
+
+    def stats(self, name=None):
+        """Return mean/p50/p95/p99/max of a phase (or the whole frame) in milliseconds."""
+        values = self.samples(name) * 1000.0
+        if not len(values):
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "count": int(len(values)),
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(values.max()),
+        }
+
+    def report(self):
+        """Return {"frame": stats, phase name: stats, ...}."""
+        report = {"frame": self.stats()}
+        for name in self.phases:
+            report[name] = self.stats(name)
+        return report
+
+    def export_json(self, path):
+        """Write the statistics and raw samples (in milliseconds) to a JSON file."""
+        data = {
+            "frames": self.frames,
+            "stats": self.report(),
+            "samples": {"frame": (self.samples() * 1000.0).tolist()},
+        }
+        for name in self.phases:
+            data["samples"][name] = (self.samples(name) * 1000.0).tolist()
+        with open(path, "w") as file:
+            json.dump(data, file, indent=2)
+
+    def export_csv(self, path):
+        """Write one row per buffered frame with the frame and phase times in milliseconds."""
+        count = min(self.frames, self.capacity)
+        first = self.frames - count
+        # Phases that did not exist yet in a frame are written as nan
+        columns = [self.ordered(self.frame_times)] + [self.ordered(timer.samples) for timer in self.phases.values()]
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "total_ms"] + [f"{name}_ms" for name in self.phases])
+            for row in range(count):
+                writer.writerow([first + row] + [f"{column[row] * 1000.0:.4f}" for column in columns])
+
+    def render_overlay(self, width, height, frames=200, scale=4.0):
+        """
+        Draw the last `frames` frames as stacked bars of phase times in the bottom-left
+        corner, `scale` pixels per millisecond, with a line at 16.7 ms (60 FPS).
+        """
+        if not self.show_overlay or not self.frames:
+            return
+        count = min(frames, self.frames, self.capacity)
+        columns = [
+            np.nan_to_num(self.ordered(timer.samples)[-count:]) * 1000.0 * scale
+            for name, timer in self.phases.items() if "." not in name
+        ]
+
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, width, 0, height, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glDisable(GL_DEPTH_TEST)
+
+        glBegin(GL_QUADS)
+        for index in range(count):
+            bottom = 0.0
+            for phase, column in enumerate(columns):
+                top = bottom + column[index]
+                glColor3f(*OVERLAY_COLORS[phase % len(OVERLAY_COLORS)])
+                glVertex2f(index * 2, bottom)
+                glVertex2f(index * 2 + 2, bottom)
+                glVertex2f(index * 2 + 2, top)
+                glVertex2f(index * 2, top)
+                bottom = top
+        glEnd()
+
+        glColor3f(1.0, 1.0, 1.0)
+        glBegin(GL_LINES)
+        glVertex2f(0, 1000.0 / 60 * scale)
+        glVertex2f(count * 2, 1000.0 / 60 * scale)
+        glEnd()
+
+        glEnable(GL_DEPTH_TEST)
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
@@ -0,0 +1,311 @@
+import ctypes
+
+from OpenGL.GL import *
+
+from block_types import IS_TRANSPARENT, block_color
+from instancing import cube_edges, cube_triangles
+
+# Ways the world can be drawn, fastest first
+RENDER_RETAINED = "retained"  # Geometry lives in vertex buffer objects, re-uploaded only on change
+RENDER_ARRAYS = "arrays"  # Geometry is streamed from client-side arrays every frame
+RENDER_IMMEDIATE = "immediate"  # Legacy glBegin/glEnd per block, for drivers without buffer support
+RENDER_INSTANCED = "instanced"  # One shader-drawn unit cube per exposed block, all in one instanced call (OpenGL 3.3)
+
+
+def material_batches(mesh, transparent):
+    """Return the [(color, first index, index count)] of a block mesh's opaque or transparent batches."""
+    return [
+        (block_color(block_id), first, count)
+        for block_id, first, count in mesh.batches if IS_TRANSPARENT[block_id] == transparent
+    ]
+
+
+def begin_transparent_pass():
+    """Blend what follows over the scene without hiding what lies behind it."""
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glDepthMask(GL_FALSE)
+
+
+def end_transparent_pass():
+    glDepthMask(GL_TRUE)
+    glDisable(GL_BLEND)
+
+
+def draw_mesh_arrays(mesh, face_color, line_color):
+    """Draw a mesh's faces (unless face_color is None) and outlines straight from its client-side arrays."""
+    if mesh.is_empty():
+        return
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, mesh.vertices)
+    if len(mesh.indices) and face_color is not None:
+        glColor3f(*face_color)
+        glDrawElements(GL_TRIANGLES, len(mesh.indices), GL_UNSIGNED_INT, mesh.indices)
+    if len(mesh.line_indices):
+        glColor3f(*line_color)
+        glDrawElements(GL_LINES, len(mesh.line_indices), GL_UNSIGNED_INT, mesh.line_indices)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def draw_mesh_batches_arrays(mesh, batches):
+    """
+    Draw [(color, first index, index count)] ranges of a mesh's faces from its client-side
+    arrays. Meshes with per-vertex colors use those instead of the batch colors.
+    """
+    if not batches:
+        return
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, mesh.vertices)
+    if mesh.colors is not None:
+        glEnableClientState(GL_COLOR_ARRAY)
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, mesh.colors)
+    for color, first, count in batches:
+        glColor4f(*color)
+        glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, mesh.indices[first:first + count])
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+class MeshBuffer:
+    """A Mesh uploaded into vertex and index buffer objects."""
+
+    def __init__(self):
+        self.vertex_buffer, self.index_buffer, self.line_buffer, self.color_buffer = glGenBuffers(4)
+        self.index_count = 0
+        self.line_count = 0
+        self.has_colors = False
+        self.mesh = None  # The Mesh currently held on the GPU
+
+    def upload(self, mesh):
+        """Copy the mesh arrays into the buffers, replacing any previous contents."""
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, mesh.vertices.nbytes, mesh.vertices, GL_STATIC_DRAW)
+        self.has_colors = mesh.colors is not None
+        if self.has_colors:
+            glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+            glBufferData(GL_ARRAY_BUFFER, mesh.colors.nbytes, mesh.colors, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, mesh.indices.nbytes, mesh.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.line_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, mesh.line_indices.nbytes, mesh.line_indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.index_count = len(mesh.indices)
+        self.line_count = len(mesh.line_indices)
+        self.mesh = mesh
+
+    def draw(self, face_color, line_color):
+        """Draw the faces (unless face_color is None) and their outlines with one call each."""
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+
+        if self.index_count and face_color is not None:
+            glColor3f(*face_color)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+            glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+
+        if self.line_count:
+            glColor3f(*line_color)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.line_buffer)
+            glDrawElements(GL_LINES, self.line_count, GL_UNSIGNED_INT, None)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def draw_batches(self, batches):
+        """
+        Draw [(color, first index, index count)] ranges of the faces, one call per range.
+        Meshes with per-vertex colors use those instead of the batch colors.
+        """
+        if not batches:
+            return
+        glEnableClientState(GL_VERTEX_ARRAY)
+        if self.has_colors:
+            glEnableClientState(GL_COLOR_ARRAY)
+            glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+            glColorPointer(4, GL_UNSIGNED_BYTE, 0, None)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        for color, first, count in batches:
+            glColor4f(*color)
+            glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(first * 4))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def delete(self):
+        """Free the GPU buffers."""
+        glDeleteBuffers(4, [self.vertex_buffer, self.index_buffer, self.line_buffer, self.color_buffer])
+        self.mesh = None
+
+
+class MeshBufferCache:
+    """
+    Keeps one MeshBuffer per key (e.g. chunk coordinate).
+    A mesh is uploaded again only when a different Mesh object is passed for its key.
+    """
+
+    def __init__(self):
+        self.buffers = {}  # {key: MeshBuffer}
+        self.uploads = 0  # Number of uploads performed, for diagnostics
+
+    def get(self, key, mesh):
+        """Return the buffer for `key`, uploading `mesh` first if it changed."""
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = MeshBuffer()
+        if buffer.mesh is not mesh:
+            buffer.upload(mesh)
+            self.uploads += 1
+        return buffer
+
+    def retain(self, keys):
+        """Free the buffers of every key not in `keys`."""
+        for key in [key for key in self.buffers if key not in keys]:
+            self.buffers.pop(key).delete()
+
+    def clear(self):
+        """Free all buffers."""
+        self.retain(())
+
+
+INSTANCED_VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec4 corner;  // Unit cube vertex: x, y, z and the face shade
+layout(location = 1) in vec3 offset;  // Per instance: block position
+layout(location = 2) in vec4 color;  // Per instance: block color
+uniform mat4 view_projection;
+uniform vec4 line_color;  // Overrides the instance colors when its alpha is not 0
+out vec4 vertex_color;
+
+void main() {
+    gl_Position = view_projection * vec4(corner.xyz + offset, 1.0);
+    vertex_color = line_color.a > 0.0 ? line_color : vec4(color.rgb * corner.w, color.a);
+}
+"""
+
+INSTANCED_FRAGMENT_SHADER = """
+#version 330
+in vec4 vertex_color;
+out vec4 fragment_color;
+
+void main() {
+    fragment_color = vertex_color;
+}
+"""
+
+
+def compile_program(vertex_source, fragment_source):
+    """Compile and link a shader program, raising RuntimeError with the driver's log on failure."""
+    shaders = []
+    for shader_type, source in ((GL_VERTEX_SHADER, vertex_source), (GL_FRAGMENT_SHADER, fragment_source)):
+        shader = glCreateShader(shader_type)
+        glShaderSource(shader, source)
+        glCompileShader(shader)
+        if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+            raise RuntimeError(f"Shader compilation failed: {glGetShaderInfoLog(shader).decode()}")
+        shaders.append(shader)
+    program = glCreateProgram()
+    for shader in shaders:
+        glAttachShader(program, shader)
+    glLinkProgram(program)
+    for shader in shaders:
+        glDeleteShader(shader)
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        raise RuntimeError(f"Shader linking failed: {glGetProgramInfoLog(program).decode()}")
+    return program
+
+
+class InstancedCubeRenderer:
+    """
+    Draws an InstanceSet (see instancing.py) with one instanced call per pass: the
+    opaque cubes, their black outlines, then the transparent cubes blended on top.
+    Positions are transformed by a view-projection matrix passed in from Python rather
+    than the fixed-function matrix stack. Needs OpenGL 3.3.
+    """
+
+    def __init__(self):
+        self.program = compile_program(INSTANCED_VERTEX_SHADER, INSTANCED_FRAGMENT_SHADER)
+        self.view_projection_location = glGetUniformLocation(self.program, "view_projection")
+        self.line_color_location = glGetUniformLocation(self.program, "line_color")
+        self.cube_buffer, self.edge_buffer, self.offset_buffer, self.color_buffer = glGenBuffers(4)
+        for buffer, vertices in ((self.cube_buffer, cube_triangles()), (self.edge_buffer, cube_edges())):
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.version = None  # InstanceSet version held on the GPU
+        self.instance_count = 0
+        self.opaque_count = 0
+        self.uploads = 0  # Number of instance uploads performed, for diagnostics
+
+    def upload(self, instances):
+        """Copy the instance arrays to the GPU unless this version is already there."""
+        if instances.version == self.version:
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.offset_buffer)
+        glBufferData(GL_ARRAY_BUFFER, instances.offsets.nbytes, instances.offsets, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        glBufferData(GL_ARRAY_BUFFER, instances.colors.nbytes, instances.colors, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.version = instances.version
+        self.instance_count = len(instances)
+        self.opaque_count = instances.opaque_count
+        self.uploads += 1
+
+    def bind_instances(self, first):
+        """Point the per-instance attributes at the instances from `first` on."""
+        glBindBuffer(GL_ARRAY_BUFFER, self.offset_buffer)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(first * 12))
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        glVertexAttribPointer(2, 4, GL_UNSIGNED_BYTE, GL_TRUE, 0, ctypes.c_void_p(first * 4))
+
+    def draw_shape(self, buffer, mode, vertex_count, first, count):
+        """Draw `count` instances of one shape, starting at instance `first`."""
+        glBindBuffer(GL_ARRAY_BUFFER, buffer)
+        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 0, None)
+        self.bind_instances(first)
+        glDrawArraysInstanced(mode, 0, vertex_count, count)
+
+    def draw(self, instances, view_projection_columns, line_color=(0.0, 0.0, 0.0)):
+        """
+        Draw every instance. The matrix is a column-major float32 array, as kept by
+        camera.Camera; with line_color None the outlines are skipped.
+        """
+        self.upload(instances)
+        if not self.instance_count:
+            return
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.view_projection_location, 1, GL_FALSE, view_projection_columns)
+        for location in range(3):
+            glEnableVertexAttribArray(location)
+        glVertexAttribDivisor(1, 1)
+        glVertexAttribDivisor(2, 1)
+
+        glUniform4f(self.line_color_location, 0.0, 0.0, 0.0, 0.0)
+        if self.opaque_count:
+            self.draw_shape(self.cube_buffer, GL_TRIANGLES, 36, 0, self.opaque_count)
+        if line_color is not None:
+            glUniform4f(self.line_color_location, *line_color, 1.0)
+            self.draw_shape(self.edge_buffer, GL_LINES, 24, 0, self.opaque_count)
+            glUniform4f(self.line_color_location, 0.0, 0.0, 0.0, 0.0)
+        if self.instance_count > self.opaque_count:
+            begin_transparent_pass()
+            self.draw_shape(self.cube_buffer, GL_TRIANGLES, 36, self.opaque_count,
+                            self.instance_count - self.opaque_count)
+            end_transparent_pass()
+
+        glVertexAttribDivisor(1, 0)
+        glVertexAttribDivisor(2, 0)
+        for location in range(3):
+            glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
+    def delete(self):
+        """Free the GPU buffers and the shader program."""
+        glDeleteBuffers(4, [self.cube_buffer, self.edge_buffer, self.offset_buffer, self.color_buffer])
+        glDeleteProgram(self.program)
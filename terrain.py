@@ -0,0 +1,173 @@
+"""
+Procedural terrain: fBm value-noise heightmaps with 3D noise caves.
+
+Noise values come from a hash of (seed, lattice point), so any box of the world can be
+generated on its own and still match its neighbours exactly; the result only depends
+on the seed. Noise is evaluated for a whole box at once by hashing only its coarse
+lattice and interpolating that up to full resolution one axis at a time.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from block_types import STONE, DIRT, GRASS
+from chunks import CHUNK_SIZE, AIR
+
+TERRAIN_PERIOD = 64  # Lattice spacing of the lowest heightmap octave, in blocks
+TERRAIN_OCTAVES = 4
+SURFACE_LOW = 0.25  # Lowest surface, as a fraction of the world height
+SURFACE_RANGE = 0.5  # Height variation above SURFACE_LOW, as a fraction of the world height
+CAVE_PERIOD = 16  # Lattice spacing of the lowest cave octave, in blocks
+CAVE_OCTAVES = 2
+CAVE_THRESHOLD = 0.7  # Cells whose cave noise is above this are carved out
+CAVE_SEED = 0x5F3759DF  # Mixed into the seed so caves do not mirror the heightmap
+DIRT_DEPTH = 3  # Layers of dirt between the grass on top and the stone below
+
+
+def lattice_values(seed, lattice_min, shape):
+    """Hash every lattice point of a box to a float in [0, 1)."""
+    axes = np.indices(shape, dtype=np.int64)
+    h = np.full(shape, np.uint32(seed & 0xFFFFFFFF), dtype=np.uint32)
+    for axis, prime in zip(range(len(shape)), (0x27D4EB2D, 0x165667B1, 0x9E3779B1)):
+        h ^= ((axes[axis] + lattice_min[axis]).astype(np.uint32) * np.uint32(prime))
+        h = (h ^ (h >> np.uint32(15))) * np.uint32(0x85EBCA6B)
+    h ^= h >> np.uint32(13)
+    h *= np.uint32(0xC2B2AE35)
+    h ^= h >> np.uint32(16)
+    return h.astype(np.float32) / np.float32(2 ** 32)
+
+
+def value_noise(seed, min_corner, shape, period):
+    """
+    Smooth value noise in [0, 1) sampled at every cell of a box, with lattice points
+    `period` cells apart. Works for boxes of any dimension.
+    """
+    lattice_min = [corner // period for corner in min_corner]
+    lattice_shape = [(corner + size - 1) // period - low + 2
+                     for corner, size, low in zip(min_corner, shape, lattice_min)]
+    values = lattice_values(seed, lattice_min, lattice_shape)
+
+    for axis, (corner, size, low) in enumerate(zip(min_corner, shape, lattice_min)):
+        cells = np.arange(corner, corner + size)
+        cell = cells // period - low
+        t = (cells % period).astype(np.float32) / period
+        t = t * t * (3 - 2 * t)  # Smoothstep, so the noise has no creases at lattice points
+        weight = t.reshape([-1 if i == axis else 1 for i in range(len(shape))])
+        values = np.take(values, cell, axis=axis) * (1 - weight) + np.take(values, cell + 1, axis=axis) * weight
+    return values
+
+
+def fbm(seed, min_corner, shape, period, octaves, persistence=0.5):
+    """Fractal sum of value noise octaves, each at half the period of the previous one, in [0, 1)."""
+    total = np.zeros(shape, dtype=np.float32)
+    amplitude = 1.0
+    amplitudes = 0.0
+    for octave in range(octaves):
+        total += amplitude * value_noise(seed + octave, min_corner, shape, max(1, period >> octave))
+        amplitudes += amplitude
+        amplitude *= persistence
+    return total / amplitudes
+
+
+def generate_blocks(seed, min_corner, shape, height):
+    """
+    Generate the block IDs of a box for a world `height` blocks tall.
+    Returns an (x, y, z) uint8 array.
+    """
+    x0, y0, z0 = min_corner
+    nx, ny, nz = shape
+    surface = fbm(seed, (x0, z0), (nx, nz), TERRAIN_PERIOD, TERRAIN_OCTAVES)
+    surface = (height * (SURFACE_LOW + SURFACE_RANGE * surface)).astype(np.int32)
+
+    ys = np.arange(y0, y0 + ny)
+    depth = surface[:, None, :] - 1 - ys[None, :, None]  # Cells below the top of the ground
+    solid = (depth >= 0) & (ys[None, :, None] >= 0)
+    if not solid.any():
+        return np.zeros(shape, dtype=np.uint8)
+    # Only boxes reaching below the surface pay for the 3D noise
+    caves = fbm(seed ^ CAVE_SEED, min_corner, shape, CAVE_PERIOD, CAVE_OCTAVES) > CAVE_THRESHOLD
+    solid &= ~(caves & (ys[None, :, None] > 0))  # Keep the bottom layer intact
+    blocks = np.where(depth == 0, np.uint8(GRASS), np.where(depth <= DIRT_DEPTH, np.uint8(DIRT), np.uint8(STONE)))
+    return np.where(solid, blocks, np.uint8(AIR))
+
+
+def generate_chunk(seed, coord, height):
+    """Generate one chunk's (CHUNK_SIZE,) * 3 block IDs."""
+    return generate_blocks(seed, [c * CHUNK_SIZE for c in coord], (CHUNK_SIZE,) * 3, height)
+
+
+def generate_column(seed, cx, cz, cy_range, bounds):
+    """
+    Generate a column of chunks at once, sharing its heightmap. Cells outside the
+    (min_corner, max_corner) bounds are left empty.
+    Returns [(chunk_coord, bytes of the x-major block IDs)] of the non-empty chunks.
+    """
+    (x0, y0, z0), (x1, y1, z1) = bounds
+    cy_low, cy_high = cy_range
+    base = (cx * CHUNK_SIZE, cy_low * CHUNK_SIZE, cz * CHUNK_SIZE)
+    blocks = generate_blocks(seed, base, (CHUNK_SIZE, (cy_high - cy_low) * CHUNK_SIZE, CHUNK_SIZE), y1)
+
+    # Clip to the world bounds
+    for axis, (low, high) in enumerate(((x0, x1), (y0, y1), (z0, z1))):
+        cells = base[axis] + np.arange(blocks.shape[axis])
+        outside = ((cells < low) | (cells >= high)).reshape([-1 if i == axis else 1 for i in range(3)])
+        blocks = np.where(outside, np.uint8(AIR), blocks)
+
+    chunks = []
+    for cy in range(cy_low, cy_high):
+        chunk = blocks[:, (cy - cy_low) * CHUNK_SIZE:(cy - cy_low + 1) * CHUNK_SIZE, :]
+        if chunk.any():
+            chunks.append(((cx, cy, cz), np.ascontiguousarray(chunk).tobytes()))
+    return chunks
+
+
+def generate_world(world, seed=0, workers=None, executor=None):
+    """
+    Fill the whole world with terrain, replacing whatever was there.
+    Columns of chunks are generated in a process pool (`workers` processes, or the
+    given executor); workers=1 generates everything in this process.
+    Returns the number of blocks generated.
+    """
+    bounds = world.bounds()
+    (x0, y0, z0), (x1, y1, z1) = bounds
+    cy_range = (y0 // CHUNK_SIZE, -(-y1 // CHUNK_SIZE))
+    columns = [(cx, cz) for cx in range(x0 // CHUNK_SIZE, -(-x1 // CHUNK_SIZE))
+               for cz in range(z0 // CHUNK_SIZE, -(-z1 // CHUNK_SIZE))]
+    args = ([seed] * len(columns), [cx for cx, _ in columns], [cz for _, cz in columns],
+            [cy_range] * len(columns), [bounds] * len(columns))
+
+    own_executor = executor is None and workers != 1
+    if own_executor:
+        # Spawned workers start fresh (no copy of the GL context) but re-import the entry
+        # script, which must keep its setup under `if __name__ == "__main__":` (see main.py)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        if executor is None:
+            results = map(generate_column, *args)
+        else:
+            chunksize = max(1, len(columns) // (4 * (workers or os.cpu_count() or 1)))
+            results = executor.map(generate_column, *args, chunksize=chunksize)
+
+        for coord in world.blocks.coords():
+            world.blocks.discard(coord)
+            world.dirty_chunks.add(coord)
+        for chunks in results:
+            for coord, data in chunks:
+                world.blocks.put_chunk(coord, data)
+                world.dirty_chunks.add(coord)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if world.octree is not None:
+        world.octree.rebuild()
+    if world.visibility is not None:
+        world.visibility.rebuild()
+    if world.server is not None:
+        world.server.record_box(*bounds)
+    if world.light is not None:
+        world.light.rebuild()
+    world.version += 1
+    return len(world.blocks)
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pytest
+
+from block_types import DIRT, GRASS, STONE
+from chunks import CHUNK_SIZE
+from persistence import DECODERS, ENCODERS, decode_chunk, encode_chunk, load_world, save_world
+from world import World
+
+SHAPE = (CHUNK_SIZE,) * 3
+
+
+def sample_chunks():
+    rng = np.random.default_rng(1)
+    return {
+        "empty": np.zeros(SHAPE, dtype=np.uint8),
+        "full": np.full(SHAPE, STONE, dtype=np.uint8),
+        "layers": np.repeat(np.arange(CHUNK_SIZE, dtype=np.uint8) % 4, CHUNK_SIZE ** 2).reshape(SHAPE),
+        "few types": rng.integers(0, 3, size=SHAPE).astype(np.uint8),
+        "noise": rng.integers(0, 256, size=SHAPE).astype(np.uint8),
+    }
+
+
+@pytest.mark.parametrize("encoding", sorted(ENCODERS))
+@pytest.mark.parametrize("name", sorted(sample_chunks()))
+def test_encoding_round_trips(encoding, name):
+    flat = sample_chunks()[name].reshape(-1)
+    assert np.array_equal(DECODERS[encoding](ENCODERS[encoding](flat)), flat)
+
+
+@pytest.mark.parametrize("name", sorted(sample_chunks()))
+def test_encode_chunk_picks_a_round_tripping_encoding(name):
+    chunk = sample_chunks()[name]
+    assert np.array_equal(decode_chunk(*encode_chunk(chunk)), chunk.reshape(-1))
+
+
+def sample_world():
+    """A world spanning several chunks and two regions, with negative coordinates."""
+    world = World(size=(160, 40, 48))
+    min_corner, max_corner = world.bounds()
+    world.fill_box(min_corner, (max_corner[0], min_corner[1] + 8, max_corner[2]), STONE)
+    world.fill_box((min_corner[0], min_corner[1] + 8, min_corner[2]), (0, min_corner[1] + 10, 0), DIRT)
+    world.set_block(5, min_corner[1] + 12, -7, GRASS)
+    return world
+
+
+def dense(world):
+    min_corner, max_corner = world.bounds()
+    return world.blocks.to_dense(min_corner, tuple(max_corner[i] - min_corner[i] for i in range(3)))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_world_round_trips(tmp_path, lazy):
+    world = sample_world()
+    save_world(world, tmp_path)
+    loaded = load_world(tmp_path, lazy=lazy)
+    try:
+        assert loaded.size == world.size
+        assert len(loaded.blocks) == len(world.blocks)
+        assert sorted(loaded.blocks.coords()) == sorted(world.blocks.coords())
+        assert np.array_equal(dense(loaded), dense(world))
+    finally:
+        loaded.close()
+
+
+def test_lazy_load_reads_chunks_on_first_access(tmp_path):
+    world = sample_world()
+    save_world(world, tmp_path)
+    loaded = load_world(tmp_path)
+    try:
+        assert not loaded.blocks.chunks
+        assert set(loaded.blocks.lazy) == set(world.blocks.coords())
+        assert not loaded.dirty_chunks
+
+        coord = sorted(world.blocks.coords())[0]
+        assert np.array_equal(loaded.blocks.chunk(coord), world.blocks.chunk(coord))
+        assert coord not in loaded.blocks.lazy
+        assert len(loaded.blocks.lazy) == len(world.blocks.coords()) - 1
+    finally:
+        loaded.close()
+
+
+def test_lazy_chunk_can_be_edited(tmp_path):
+    world = sample_world()
+    save_world(world, tmp_path)
+    loaded = load_world(tmp_path)
+    try:
+        y = world.bounds()[0][1]
+        loaded.set_block(3, y, 3, GRASS)
+        assert loaded.blocks.get(3, y, 3) == GRASS
+        assert loaded.blocks.get(4, y, 3) == STONE
+        assert len(loaded.blocks) == len(world.blocks)
+    finally:
+        loaded.close()
+
+
+def test_close_releases_region_files(tmp_path):
+    save_world(sample_world(), tmp_path)
+    loaded = load_world(tmp_path)
+    assert loaded.blocks.sources
+    regions = list(loaded.blocks.sources)
+    loaded.close()
+    assert not loaded.blocks.sources
+    assert all(region.file.closed and region.map.closed for region in regions)
+
+
+def corrupt_magic(path):
+    with open(path, "r+b") as file:
+        file.write(b"XXXX")
+
+
+def test_corrupt_world_header_is_rejected(tmp_path):
+    save_world(sample_world(), tmp_path)
+    corrupt_magic(tmp_path / "world.dat")
+    with pytest.raises(ValueError):
+        load_world(tmp_path)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_corrupt_region_header_is_rejected(tmp_path, lazy):
+    save_world(sample_world(), tmp_path)
+    region = sorted(name for name in os.listdir(tmp_path) if name.endswith(".mcr"))[0]
+    corrupt_magic(tmp_path / region)
+    with pytest.raises(ValueError):
+        load_world(tmp_path, lazy=lazy)
@@ -1,4 +1,15 @@
 import math
+from collections import namedtuple
+
+import numpy as np
+
+# Result of a raycast: the cell hit, the normal of the face the ray entered
+# through, and the distance along the ray to that face.
+RayHit = namedtuple("RayHit", ["position", "normal", "distance"])
+
+# Results of a batch raycast over N rays: a (N,) bool hit mask plus the (N, 3) cells,
+# (N, 3) entry face normals and (N,) distances (only meaningful where `hit` is set).
+RayBatchHits = namedtuple("RayBatchHits", ["hit", "positions", "normals", "distances"])
 
 
 def normalize(vector):
@@ -23,9 +34,56 @@ def cross_product(v1, v2):
     ]
 
 
+def traverse_grid(origin, direction, max_distance, grid_size=(1, 1, 1)):
+    """
+    Walk a ray through a 3D grid, visiting every cell it passes through exactly once
+    (Amanatides & Woo voxel traversal).
+    - origin: Starting point of the ray.
+    - direction: Direction of the ray (normalized internally).
+    - max_distance: Maximum distance for the raycast.
+    - grid_size: Size of each grid cell.
+
+    Yields:
+    - RayHit(position, normal, distance) per cell, in ray order. `normal` is the face
+      the ray entered through ((0, 0, 0) for the starting cell) and `distance` is
+      where along the ray it entered.
+    """
+    direction = normalize(direction)
+    cell = [int(math.floor(origin[i] / grid_size[i])) for i in range(3)]
+    step = [0, 0, 0]
+    t_max = [math.inf] * 3  # Distance along the ray to the next boundary on each axis
+    t_delta = [math.inf] * 3  # Distance along the ray between boundaries on each axis
+    for i in range(3):
+        if direction[i] > 0:
+            step[i] = 1
+            t_max[i] = ((cell[i] + 1) * grid_size[i] - origin[i]) / direction[i]
+            t_delta[i] = grid_size[i] / direction[i]
+        elif direction[i] < 0:
+            step[i] = -1
+            t_max[i] = (cell[i] * grid_size[i] - origin[i]) / direction[i]
+            t_delta[i] = -grid_size[i] / direction[i]
+
+    normal = (0, 0, 0)
+    distance = 0.0
+    while True:
+        yield RayHit(tuple(cell), normal, distance)
+
+        # Cross the nearest cell boundary
+        axis = 0 if t_max[0] <= t_max[1] and t_max[0] <= t_max[2] else (1 if t_max[1] <= t_max[2] else 2)
+        distance = t_max[axis]
+        if distance > max_distance:
+            return
+        cell[axis] += step[axis]
+        t_max[axis] += t_delta[axis]
+        normal = [0, 0, 0]
+        normal[axis] = -step[axis]
+        normal = tuple(normal)
+
+
 def raycast_to_grid(origin, direction, max_distance, grid_size=(1, 1, 1)):
     """
     Perform a raycast to a 3D grid and yield grid positions.
+    Every cell the ray passes through is yielded exactly once, in order.
     - origin: Starting point of the ray.
     - direction: Normalized direction of the ray.
     - max_distance: Maximum distance for the raycast.
@@ -34,24 +92,103 @@ def raycast_to_grid(origin, direction, max_distance, grid_size=(1, 1, 1)):
     Yields:
     - (grid_x, grid_y, grid_z): Grid cell coordinates.
     """
-    position = list(origin)
-    direction = normalize(direction)
+    for hit in traverse_grid(origin, direction, max_distance, grid_size):
+        yield hit.position
 
-    step = [direction[i] * 0.1 for i in range(3)]  # Small step size for ray traversal
-    for _ in range(int(max_distance / 0.1)):
-        # Calculate the grid position
-        grid_pos = (
-            int(math.floor(position[0] / grid_size[0])),
-            int(math.floor(position[1] / grid_size[1])),
-            int(math.floor(position[2] / grid_size[2])),
-        )
 
-        # Check if within bounds
-        yield grid_pos
+def traverse_grid_batch(occupancy, offset, origins, directions, max_distance):
+    """
+    Cast many rays at once through a dense occupancy grid, stepping all of them in
+    lock-step with the same traversal as traverse_grid.
+    - occupancy: 3D array, non-zero where a cell is solid.
+    - offset: World position of occupancy[0, 0, 0].
+    - origins, directions: (N, 3) arrays of ray origins and directions.
+    - max_distance: Maximum distance for every ray.
+
+    Returns:
+    - RayBatchHits for the first solid cell along each ray.
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    count = len(origins)
+    offset = np.asarray(offset, dtype=np.int64)
+    shape = np.array(occupancy.shape, dtype=np.int64)
+    flat = occupancy.reshape(-1)
+    strides = np.array([shape[1] * shape[2], shape[2], 1], dtype=np.int64)
+
+    result = RayBatchHits(
+        np.zeros(count, dtype=bool),
+        np.zeros((count, 3), dtype=np.int64),
+        np.zeros((count, 3), dtype=np.int8),
+        np.full(count, np.inf),
+    )
+
+    lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+    directions = np.divide(directions, lengths, out=np.zeros_like(directions), where=lengths > 0)
+    cell = np.floor(origins).astype(np.int64) - offset  # Cells in occupancy coordinates
+    step = np.sign(directions).astype(np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_delta = np.where(step != 0, 1.0 / np.abs(directions), np.inf)
+        boundary = cell + offset + (step > 0)
+        t_max = np.where(step != 0, (boundary - origins) / directions, np.inf)
+    distance = np.zeros(count)
+    normal = np.zeros((count, 3), dtype=np.int8)
+    rays = np.arange(count)  # Original index of every ray still being walked
+    rows = np.arange(count)
+
+    while len(rays):
+        # Record rays whose current cell is solid
+        inside = np.all((cell >= 0) & (cell < shape), axis=1)
+        solid = np.zeros(len(rays), dtype=bool)
+        solid[inside] = flat[cell[inside] @ strides] != 0
+        if solid.any():
+            hit_rays = rays[solid]
+            result.hit[hit_rays] = True
+            result.positions[hit_rays] = cell[solid] + offset
+            result.normals[hit_rays] = normal[solid]
+            result.distances[hit_rays] = distance[solid]
+
+        # Cross the nearest cell boundary on every ray
+        lanes = rows[:len(rays)] * 3 + np.argmin(t_max, axis=1)  # Flat index of each ray's crossing axis
+        distance = t_max.reshape(-1)[lanes]
+        axis_step = step.reshape(-1)[lanes]
+        cell.reshape(-1)[lanes] += axis_step
+        t_max.reshape(-1)[lanes] += t_delta.reshape(-1)[lanes]
+        normal[:] = 0
+        normal.reshape(-1)[lanes] = -axis_step
+
+        # Drop rays that hit, ran out of distance, or left the grid for good
+        leaving = ((cell < 0) & (step <= 0)) | ((cell >= shape) & (step >= 0))
+        keep = ~solid & (distance <= max_distance) & ~np.any(leaving, axis=1)
+        rays, cell, step, t_max, t_delta, distance, normal = (
+            rays[keep], cell[keep], step[keep], t_max[keep], t_delta[keep], distance[keep], normal[keep]
+        )
 
-        # Step along the ray
-        for i in range(3):
-            position[i] += step[i]
+    return result
+
+
+def look_at_matrix(eye, target, up):
+    """Build the 4x4 view matrix gluLookAt would produce (for column vectors, clip = M @ v)."""
+    eye = np.asarray(eye, dtype=np.float64)
+    forward = np.asarray(normalize(np.asarray(target, dtype=np.float64) - eye))
+    side = np.asarray(normalize(cross_product(forward, up)))
+    true_up = np.asarray(cross_product(side, forward))
+    matrix = np.identity(4)
+    matrix[0, :3], matrix[1, :3], matrix[2, :3] = side, true_up, -forward
+    matrix[:3, 3] = -matrix[:3, :3] @ eye
+    return matrix
+
+
+def perspective_matrix(fov, aspect, near, far):
+    """Build the 4x4 projection matrix gluPerspective would produce; fov is vertical, in degrees."""
+    f = 1.0 / math.tan(math.radians(fov) / 2)
+    matrix = np.zeros((4, 4))
+    matrix[0, 0] = f / aspect
+    matrix[1, 1] = f
+    matrix[2, 2] = (far + near) / (near - far)
+    matrix[2, 3] = 2 * far * near / (near - far)
+    matrix[3, 2] = -1.0
+    return matrix
 
 
 def clamp(value, min_value, max_value):
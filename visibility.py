@@ -0,0 +1,152 @@
+"""
+Occlusion culling by chunk connectivity ("cave culling").
+
+For every chunk a flood fill through its non-opaque cells records which of its six faces
+are linked by open space inside it. Each frame a breadth-first search starts from the
+viewer's chunk and only steps from a chunk into a neighbour when the face it entered
+through is linked to the face it leaves by, the neighbour is in the view frustum, and
+the step does not head back against a direction the path has already taken. Chunks
+the search never reaches are walled off from the viewer and are not drawn.
+
+Links are computed on first use and dropped when an edit touches their chunk, so an
+edit only costs the flood fill of the chunk it changed.
+"""
+from collections import deque
+
+import numpy as np
+
+from block_types import IS_OPAQUE
+from chunks import CHUNK_SIZE
+
+# Face index = axis * 2 + (1 on the positive side); the opposite face is index ^ 1
+FACES = ((-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1))
+ALL_LINKS = (0b111111,) * 6  # Every face reaches every face, as in an empty chunk
+NO_LINKS = (0,) * 6
+
+
+def component_labels(passable):
+    """
+    Label the 6-connected components of the True cells of a 3D array: every cell gets the
+    smallest flat index in its component, blocked cells get passable.size.
+    """
+    size = passable.size
+    labels = np.where(passable, np.arange(size).reshape(passable.shape), size)
+    while True:
+        smallest = labels.copy()
+        for axis in range(3):
+            ahead = [slice(None)] * 3
+            behind = [slice(None)] * 3
+            ahead[axis], behind[axis] = slice(1, None), slice(None, -1)
+            np.minimum(smallest[tuple(ahead)], labels[tuple(behind)], out=smallest[tuple(ahead)])
+            np.minimum(smallest[tuple(behind)], labels[tuple(ahead)], out=smallest[tuple(behind)])
+        smallest[~passable] = size
+        # Jump to the label of the cell a label points at, which is in the same component
+        smallest = np.append(smallest.ravel(), size)[smallest]
+        if np.array_equal(smallest, labels):
+            return labels
+        labels = smallest
+
+
+def face_links(chunk):
+    """
+    Flood fill the open cells of a chunk's block ID array. Returns a tuple of six bit masks:
+    bit g of entry f is set when open space inside the chunk connects face f to face g.
+    """
+    passable = ~IS_OPAQUE[chunk]
+    if passable.all():
+        return ALL_LINKS
+    if not passable.any():
+        return NO_LINKS
+    labels = component_labels(passable)
+    touching = []  # Per face, the set of components reaching it
+    for face in range(6):
+        side = [slice(None)] * 3
+        side[face // 2] = -1 if face & 1 else 0
+        touching.append(set(np.unique(labels[tuple(side)]).tolist()) - {passable.size})
+    return tuple(
+        sum(1 << other for other in range(6) if touching[face] & touching[other])
+        for face in range(6)
+    )
+
+
+class ChunkVisibility:
+    """
+    Face connectivity of every chunk of a world, and the search for the chunks the
+    viewer can see into. Call update() with the chunks an edit touched (World does this
+    for every edit once enabled).
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.links = {}  # {chunk coord: face_links()} of the non-empty chunks filled so far
+        self.floods = 0  # Chunks flood filled so far
+        self.reached = 0  # Chunks the last search reached
+
+    def rebuild(self):
+        """Forget every chunk's links; they are filled again on first use."""
+        self.links.clear()
+
+    def update(self, chunk_coords):
+        """Drop the links of edited chunks, to be filled again on first use."""
+        for coord in chunk_coords:
+            self.links.pop(coord, None)
+
+    def update_box(self, min_corner, max_corner):
+        """Drop the links of every chunk overlapping an edited box (max_corner exclusive)."""
+        low = [min_corner[i] // CHUNK_SIZE for i in range(3)]
+        high = [-(-max_corner[i] // CHUNK_SIZE) for i in range(3)]
+        self.update([coord for coord in self.links if all(low[i] <= coord[i] < high[i] for i in range(3))])
+
+    def chunk_links(self, coord):
+        """Return the face links of a chunk, flood filling it if needed."""
+        links = self.links.get(coord)
+        if links is None:
+            if coord not in self.world.blocks.counts:
+                return ALL_LINKS
+            links = self.links[coord] = face_links(self.world.blocks.chunk(coord))
+            self.floods += 1
+        return links
+
+    def chunk_range(self):
+        """Return the (lowest, highest) chunk coords inside the world bounds, both inclusive."""
+        min_corner, max_corner = self.world.bounds()
+        return (tuple(min_corner[i] // CHUNK_SIZE for i in range(3)),
+                tuple((max_corner[i] - 1) // CHUNK_SIZE for i in range(3)))
+
+    def visible(self, position, frustum=None):
+        """
+        Return the set of chunk coords the viewer at `position` can see into through open
+        space (and the optional frustum), or None if the viewer is outside the world,
+        where nothing can be ruled out.
+        """
+        low, high = self.chunk_range()
+        start = tuple(int(position[i] // CHUNK_SIZE) for i in range(3))
+        if any(not low[i] <= start[i] <= high[i] for i in range(3)):
+            return None
+
+        shape = tuple(high[i] - low[i] + 1 for i in range(3))
+        if frustum is None:
+            in_view = np.ones(shape, dtype=bool)
+        else:
+            cells = np.indices(shape).reshape(3, -1).T + np.array(low)
+            min_corners = cells.astype(np.float64) * CHUNK_SIZE
+            in_view = frustum.intersects_boxes(min_corners, min_corners + CHUNK_SIZE).reshape(shape)
+
+        reached = {start}
+        pending = deque([(start, None, 0)])  # (chunk, face it was entered through, directions taken)
+        while pending:
+            coord, entry, directions = pending.popleft()
+            links = ALL_LINKS[0] if entry is None else self.chunk_links(coord)[entry]
+            for face in range(6):
+                if not links >> face & 1 or directions >> (face ^ 1) & 1:
+                    continue
+                offset = FACES[face]
+                neighbour = (coord[0] + offset[0], coord[1] + offset[1], coord[2] + offset[2])
+                if neighbour in reached or any(not low[i] <= neighbour[i] <= high[i] for i in range(3)):
+                    continue
+                if not in_view[neighbour[0] - low[0], neighbour[1] - low[1], neighbour[2] - low[2]]:
+                    continue
+                reached.add(neighbour)
+                pending.append((neighbour, face ^ 1, directions | 1 << face))
+        self.reached = len(reached)
+        return reached
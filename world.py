@@ -1,21 +1,315 @@
 from OpenGL.GL import *
-import math
+import numpy as np
+from block_types import STONE, block_color
+from chunks import ChunkStorage, CHUNK_SIZE, AIR, chunk_coords
+from frustum import CullingStats
+from instancing import InstanceSet
+from lighting import LightMap
+from lod import region_box
+from octree import SparseVoxelOctree
+from mesher import mesh_chunk, floor_mesh, box_outline_mesh
+from renderer import (
+    MeshBufferCache, InstancedCubeRenderer, draw_mesh_arrays, draw_mesh_batches_arrays, material_batches,
+    begin_transparent_pass, end_transparent_pass, RENDER_RETAINED, RENDER_ARRAYS, RENDER_IMMEDIATE, RENDER_INSTANCED,
+)
+from utils import traverse_grid, traverse_grid_batch
+from visibility import ChunkVisibility
 
 
 class World:
     def __init__(self, size=(10, 10, 10)):
         self.size = size  # World grid size (x, y, z)
-        self.blocks = {}  # Dictionary to store active blocks {(x, y, z): True/False}
+        self.blocks = ChunkStorage()  # Chunked block storage, supports `(x, y, z) in blocks`
+        self.version = 0  # Incremented on every edit, used to invalidate cached geometry
+        self.meshes = {}  # Cached {chunk_coord: Mesh} of the visible block faces
+        self.dirty_chunks = set()  # Chunks whose cached mesh no longer matches the blocks
+        self.unmeshed_chunks = set()  # Chunks never meshed (e.g. just loaded), made dirty once they come into view
+        self.mesh_workers = None  # Optional MeshWorkerPool for rebuilding meshes in the background
+        self.render_mode = RENDER_RETAINED  # How blocks are drawn, see renderer.py
+        self.mesh_buffers = None  # GPU copies of the meshes, created on first retained draw
+        self.static_meshes = {}  # Cached floor and boundary meshes, rebuilt when the size changes
+        self.static_meshes_size = None  # World size the static meshes were built for
+        self.static_buffers = None  # GPU copies of the static meshes
+        self.lod_buffers = None  # GPU copies of the LOD meshes drawn last frame
+        self.instances = None  # InstanceSet of the exposed blocks, created on first instanced draw
+        self.instanced_renderer = None  # InstancedCubeRenderer, created on first instanced draw
+        self.camera = None  # Camera whose view-projection matrix the instanced path draws with
+        self.cull_stats = CullingStats()  # Chunks tested, culled and drawn in the last frame
+        self.occupancy = None  # Dense copy of the blocks inside the bounds, for batch queries
+        self.occupancy_version = -1  # World version the dense copy was taken at
+        self.clipboard = None  # Block IDs of the last region copied with copy_box()
+        self.journal = None  # Optional Journal that every edit is appended to
+        self.light = None  # Optional LightMap, kept up to date by every edit once enabled
+        self.lod = None  # Optional LodManager drawing distant regions with simplified meshes
+        self.octree = None  # Optional SparseVoxelOctree, kept up to date by every edit once enabled
+        self.server = None  # Optional WorldServer streaming every edit to its clients
+        self.visibility = None  # Optional ChunkVisibility hiding chunks walled off from the viewer
 
-    def add_block(self, x, y, z):
-        """Add a block at the given grid position."""
-        if self.is_within_bounds(x, y, z):
-            self.blocks[(x, y, z)] = True
+    def close(self):
+        """Release the files the blocks are lazily read from (see persistence.load_world)."""
+        self.blocks.close()
+
+    def add_block(self, x, y, z, block_type=STONE):
+        """Add a block of the given type (an ID from block_types) at the given grid position."""
+        if self.is_within_bounds(x, y, z) and (x, y, z) not in self.blocks:
+            self.set_block(x, y, z, block_type)
+
+    def get_block(self, x, y, z):
+        """Return the type ID of the block at the given grid position (AIR if empty)."""
+        return self.blocks.get(x, y, z)
 
     def remove_block(self, x, y, z):
         """Remove a block at the given grid position."""
         if (x, y, z) in self.blocks:
-            del self.blocks[(x, y, z)]
+            self.set_block(x, y, z, AIR)
+
+    def set_block(self, x, y, z, block_type):
+        """Write one block ID (AIR removes the block), recording the edit in the journal."""
+        if self.journal is not None:
+            self.journal.record_block((x, y, z), self.blocks.get(x, y, z), block_type)
+        self.blocks.set(x, y, z, block_type)
+        self.block_changed(x, y, z)
+
+    def enable_lighting(self):
+        """Light the world (see lighting.py) and bake the light into every chunk mesh from now on."""
+        self.light = LightMap(self)
+        self.dirty_chunks.update(self.blocks.coords())
+        self.version += 1
+
+    def enable_octree(self):
+        """Index the blocks in a sparse voxel octree (see octree.py), used by raycast() from now on."""
+        self.octree = SparseVoxelOctree(self.blocks)
+
+    def enable_occlusion_culling(self):
+        """Skip drawing chunks the viewer cannot see into through open space (see visibility.py)."""
+        self.visibility = ChunkVisibility(self)
+
+    def block_changed(self, x, y, z):
+        """
+        Record an edit: bump the version, relight around the block if lighting is enabled,
+        and mark dirty every chunk whose mesh can see the block or a cell whose light changed.
+        """
+        self.version += 1
+        self.mark_dirty(x, y, z)
+        if self.octree is not None:
+            self.octree.update((chunk_coords(x, y, z)[0],))
+        if self.visibility is not None:
+            self.visibility.update((chunk_coords(x, y, z)[0],))
+        if self.server is not None:
+            self.server.record_block((x, y, z))
+        if self.light is not None and self.is_within_bounds(x, y, z):
+            for position in self.light.update_block(x, y, z):
+                self.mark_dirty(*position)
+
+    def blocks_changed(self, min_corner, max_corner):
+        """
+        Record an edit of a whole box (max_corner exclusive) at once: bump the version,
+        relight the region it can affect if lighting is enabled, and mark dirty every chunk
+        whose mesh can see the box or a cell whose light changed.
+        """
+        self.version += 1
+        self.mark_box_dirty(min_corner, max_corner)
+        if self.octree is not None:
+            self.octree.update_box(min_corner, max_corner)
+        if self.visibility is not None:
+            self.visibility.update_box(min_corner, max_corner)
+        if self.server is not None:
+            self.server.record_box(min_corner, max_corner)
+        if self.light is not None:
+            lit = self.light.update_box(min_corner, max_corner)
+            if lit is not None:
+                self.mark_box_dirty(*lit)
+
+    def mark_dirty(self, x, y, z):
+        """
+        Mark dirty the chunk of a cell, plus every neighbouring chunk (across faces, edges and
+        corners) whose one-cell border holds it; their faces are shaded from it.
+        """
+        coord, local = chunk_coords(x, y, z)
+        options = []
+        for axis in range(3):
+            if local[axis] == 0:
+                options.append((coord[axis], coord[axis] - 1))
+            elif local[axis] == CHUNK_SIZE - 1:
+                options.append((coord[axis], coord[axis] + 1))
+            else:
+                options.append((coord[axis],))
+        self.dirty_chunks.update((cx, cy, cz) for cx in options[0] for cy in options[1] for cz in options[2])
+
+    def mark_box_dirty(self, min_corner, max_corner):
+        """Mark dirty every chunk whose mesh or one-cell border overlaps a box (max_corner exclusive)."""
+        low = [(min_corner[i] - 1) // CHUNK_SIZE for i in range(3)]
+        high = [max_corner[i] // CHUNK_SIZE for i in range(3)]  # Last chunk, inclusive
+        self.dirty_chunks.update(
+            (cx, cy, cz)
+            for cx in range(low[0], high[0] + 1) for cy in range(low[1], high[1] + 1) for cz in range(low[2], high[2] + 1)
+        )
+
+    def clip_box(self, min_corner, max_corner):
+        """Clip a box (max_corner exclusive) to the world bounds. Returns (min_corner, max_corner) or None."""
+        bounds_min, bounds_max = self.bounds()
+        low = tuple(max(min_corner[i], bounds_min[i]) for i in range(3))
+        high = tuple(min(max_corner[i], bounds_max[i]) for i in range(3))
+        if any(low[i] >= high[i] for i in range(3)):
+            return None
+        return low, high
+
+    def write_box(self, min_corner, max_corner, values, mask=None):
+        """
+        Write block IDs into the part of a box inside the world, as one edit.
+        `values` is one ID or an array covering the unclipped box; so is the optional mask
+        of the cells to write. Returns the number of blocks changed.
+        """
+        clipped = self.clip_box(min_corner, max_corner)
+        if clipped is None:
+            return 0
+        low, high = clipped
+        inside = tuple(slice(low[i] - min_corner[i], high[i] - min_corner[i]) for i in range(3))
+        if np.ndim(values):
+            values = values[inside]
+        if mask is not None:
+            mask = mask[inside]
+        shape = tuple(high[i] - low[i] for i in range(3))
+        before = self.blocks.to_dense(low, shape) if self.journal is not None else None
+        changed = self.blocks.write_box(low, shape, values, mask)
+        if changed:
+            if self.journal is not None:
+                self.journal.record_box(low, before, self.blocks.to_dense(low, shape))
+            self.blocks_changed(low, high)
+        return changed
+
+    def fill_box(self, min_corner, max_corner, block_type=STONE):
+        """Fill a box (max_corner exclusive) with one block type. Returns the number of blocks changed."""
+        return self.write_box(min_corner, max_corner, block_type)
+
+    def clear_box(self, min_corner, max_corner):
+        """Remove every block in a box (max_corner exclusive). Returns the number of blocks removed."""
+        return self.write_box(min_corner, max_corner, AIR)
+
+    def replace_blocks(self, min_corner, max_corner, old_type, new_type):
+        """Turn every block of old_type in a box into new_type. Returns the number of blocks changed."""
+        clipped = self.clip_box(min_corner, max_corner)
+        if clipped is None:
+            return 0
+        low, high = clipped
+        region = self.blocks.to_dense(low, tuple(high[i] - low[i] for i in range(3)))
+        return self.write_box(low, high, new_type, region == old_type)
+
+    def copy_box(self, min_corner, max_corner):
+        """Copy the block IDs of a box (max_corner exclusive) into the clipboard and return them."""
+        shape = tuple(max_corner[i] - min_corner[i] for i in range(3))
+        self.clipboard = self.blocks.to_dense(min_corner, shape)
+        return self.clipboard
+
+    def paste(self, min_corner, blocks=None, include_air=False):
+        """
+        Paste copied block IDs (the clipboard by default) with their minimum corner at
+        min_corner. Air in the copy leaves existing blocks alone unless include_air is set.
+        Returns the number of blocks changed.
+        """
+        blocks = self.clipboard if blocks is None else blocks
+        if blocks is None:
+            return 0
+        max_corner = tuple(min_corner[i] + blocks.shape[i] for i in range(3))
+        return self.write_box(min_corner, max_corner, blocks, None if include_air else blocks != AIR)
+
+    def flood_fill(self, start, block_type, max_distance=16):
+        """
+        Replace the face-connected region of same-typed cells (air included) around
+        `start` with block_type, staying within max_distance cells of it on each axis.
+        Returns the number of blocks changed.
+        """
+        clipped = self.clip_box([start[i] - max_distance for i in range(3)],
+                                [start[i] + max_distance + 1 for i in range(3)])
+        if clipped is None or not self.is_within_bounds(*start):
+            return 0
+        low, high = clipped
+        region = self.blocks.to_dense(low, tuple(high[i] - low[i] for i in range(3)))
+        seed = tuple(start[i] - low[i] for i in range(3))
+        candidates = region == region[seed]
+        if region[seed] == block_type:
+            return 0
+
+        # Grow the filled region one cell in every direction per step, through candidates only
+        filled = np.zeros(region.shape, dtype=bool)
+        filled[seed] = True
+        frontier = filled.copy()
+        while frontier.any():
+            grown = np.zeros_like(frontier)
+            for axis in range(3):
+                ahead = [slice(None)] * 3
+                behind = [slice(None)] * 3
+                ahead[axis], behind[axis] = slice(1, None), slice(None, -1)
+                grown[tuple(ahead)] |= frontier[tuple(behind)]
+                grown[tuple(behind)] |= frontier[tuple(ahead)]
+            frontier = grown & candidates & ~filled
+            filled |= frontier
+        return self.write_box(low, high, block_type, filled)
+
+    def store_mesh(self, coord, mesh):
+        """Swap a rebuilt chunk mesh into the cache."""
+        if mesh.is_empty():
+            self.meshes.pop(coord, None)
+        else:
+            self.meshes[coord] = mesh
+
+    def mesh_in_view(self, coords):
+        """Mark the never meshed chunks among `coords` dirty, so the next mesh update builds them."""
+        fresh = self.unmeshed_chunks.intersection(coords)
+        if fresh:
+            self.dirty_chunks.update(fresh)
+            self.unmeshed_chunks.difference_update(fresh)
+
+    def get_meshes(self):
+        """Return the per-chunk block meshes, rebuilding every dirty chunk right away."""
+        if self.lod is not None:
+            self.lod.invalidate(self.dirty_chunks)
+        for coord in self.dirty_chunks:
+            if self.mesh_workers is not None:
+                self.mesh_workers.discard(coord)
+            self.store_mesh(coord, mesh_chunk(self.blocks, coord, self.light))
+        self.unmeshed_chunks.difference_update(self.dirty_chunks)
+        self.dirty_chunks.clear()
+        return self.meshes
+
+    def update_meshes(self):
+        """
+        Return the per-chunk block meshes without blocking: dirty chunks are sent to the
+        mesh workers and finished rebuilds are swapped in, while the previous meshes stay
+        in place until then. Without workers this is the same as get_meshes().
+        """
+        if self.mesh_workers is None:
+            return self.get_meshes()
+        if self.lod is not None:
+            self.lod.invalidate(self.dirty_chunks)
+        for coord in self.dirty_chunks:
+            self.mesh_workers.submit(self.blocks, coord, self.light)
+        self.unmeshed_chunks.difference_update(self.dirty_chunks)
+        self.dirty_chunks.clear()
+        for coord, mesh in self.mesh_workers.collect().items():
+            self.store_mesh(coord, mesh)
+        return self.meshes
+
+    def get_static_meshes(self):
+        """Return the floor and boundary meshes, rebuilding them if the world size changed."""
+        if self.static_meshes_size != self.size:
+            min_corner, max_corner = self.bounds()
+            self.static_meshes = {
+                "floor": floor_mesh(min_corner, max_corner),
+                "boundary": box_outline_mesh(min_corner, max_corner),
+            }
+            self.static_meshes_size = self.size
+        return self.static_meshes
+
+    def render_static_mesh(self, key, face_color, line_color):
+        """Draw one of the static meshes in a single batch with the current render mode."""
+        mesh = self.get_static_meshes()[key]
+        if self.render_mode == RENDER_RETAINED:
+            if self.static_buffers is None:
+                self.static_buffers = MeshBufferCache()
+            self.static_buffers.get(key, mesh).draw(face_color, line_color)
+        else:
+            draw_mesh_arrays(mesh, face_color, line_color)
 
     def is_within_bounds(self, x, y, z):
         """Check if a block position is within the world bounds."""
@@ -28,23 +322,46 @@ class World:
     def raycast(self, origin, direction, max_distance=10.0):
         """
         Perform a raycast from the origin in the given direction.
-        Returns the first block hit and the position of the face where the ray intersects.
+        Returns a RayHit (block position, entry face normal, distance) for the first
+        block hit, or None if nothing is hit within max_distance.
+        With an octree, empty space is skipped a whole node at a time.
         """
-        position = list(origin)
-        step = [direction[i] * 0.1 for i in range(3)]  # Small steps for ray traversal
-
-        for _ in range(int(max_distance / 0.1)):
-            grid_pos = tuple(map(math.floor, position))
-            if grid_pos in self.blocks:
-                return grid_pos
-            for i in range(3):
-                position[i] += step[i]
+        if self.octree is not None:
+            return self.octree.raycast(origin, direction, max_distance)
+        for hit in traverse_grid(origin, direction, max_distance):
+            if hit.position in self.blocks:
+                return hit
 
         return None
 
+    def bounds(self):
+        """Return the (min_corner, max_corner) of the world; max_corner is exclusive."""
+        return (
+            (-self.size[0] // 2, 0, -self.size[2] // 2),
+            (self.size[0] // 2, self.size[1], self.size[2] // 2),
+        )
+
+    def get_occupancy(self):
+        """Return a dense array of the block IDs inside the world bounds and its min corner."""
+        min_corner, max_corner = self.bounds()
+        if self.occupancy_version != self.version:
+            shape = tuple(max_corner[i] - min_corner[i] for i in range(3))
+            self.occupancy = self.blocks.to_dense(min_corner, shape)
+            self.occupancy_version = self.version
+        return self.occupancy, min_corner
+
+    def raycast_batch(self, origins, directions, max_distance=10.0):
+        """
+        Raycast N rays at once. origins and directions are (N, 3) arrays.
+        Returns RayBatchHits(hit, positions, normals, distances) with the same meaning
+        per ray as the RayHit of raycast().
+        """
+        occupancy, min_corner = self.get_occupancy()
+        return traverse_grid_batch(occupancy, min_corner, origins, directions, max_distance)
+
     def render(self):
         """Render all blocks in the world."""
-        for (x, y, z) in self.blocks.keys():
+        for (x, y, z) in self.blocks:
             self.render_block(x, y, z)
 
     def render_block(self, x, y, z):
@@ -109,7 +426,14 @@ class World:
             glPopMatrix()
 
     def render_floor(self):
-        """Render the subdivided floor."""
+        """Render the floor and its grid lines."""
+        if self.render_mode == RENDER_IMMEDIATE:
+            self.render_floor_immediate()
+        else:
+            self.render_static_mesh("floor", (0.8, 0.8, 0.8), (0.0, 0.0, 0.0))  # Light gray floor, black grid
+
+    def render_floor_immediate(self):
+        """Render the subdivided floor one cell at a time."""
         glColor3f(0.8, 0.8, 0.8)  # Light gray for the floor
         for x in range(-self.size[0] // 2, self.size[0] // 2):
             for z in range(-self.size[2] // 2, self.size[2] // 2):
@@ -131,6 +455,14 @@ class World:
 
     def render_boundary(self):
         """Render a wireframe cube to represent the world boundary."""
+        if self.render_mode == RENDER_IMMEDIATE:
+            self.render_boundary_immediate()
+        else:
+            glLineWidth(2.0)
+            self.render_static_mesh("boundary", None, (0.5, 0.5, 0.5))  # Gray for boundary wireframe
+
+    def render_boundary_immediate(self):
+        """Render the world boundary edges one vertex at a time."""
         glColor3f(0.5, 0.5, 0.5)  # Gray for boundary wireframe
         glLineWidth(2.0)
         glBegin(GL_LINES)
@@ -252,11 +584,123 @@ class World:
             glPopMatrix()
 
 
-    def render_blocks_with_wireframes(self):
-        """Render all blocks with a solid cube and wireframe edges."""
-        for block in self.blocks:
-            # Render the solid cube
-            self.render_solid_block(block, color=(0.6, 0.6, 0.6))  # Gray for solid blocks
+    def visible_chunks(self, frustum=None):
+        """
+        Return the coordinates of the non-empty chunks whose bounding box intersects
+        the frustum (all of them without a frustum), updating cull_stats.
+        """
+        coords = self.blocks.coords()
+        self.cull_stats.reset()
+        if frustum is None or not coords:
+            self.cull_stats.drawn = len(coords)
+            return coords
+
+        min_corners = np.array(coords, dtype=np.float64) * CHUNK_SIZE
+        visible = frustum.intersects_boxes(min_corners, min_corners + CHUNK_SIZE)
+        self.cull_stats.tested = len(coords)
+        self.cull_stats.drawn = int(np.count_nonzero(visible))
+        self.cull_stats.culled = self.cull_stats.tested - self.cull_stats.drawn
+        return [coord for coord, keep in zip(coords, visible.tolist()) if keep]
+
+    def render_blocks_with_wireframes(self, frustum=None, viewer=None):
+        """
+        Render the exposed block faces as solid quads with wireframe outlines.
+        Chunks outside the optional view frustum are skipped, and with a ChunkVisibility
+        and the viewer's position so are chunks walled off from the viewer. With a
+        LodManager, distant regions are drawn from simplified meshes instead of their
+        chunks (not in immediate or instanced mode). Instanced mode draws every block in
+        one call and leaves clipping to the GPU.
+        """
+        if self.render_mode == RENDER_INSTANCED:
+            self.mesh_in_view(self.visible_chunks())
+            self.render_blocks_instanced()
+            return
+        coords = self.visible_chunks(frustum)
+        if self.visibility is not None and viewer is not None:
+            reached = self.visibility.visible(viewer, frustum)
+            if reached is not None:
+                coords = [coord for coord in coords if coord in reached]
+                self.cull_stats.occluded = self.cull_stats.drawn - len(coords)
+                self.cull_stats.drawn = len(coords)
+        regions = []
+        if self.lod is not None and viewer is not None and self.render_mode != RENDER_IMMEDIATE:
+            regions, detailed = self.lod.select(viewer)
+            coords = [coord for coord in coords if coord in detailed]
+            if frustum is not None and regions:
+                boxes = np.array([region_box(level, coord) for level, coord, _ in regions], dtype=np.float64)
+                visible = frustum.intersects_boxes(boxes[:, 0], boxes[:, 1]).tolist()
+                regions = [region for region, keep in zip(regions, visible) if keep]
+        self.mesh_in_view(coords)
+        if self.render_mode == RENDER_RETAINED:
+            self.render_blocks_retained(coords, regions)
+        elif self.render_mode == RENDER_ARRAYS:
+            self.render_blocks_arrays(coords, regions)
+        else:
+            self.render_blocks_immediate(coords)
+
+    def render_blocks_retained(self, coords, regions=()):
+        """
+        Render the given chunks, and (level, region coord, Mesh) LOD regions, from vertex
+        buffer objects, uploading only changed meshes. Each block type of a mesh is one
+        draw call; transparent types are blended in a second pass after everything opaque.
+        LOD regions get no wireframe, its lines would outline the coarse cells.
+        """
+        if self.mesh_buffers is None:
+            self.mesh_buffers = MeshBufferCache()
+            self.lod_buffers = MeshBufferCache()
+        meshes = self.update_meshes()
+        self.mesh_buffers.retain(meshes)
+        self.lod_buffers.retain({(level, coord) for level, coord, _ in regions})
+        visible = [
+            (self.mesh_buffers.get(coord, meshes[coord]), meshes[coord])
+            for coord in coords if coord in meshes and not meshes[coord].is_empty()
+        ]
+        simplified = [
+            (self.lod_buffers.get((level, coord), mesh), mesh) for level, coord, mesh in regions if not mesh.is_empty()
+        ]
+        for buffer, mesh in visible:
+            buffer.draw_batches(material_batches(mesh, transparent=False))
+            buffer.draw(None, (0.0, 0.0, 0.0))  # Black wireframe
+        for buffer, mesh in simplified:
+            buffer.draw_batches(material_batches(mesh, transparent=False))
+        begin_transparent_pass()
+        for buffer, mesh in visible + simplified:
+            buffer.draw_batches(material_batches(mesh, transparent=True))
+        end_transparent_pass()
+
+    def render_blocks_arrays(self, coords, regions=()):
+        """Render the given chunks and LOD regions straight from client-side arrays, batched like the retained path."""
+        meshes = self.update_meshes()
+        visible = [meshes[coord] for coord in coords if coord in meshes]
+        simplified = [mesh for _, _, mesh in regions]
+        for mesh in visible:
+            draw_mesh_batches_arrays(mesh, material_batches(mesh, transparent=False))
+            draw_mesh_arrays(mesh, None, (0.0, 0.0, 0.0))  # Black wireframe
+        for mesh in simplified:
+            draw_mesh_batches_arrays(mesh, material_batches(mesh, transparent=False))
+        begin_transparent_pass()
+        for mesh in visible + simplified:
+            draw_mesh_batches_arrays(mesh, material_batches(mesh, transparent=True))
+        end_transparent_pass()
+
+    def render_blocks_instanced(self):
+        """
+        Render one shaded unit cube with a wireframe per exposed block, all instances in one
+        draw call per pass, transformed by self.camera's cached view-projection matrix.
+        Instances are rebuilt only for chunks whose mesh changed.
+        """
+        if self.instanced_renderer is None:
+            self.instanced_renderer = InstancedCubeRenderer()
+            self.instances = InstanceSet(self.blocks)
+        self.instances.update(self.update_meshes())
+        self.instanced_renderer.draw(self.instances, self.camera.view_projection_columns)
+
+    def render_blocks_immediate(self, coords):
+        """Render the blocks of the given chunks with a solid cube and wireframe edges, one block at a time."""
+        for coord in coords:
+            for block in self.blocks.chunk_positions(coord):
+                # Render the solid cube in the color of its block type
+                self.render_solid_block(block, color=block_color(self.blocks.get(*block))[:3])
 
-            # Render the wireframe around the block
-            self.render_full_wireframe(block, color=(0.0, 0.0, 0.0))  # Black for wireframe
+                # Render the wireframe around the block
+                self.render_full_wireframe(block, color=(0.0, 0.0, 0.0))  # Black for wireframe